@@ -0,0 +1,19 @@
+"""
+ASGI config for cloudblue project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Orders list and retrieve endpoints are served by async views, which run
+database work in bounded thread pool (see ORDERS_ASYNC_VIEWS setting).
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cloudblue.settings')
+os.environ.setdefault('ORDERS_ASYNC_VIEWS', '1')
+
+application = get_asgi_application()
@@ -9,7 +9,8 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY')
 
-DEBUG = True
+# debug mode keeps every query in memory, should be on in development only.
+DEBUG = os.environ.get('DJANGO_DEBUG', '0') == '1'
 
 ALLOWED_HOSTS = [
     'localhost',
@@ -31,6 +32,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'orders.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -60,13 +62,41 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'cloudblue.wsgi.application'
 
+# connections are kept open by every thread for DB_CONN_MAX_AGE seconds
+# (0 closes them after every request).
 DATABASES = {
     'default': {
         'ENGINE': os.environ.get('DB_ENGINE'),
         'NAME': os.environ.get('DB_NAME'),
+        'USER': os.environ.get('DB_USER', ''),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', ''),
+        'PORT': os.environ.get('DB_PORT', ''),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
     }
 }
 
+# Django closes kept connection broken by database after the request failed
+# on it. With ORDERS_DB_HEALTH_CHECKS kept connections are checked by extra
+# query before every request, so that request does not fail either.
+ORDERS_DB_HEALTH_CHECKS = os.environ.get('DB_CONN_HEALTH_CHECKS', '0') == '1'
+
+# cache should be shared by all workers (e.g. memcached or file based one),
+# otherwise changes made by one of them are not seen by caches of others.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+CACHE_IS_SHARED = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -94,13 +124,17 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
     ],
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.UserRateThrottle',
-        'rest_framework.throttling.AnonRateThrottle',
+        'orders.throttling.UserRateThrottle',
+        'orders.throttling.AnonRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'user': '1000/day',
         'anon': '100/day',
     },
+    'DEFAULT_RENDERER_CLASSES': [
+        'orders.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'orders.paginator.CustomPagination',
     'PAGE_SIZE': 25,
     'DEFAULT_PARSER_CLASSES': [
@@ -108,3 +142,86 @@ REST_FRAMEWORK = {
     ],
     'DATETIME_FORMAT': '%d-%m-%Y %H:%M:%S',
 }
+
+ORDERS_PRODUCT_CACHE = {
+    'MAX_SIZE': int(os.environ.get('ORDERS_PRODUCT_CACHE_MAX_SIZE', 1024)),
+    'TIMEOUT': int(os.environ.get('ORDERS_PRODUCT_CACHE_TIMEOUT', 300)),
+}
+
+# cached responses could be served stale by other workers unless cache is
+# shared, so they are off by default then.
+ORDERS_RESPONSE_CACHE = {
+    'ENABLED': os.environ.get('ORDERS_RESPONSE_CACHE_ENABLED',
+                              '1' if CACHE_IS_SHARED else '0') == '1',
+    'TIMEOUT': int(os.environ.get('ORDERS_RESPONSE_CACHE_TIMEOUT', 300)),
+}
+
+ORDERS_FAST_SERIALIZATION = (
+    os.environ.get('ORDERS_FAST_SERIALIZATION', '0') == '1'
+)
+
+# Store rendered details of created orders on them and read orders list and
+# exact order from orders table only. Orders created before should be filled
+# by `manage.py backfill_order_snapshots`.
+ORDERS_DETAILS_SNAPSHOT = (
+    os.environ.get('ORDERS_DETAILS_SNAPSHOT', '0') == '1'
+)
+
+# Take total count of orders lists filtered by status only from counters
+# maintained on writes instead of COUNT query. Orders written bypassing
+# orders services are not counted until `manage.py rebuild_order_stats`.
+ORDERS_MATERIALIZED_COUNTS = (
+    os.environ.get('ORDERS_MATERIALIZED_COUNTS', '0') == '1'
+)
+
+# Throttle counters are shared by processes through SQLite file, if it is
+# set, otherwise every process counts requests on its own.
+ORDERS_THROTTLE = {
+    'STORE': os.environ.get('ORDERS_THROTTLE_STORE', ''),
+    'SYNC_INTERVAL': float(os.environ.get('ORDERS_THROTTLE_SYNC_INTERVAL', 1)),
+}
+
+# Finished orders created more than AGE_DAYS ago are moved into archive
+# table by `manage.py archive_orders`.
+ORDERS_ARCHIVE = {
+    'AGE_DAYS': int(os.environ.get('ORDERS_ARCHIVE_AGE_DAYS', 90)),
+    'BATCH_SIZE': int(os.environ.get('ORDERS_ARCHIVE_BATCH_SIZE', 1000)),
+}
+
+# Responses of create requests with Idempotency-Key header are kept for
+# TIMEOUT seconds, expired keys are deleted every PURGE_INTERVAL claims.
+ORDERS_IDEMPOTENCY = {
+    'TIMEOUT': int(os.environ.get('ORDERS_IDEMPOTENCY_TIMEOUT', 86400)),
+    'PURGE_INTERVAL': 100,
+}
+
+# Changes of orders are appended to change feed served by
+# /api/v1/orders/changes/, events older than RETENTION_DAYS are compacted by
+# `manage.py compact_order_events`. Long-poll waits no more than POLL_TIMEOUT
+# seconds, event streams are closed after STREAM_TIMEOUT seconds.
+ORDERS_CHANGE_FEED = {
+    'ENABLED': os.environ.get('ORDERS_CHANGE_FEED_ENABLED', '1') == '1',
+    'RETENTION_DAYS': int(os.environ.get('ORDERS_CHANGE_FEED_RETENTION_DAYS',
+                                         7)),
+    'POLL_TIMEOUT': 30,
+    'POLL_INTERVAL': 1,
+    'STREAM_TIMEOUT': 300,
+}
+
+# Server-Timing header and Prometheus metrics on /metrics.
+ORDERS_METRICS_ENABLED = os.environ.get('ORDERS_METRICS_ENABLED', '1') == '1'
+
+# Metrics are added by every process to SQLite file every FLUSH_INTERVAL
+# seconds, if it is set, otherwise /metrics returns ones of the process
+# serving it. /metrics is served to staff users and requests with
+# 'Authorization: Bearer TOKEN' header.
+ORDERS_METRICS = {
+    'STORE': os.environ.get('ORDERS_METRICS_STORE', ''),
+    'FLUSH_INTERVAL': float(os.environ.get('ORDERS_METRICS_FLUSH_INTERVAL',
+                                           5)),
+    'TOKEN': os.environ.get('ORDERS_METRICS_TOKEN', ''),
+}
+
+ORDERS_ASYNC_VIEWS = os.environ.get('ORDERS_ASYNC_VIEWS', '0') == '1'
+
+ORDERS_ASYNC_ORM_THREADS = int(os.environ.get('ORDERS_ASYNC_ORM_THREADS', 8))
@@ -0,0 +1,66 @@
+"""
+Production configuration of gunicorn, read from working directory by
+default:
+
+    gunicorn cloudblue.wsgi:application
+
+Application is loaded and warmed up once in master process and workers are
+forked from it, every worker connects to database on its own before the
+first request. Every thread of workers holds its own persistent database
+connection (DB_CONN_MAX_AGE), so database should accept
+GUNICORN_WORKERS * GUNICORN_THREADS connections.
+
+Long-poll (up to 30 seconds) and event streams (up to 5 minutes) of change
+feed keep thread busy. gthread workers are not killed by them, as timeout
+counts only silence of worker itself, while sync worker is killed by request
+lasting longer than GUNICORN_TIMEOUT, so it is raised to cover them then.
+"""
+import gc
+import multiprocessing
+import os
+
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8001')
+
+# requests mostly wait for database, so two workers per CPU keep it busy,
+# threads serve other requests while some wait for changes of orders.
+workers = int(os.environ.get(
+    'GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+
+preload_app = True
+# sync worker is killed by longer requests, change feed event streams last
+# 300 seconds (STREAM_TIMEOUT) and long-poll 30 seconds (POLL_TIMEOUT).
+SYNC_WORKER_TIMEOUT = 300 + 10
+timeout = int(os.environ.get(
+    'GUNICORN_TIMEOUT',
+    SYNC_WORKER_TIMEOUT if worker_class == 'sync' else 30,
+))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+# restart workers from time to time, so memory they leak is returned.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.environ.get('GUNICORN_ACCESSLOG', '-')
+
+
+def when_ready(server):
+    """Warm up application in master, so workers inherit prepared state."""
+    if not server.cfg.preload_app:
+        return
+    from django.db import connections
+
+    from orders.warmup import warm_up
+
+    warm_up(database=False)
+    connections.close_all()
+    # objects loaded so far are not scanned by garbage collector of workers,
+    # which would copy memory pages shared with master.
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    from orders.warmup import warm_up
+
+    warm_up()
@@ -0,0 +1,211 @@
+"""
+Cold storage of finished orders. `manage.py archive_orders` moves accepted
+and failed orders older than ORDERS_ARCHIVE['AGE_DAYS'] with their details
+into ArchivedOrder rows holding rendered representation, so orders and
+details tables and their indexes keep only the recent part of history.
+Archived orders are read only, they are served by retrieve and by list with
+'include_archived' parameter.
+"""
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import TextField, Value
+from django.http import Http404
+from django.utils import timezone
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .cache import invalidate_orders
+from .fast_serializers import (ORDER_FIELDS, get_order_rows,
+                               serialize_orders)
+from .models import ArchivedOrder, Order, OrderDetail, Status
+from .serializers import EXPANSIONS
+
+
+ARCHIVE_DEFAULTS = {
+    'AGE_DAYS': 90,
+    'BATCH_SIZE': 1000,
+}
+FINISHED_STATUSES = (Status.ACCEPTED, Status.FAILED)
+TRUE_VALUES = ('1', 'true', 'yes')
+
+
+def get_archive_settings() -> dict:
+    return {**ARCHIVE_DEFAULTS, **getattr(settings, 'ORDERS_ARCHIVE', {})}
+
+
+def render_order(order: dict) -> str:
+    return json.dumps(order, cls=JSONEncoder, ensure_ascii=False,
+                      separators=(',', ':'))
+
+
+def trim_order(order: dict, fields=None, expand=EXPANSIONS) -> dict:
+    """
+    Cut full representation of archived order down to fields and expand
+    of OrderSerializer.
+    """
+    if 'details' not in expand:
+        order.pop('details', None)
+    elif 'details.product' not in expand:
+        for detail in order['details']:
+            detail['product'] = {'id': detail['product']['id']}
+    if fields is not None:
+        order = {name: value for name, value in order.items()
+                 if name in fields}
+    return order
+
+
+def _archive_batch(order_rows: list):
+    order_ids = [row['id'] for row in order_rows]
+    ArchivedOrder.objects.bulk_create(
+        ArchivedOrder(
+            id=row['id'],
+            status=row['status'],
+            created_at=row['created_at'],
+            external_id=row['external_id'],
+            data=render_order(order),
+        )
+        for row, order in zip(order_rows, serialize_orders(order_rows))
+    )
+    # plain DELETE, deletion signals of every order and detail would only
+    # invalidate their cached responses, which is done once below.
+    details = OrderDetail.objects.filter(order_id__in=order_ids)
+    details._raw_delete(details.db)
+    orders = Order.objects.filter(id__in=order_ids)
+    orders._raw_delete(orders.db)
+    invalidate_orders(order_ids)
+
+
+def archive_orders(older_than=None, batch_size: int = None) -> int:
+    """
+    Move finished orders into archive in batches, every one in its own
+    transaction. Statistics are not changed, archived orders are counted in
+    them as before.
+    :param older_than: datetime orders created before are archived, by
+    default AGE_DAYS before now.
+    :param batch_size: amount of orders archived at once, BATCH_SIZE by
+    default.
+    :return: amount of archived orders.
+    """
+    archive_settings = get_archive_settings()
+    if older_than is None:
+        older_than = timezone.now() - timedelta(
+            days=archive_settings['AGE_DAYS'])
+    batch_size = batch_size or archive_settings['BATCH_SIZE']
+    queryset = get_order_rows(Order.objects.filter(
+        status__in=FINISHED_STATUSES, created_at__lt=older_than,
+    ).order_by('id'), with_snapshot=True)
+    archived = 0
+    last_id = None
+    while True:
+        batch_queryset = queryset
+        if last_id is not None:
+            batch_queryset = queryset.filter(id__gt=last_id)
+        with transaction.atomic():
+            # locked, so orders deleted meanwhile are not archived.
+            order_rows = list(batch_queryset.select_for_update()[:batch_size])
+            if not order_rows:
+                return archived
+            _archive_batch(order_rows)
+        archived += len(order_rows)
+        last_id = order_rows[-1]['id']
+
+
+class ArchiveUnion:
+    """
+    Live and archived orders rows as one list ordered by ordering of live
+    ones, queried by UNION ALL. Supports part of queryset interface used by
+    pagination: filter() and order_by() apply to both parts.
+    """
+    model = Order
+
+    def __init__(self, orders, archived, ordering=None):
+        """
+        :param orders: values() rows of orders with data of None.
+        :param archived: values() rows of archived orders with the same
+        columns.
+        """
+        self.orders = orders
+        self.archived = archived
+        self.ordering = (ordering or orders.query.order_by
+                         or Order._meta.ordering)
+
+    def filter(self, *args, **kwargs):
+        return ArchiveUnion(self.orders.filter(*args, **kwargs),
+                            self.archived.filter(*args, **kwargs),
+                            self.ordering)
+
+    def order_by(self, *ordering):
+        return ArchiveUnion(self.orders, self.archived, ordering)
+
+    def count(self) -> int:
+        return self.orders.count() + self.archived.count()
+
+    def get_union(self):
+        return self.orders.order_by().union(
+            self.archived.order_by(), all=True).order_by(*self.ordering)
+
+    @property
+    def query(self):
+        return self.get_union().query
+
+    def __getitem__(self, key):
+        return self.get_union()[key]
+
+    def __iter__(self):
+        return iter(self.get_union())
+
+
+class ArchiveReadMixin:
+    """
+    Serve archived orders by retrieve when order is not found and by list
+    with 'include_archived' parameter.
+    """
+    archive_query_param = 'include_archived'
+
+    def is_archive_included(self) -> bool:
+        value = self.request.query_params.get(self.archive_query_param, '')
+        return value.lower() in TRUE_VALUES
+
+    def get_archive_rows(self) -> ArchiveUnion:
+        orders = get_order_rows(
+            self.filter_queryset(self.get_queryset())
+        ).annotate(data=Value(None, output_field=TextField()))
+        archived = self.filter_queryset(
+            ArchivedOrder.objects.all()).values(*ORDER_FIELDS, 'data')
+        return ArchiveUnion(orders, archived)
+
+    def serialize_archive_rows(self, rows) -> list:
+        fields, expand = self.get_representation()
+        orders = iter(serialize_orders(
+            [row for row in rows if row['data'] is None], fields, expand))
+        return [
+            next(orders) if row['data'] is None
+            else trim_order(json.loads(row['data']), fields, expand)
+            for row in rows
+        ]
+
+    def list(self, request, *args, **kwargs):
+        if not self.is_archive_included():
+            return super().list(request, *args, **kwargs)
+        rows = self.get_archive_rows()
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(
+                self.serialize_archive_rows(page))
+        return Response(self.serialize_archive_rows(list(rows)))
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            data = get_object_or_404(
+                ArchivedOrder.objects.values_list('data', flat=True),
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]},
+            )
+        fields, expand = self.get_representation()
+        return Response(trim_order(json.loads(data), fields, expand))
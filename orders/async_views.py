@@ -0,0 +1,158 @@
+"""
+Async entry points of orders endpoints for ASGI deployment. Requests are
+handled by the same OrderViewSet actions, which run in bounded thread pool,
+so event loop keeps serving other connections meanwhile.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import feed, metrics
+from .views import OrderViewSet
+
+
+STREAM_NOT_SUPPORTED_TEXT = 'Events are streamed by WSGI deployment only, ' \
+                            'long-poll with "wait" should be used.'
+EXPORT_NOT_SUPPORTED_TEXT = 'Orders are exported by WSGI deployment only.'
+
+
+class AsyncOrderViewSet(OrderViewSet):
+    """
+    Changes are read without waiting, long-poll waits in order_changes on
+    event loop instead of pool thread. Streaming responses are refused:
+    ASGI handler iterates them on event loop, where database queries are not
+    allowed.
+    """
+
+    def changes(self, request):
+        response = super().changes(request)
+        response.feed_query = getattr(self, 'feed_query', None)
+        return response
+
+    def wait_events(self, query):
+        self.feed_query = query
+        return feed.read_events(query.after, query.limit, query.status)
+
+    def stream_changes(self, query):
+        return Response(STREAM_NOT_SUPPORTED_TEXT,
+                        status=status.HTTP_406_NOT_ACCEPTABLE)
+
+    def stream_export(self, queryset, renderer):
+        return Response(EXPORT_NOT_SUPPORTED_TEXT,
+                        status=status.HTTP_406_NOT_ACCEPTABLE)
+
+
+order_list_view = OrderViewSet.as_view({'get': 'list', 'post': 'create'})
+order_detail_view = OrderViewSet.as_view({
+    'get': 'retrieve',
+    'put': 'update',
+    'patch': 'partial_update',
+    'delete': 'destroy',
+})
+
+# renderers of the action are passed by router otherwise.
+order_changes_view = AsyncOrderViewSet.as_view(
+    {'get': 'changes'}, **OrderViewSet.changes.kwargs)
+order_export_view = AsyncOrderViewSet.as_view(
+    {'get': 'export'}, **OrderViewSet.export.kwargs)
+
+_executor = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.ORDERS_ASYNC_ORM_THREADS,
+            thread_name_prefix='orders-orm',
+        )
+    return _executor
+
+
+def _call_view(view, request, *args, **kwargs):
+    # pool threads keep own database connections, so they are checked here
+    # instead of request_started/request_finished signals.
+    close_old_connections()
+    # context of metrics middleware is not propagated to pool threads.
+    try:
+        with metrics.activate(getattr(request, 'metrics', None)):
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                with metrics.timed('render'):
+                    response = response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+async def run_in_orm_pool(view, request, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor(),
+        functools.partial(_call_view, view, request, *args, **kwargs),
+    )
+
+
+async def order_list(request, *args, **kwargs):
+    return await run_in_orm_pool(order_list_view, request, *args, **kwargs)
+
+
+async def order_detail(request, *args, **kwargs):
+    return await run_in_orm_pool(order_detail_view, request, *args, **kwargs)
+
+
+async def order_export(request, *args, **kwargs):
+    return await run_in_orm_pool(order_export_view, request, *args, **kwargs)
+
+
+def _read_events(query, after: int) -> tuple:
+    close_old_connections()
+    try:
+        return feed.read_events(after, query.limit, query.status)
+    finally:
+        close_old_connections()
+
+
+def _render_changes(response, events: list, next_seq: int):
+    changes = Response(OrderViewSet.get_changes_data(events, next_seq),
+                       headers=dict(response.items()))
+    changes.accepted_renderer = response.accepted_renderer
+    changes.accepted_media_type = response.accepted_media_type
+    changes.renderer_context = response.renderer_context
+    return changes.render()
+
+
+async def order_changes(request, *args, **kwargs):
+    """
+    Long-poll keeps no pool thread busy: changes are read again every
+    POLL_INTERVAL seconds till they appear or 'wait' is over.
+    """
+    response = await run_in_orm_pool(order_changes_view, request,
+                                     *args, **kwargs)
+    query = getattr(response, 'feed_query', None)
+    if query is None or response.data['events'] or not query.wait:
+        return response
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + query.wait
+    interval = feed.get_feed_settings()['POLL_INTERVAL']
+    events, next_seq = [], response.data['next']
+    while not events:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return response
+        await asyncio.sleep(min(interval, remaining))
+        events, next_seq = await loop.run_in_executor(
+            get_executor(), _read_events, query, next_seq)
+    return await loop.run_in_executor(
+        get_executor(), _render_changes, response, events, next_seq)
+
+
+order_list.csrf_exempt = True
+order_detail.csrf_exempt = True
+order_changes.csrf_exempt = True
+order_export.csrf_exempt = True
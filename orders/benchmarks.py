@@ -0,0 +1,649 @@
+"""
+Performance benchmarks of orders app. Every suite is a function registered
+with `suite` decorator and is run by `manage.py benchmark <suite>` against
+configured database. Suites returning mapping of case name to summary of
+load_summary could be compared with stored baseline.
+"""
+import itertools
+import json
+import random
+import re
+import socket
+import statistics
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.core.management import CommandError
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max, Min
+from django.test import Client, RequestFactory, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from . import stats
+from .fast_serializers import get_order_rows, serialize_orders
+from .models import Order, OrderDetail, OrderEvent, Product, Status
+from .paginator import encode_cursor
+from .renderers import FastJSONRenderer
+from .serializers import OrderSerializer
+
+
+SEED_BATCH_SIZE = 5000
+SEED_STATUSES = (
+    (Status.ACCEPTED, 0.8),
+    (Status.FAILED, 0.1),
+    (Status.NEW, 0.1),
+)
+
+SUITES = {}
+
+
+def suite(name: str):
+    """Register decorated function as benchmark suite with given name."""
+    def register(func):
+        SUITES[name] = func
+        return func
+    return register
+
+
+def percentile(values: list, percent: float) -> float:
+    """Return value below which given percent of sorted values fall."""
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def measure(func, repeat: int) -> dict:
+    """
+    Call func repeat times after one warm up call.
+    :return: latency stats in milliseconds.
+    """
+    func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        'mean': statistics.mean(timings),
+        'p50': percentile(timings, 50),
+        'p95': percentile(timings, 95),
+        'p99': percentile(timings, 99),
+    }
+
+
+def format_stats(stats: dict) -> str:
+    return '  '.join(f'{key}={value:.2f}ms' for key, value in stats.items())
+
+
+def run_load(send, requests_qty: int, concurrency: int = 1):
+    """
+    Call send(idx) requests_qty times from concurrency threads, from this
+    thread if concurrency is 1.
+    :param send: returns None on success or key of error.
+    :return: latencies of successful calls in milliseconds, Counter of
+    errors and elapsed seconds.
+    """
+    indexes = itertools.count()
+    timings = []
+    errors = Counter()
+    lock = threading.Lock()
+
+    def work():
+        while next(indexes) < requests_qty:
+            started = time.perf_counter()
+            try:
+                error = send()
+            except Exception as exc:  # reported as error of the request.
+                error = type(exc).__name__
+            timing = (time.perf_counter() - started) * 1000
+            with lock:
+                if error is None:
+                    timings.append(timing)
+                else:
+                    errors[error] += 1
+
+    def work_in_thread():
+        try:
+            work()
+        finally:
+            connections.close_all()
+
+    started = time.perf_counter()
+    if concurrency <= 1:
+        work()
+    else:
+        threads = [threading.Thread(target=work_in_thread)
+                   for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return timings, errors, time.perf_counter() - started
+
+
+def load_summary(timings: list, elapsed: float) -> dict:
+    """Throughput in requests per second and latency stats in milliseconds."""
+    if not timings:
+        return {'throughput': 0.0}
+    return {
+        'throughput': len(timings) / elapsed,
+        'mean': statistics.mean(timings),
+        'p50': percentile(timings, 50),
+        'p95': percentile(timings, 95),
+        'p99': percentile(timings, 99),
+    }
+
+
+def format_load_summary(summary: dict) -> str:
+    latency = {key: value for key, value in summary.items()
+               if key != 'throughput'}
+    return (f'{summary["throughput"]:.1f} req/s  ' + format_stats(latency))
+
+
+def save_baseline(path: str, suite_name: str, params: dict, results: dict):
+    """
+    :param params: options results depend on, baseline is comparable only
+    with runs using the same ones.
+    """
+    with open(path, 'w', encoding='utf-8') as baseline:
+        json.dump({'suite': suite_name, 'params': params, 'results': results},
+                  baseline, indent=2, sort_keys=True)
+
+
+def compare_with_baseline(results: dict, baseline: dict,
+                          tolerance: float) -> list:
+    """
+    Find cases slower than in baseline: p95 latency is higher or throughput
+    is lower by more than tolerance share of baseline value. Cases missing
+    in baseline are skipped.
+    :return: descriptions of regressions.
+    """
+    regressions = []
+    for name, summary in results.items():
+        expected = baseline.get(name)
+        if not expected:
+            continue
+        if 'p95' in summary and 'p95' in expected \
+                and summary['p95'] > expected['p95'] * (1 + tolerance):
+            regressions.append(f'{name}: p95 {summary["p95"]:.2f}ms, '
+                               f'baseline {expected["p95"]:.2f}ms')
+        if summary['throughput'] < expected['throughput'] * (1 - tolerance):
+            regressions.append(
+                f'{name}: throughput {summary["throughput"]:.1f} req/s, '
+                f'baseline {expected["throughput"]:.1f} req/s')
+    return regressions
+
+
+@contextmanager
+def explicit_created_at():
+    """Let seeding set created_at instead of auto_now_add current time."""
+    field = Order._meta.get_field('created_at')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def reset_sequences(*models):
+    """Move id sequences after rows inserted with explicit ids."""
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def seed_orders(orders_qty: int, products_qty: int = 50,
+                details_per_order: tuple = (1, 3), days: int = 365,
+                seed: int = 0, stdout=None) -> int:
+    """
+    Add generated orders until there are at least orders_qty of them.
+    :param orders_qty: required total amount of orders.
+    :param products_qty: required total amount of products.
+    :param details_per_order: min and max amount of details in one order.
+    :param days: created_at of orders is spread over that many past days.
+    :param seed: random generator seed to make datasets reproducible.
+    :return: amount of added orders.
+    """
+    rnd = random.Random(seed)
+    existing_products = Product.objects.count()
+    Product.objects.bulk_create(
+        Product(name=f'product_{idx}')
+        for idx in range(existing_products, products_qty)
+    )
+    product_ids = list(Product.objects.values_list('id', flat=True))
+
+    existing = Order.objects.count()
+    missing = max(orders_qty - existing, 0)
+    next_order_id = (Order.objects.aggregate(max_id=Max('id'))['max_id']
+                     or 0) + 1
+    next_detail_id = (OrderDetail.objects.aggregate(max_id=Max('id'))['max_id']
+                      or 0) + 1
+    statuses = [item[0] for item in SEED_STATUSES]
+    weights = [item[1] for item in SEED_STATUSES]
+    now = timezone.now()
+    period = timedelta(days=days).total_seconds()
+    step = period / max(missing, 1)
+
+    added = 0
+    with explicit_created_at():
+        while added < missing:
+            batch_qty = min(SEED_BATCH_SIZE, missing - added)
+            orders = []
+            details = []
+            for _ in range(batch_qty):
+                created_at = now - timedelta(
+                    seconds=period - step * (added + len(orders)))
+                order = Order(
+                    id=next_order_id,
+                    status=rnd.choices(statuses, weights)[0],
+                    created_at=created_at,
+                    external_id=f'ext-{next_order_id:09d}',
+                )
+                orders.append(order)
+                for _ in range(rnd.randint(*details_per_order)):
+                    details.append(OrderDetail(
+                        id=next_detail_id,
+                        order_id=next_order_id,
+                        product_id=rnd.choice(product_ids),
+                        amount=rnd.randint(1, 20),
+                        price=f'{rnd.uniform(1, 1000):.2f}',
+                    ))
+                    next_detail_id += 1
+                next_order_id += 1
+            with transaction.atomic():
+                Order.objects.bulk_create(orders)
+                OrderDetail.objects.bulk_create(details)
+            added += batch_qty
+            if stdout is not None:
+                stdout.write(f'Seeded {added}/{missing} orders.')
+    if added:
+        reset_sequences(Order, OrderDetail)
+        stats.rebuild()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')  # refresh planner statistics.
+    return added
+
+
+def get_filter_cases() -> dict:
+    """Query parameters of filter combinations accepted by orders list."""
+    sample = Order.objects.order_by('-id').values('external_id').first()
+    external_id = sample['external_id'] if sample else 'missing'
+    last_created_at = Order.objects.aggregate(
+        last=Max('created_at'))['last'] or timezone.now()
+    hour_ago = (last_created_at - timedelta(hours=1)).isoformat()
+    day_ago = (last_created_at - timedelta(days=1)).isoformat()
+    return {
+        'no filters': {},
+        'external_id': {'external_id': external_id},
+        'status=new': {'status': Status.NEW.value},
+        'status=accepted': {'status': Status.ACCEPTED.value},
+        'external_id+status': {'external_id': external_id,
+                               'status': Status.NEW.value},
+        'search': {'search': external_id[-6:]},
+        'external_id_prefix': {'external_id_prefix': external_id[:-2]},
+        'last hour': {'created_at__gte': hour_ago},
+        'day before last hour': {'created_at__gte': day_ago,
+                                 'created_at__lt': hour_ago},
+        'status=new+last hour': {'status': Status.NEW.value,
+                                 'created_at__gte': hour_ago},
+    }
+
+
+def get_list_queryset(params: dict):
+    """Return orders filtered and ordered by list endpoint for params."""
+    from .views import OrderViewSet
+
+    request = Request(RequestFactory().get('/', params))
+    view = OrderViewSet(action='list', request=request, format_kwarg=None,
+                        args=(), kwargs={})
+    return view.filter_queryset(Order.objects.all())
+
+
+# (scan of orders table, sort of its rows) patterns of query plan.
+FULL_SCAN_SORT_PATTERNS = {
+    'sqlite': (r'\bSCAN orders_order\b', r'USE TEMP B-TREE FOR .*ORDER BY'),
+    'postgresql': (r'Seq Scan on orders_order\b', r'(?<!Incremental )Sort\b'),
+}
+
+
+def is_full_scan_sort(plan: str) -> bool:
+    """Return whether query plan reads all orders and sorts them."""
+    patterns = FULL_SCAN_SORT_PATTERNS.get(connection.vendor)
+    if patterns is None:
+        return False  # plan format is unknown.
+    return all(re.search(pattern, plan) for pattern in patterns)
+
+
+@suite('filters')
+def filters_suite(options: dict, stdout):
+    """
+    Query plan and latency of list page for every filter and ordering
+    combination and of count for every filter. Fails if any combination
+    reads all orders and sorts them.
+    """
+    from .views import OrderViewSet
+
+    limit = options['limit']
+    offset = options['offset']
+    full_scans = []
+    for name, params in get_filter_cases().items():
+        queryset = get_list_queryset(params)
+        stdout.write(f'== {name} {params}')
+        stdout.write('count: ' + format_stats(
+            measure(queryset.count, options['repeat'])))
+        if set(params) <= {'status'}:
+            stdout.write('materialized count: ' + format_stats(measure(
+                lambda: stats.get_orders_count(params.get('status')),
+                options['repeat'])))
+        for ordering in (None, *OrderViewSet.orderings):
+            if ordering is not None:
+                queryset = get_list_queryset({**params, 'ordering': ordering})
+            page = queryset[offset:offset + limit]
+            plan = page.explain()
+            stdout.write(f'-- ordering={ordering or "default"}')
+            stdout.write('page plan:\n' + plan)
+            stdout.write('page: ' + format_stats(
+                measure(lambda: list(page.all()), options['repeat'])))
+            if is_full_scan_sort(plan):
+                full_scans.append(f'{name} ordering={ordering or "default"}')
+                stdout.write('full scan with sort')
+    if full_scans:
+        raise CommandError('Full scan with sort:\n' + '\n'.join(full_scans))
+    stdout.write('No full scans with sort.')
+
+
+SERIALIZER_PAGE_SIZES = (25, 250, 1000)
+
+
+@suite('serializers')
+def serializers_suite(options: dict, stdout):
+    """Throughput of OrderSerializer and fast serialization of list pages."""
+    from .views import OrderViewSet
+
+    offset = options['offset']
+    for limit in SERIALIZER_PAGE_SIZES:
+        page = OrderViewSet.queryset[offset:offset + limit]
+        rows = get_order_rows(Order.objects.all())[offset:offset + limit]
+        cases = {
+            'OrderSerializer': lambda: OrderSerializer(
+                list(page.all()), many=True).data,
+            'fast': lambda: serialize_orders(list(rows.all())),
+        }
+        stdout.write(f'== page of {limit} orders')
+        for name, func in cases.items():
+            timings = measure(func, options['repeat'])
+            throughput = limit / timings['mean'] * 1000
+            stdout.write(f'{name}: {throughput:.0f} orders/s  '
+                         + format_stats(timings))
+
+
+RENDERER_PAGE_SIZES = (25, 250, 1000, 5000)
+
+
+@suite('renderers')
+def renderers_suite(options: dict, stdout):
+    """
+    Throughput of JSONRenderer and FastJSONRenderer rendering serialized
+    list pages. Fails if their output differs.
+    """
+    offset = options['offset']
+    renderers = {'JSONRenderer': JSONRenderer(),
+                 'FastJSONRenderer': FastJSONRenderer()}
+    for limit in RENDERER_PAGE_SIZES:
+        data = serialize_orders(
+            get_order_rows(Order.objects.all())[offset:offset + limit])
+        outputs = {name: renderer.render(data)
+                   for name, renderer in renderers.items()}
+        if len(set(outputs.values())) > 1:
+            raise CommandError(f'Renderers output differs for page of '
+                               f'{limit} orders.')
+        size = len(outputs['JSONRenderer'])
+        stdout.write(f'== page of {limit} orders, {size} bytes')
+        for name, renderer in renderers.items():
+            timings = measure(lambda: renderer.render(data),
+                              options['repeat'])
+            throughput = limit / timings['mean'] * 1000
+            stdout.write(f'{name}: {throughput:.0f} orders/s  '
+                         f'{size / timings["mean"] / 1000:.1f} MB/s  '
+                         + format_stats(timings))
+
+
+def slow_http_get(url: str, client_delay: float) -> int:
+    """
+    Send GET request like slow client does: headers are finished only after
+    client_delay seconds. Read whole response.
+    :return: response status code.
+    """
+    parts = urlsplit(url)
+    host = parts.hostname
+    port = parts.port or 80
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    with socket.create_connection((host, port), timeout=60) as sock:
+        sock.sendall(f'GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\n'
+                     'Accept: application/json\r\n'.encode())
+        if client_delay:
+            time.sleep(client_delay)
+        sock.sendall(b'Connection: close\r\n\r\n')
+        response = b''
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            response += chunk
+    return int(response.split(b' ', 2)[1])
+
+
+@suite('http')
+def http_suite(options: dict, stdout):
+    """
+    Load test of running server: concurrent clients request given url,
+    latency is measured from connection to the end of response.
+    """
+    concurrency = options['concurrency'] or 100
+    requests_qty = options['requests'] or 1000
+    client_delay = options['client_delay']
+    url = options['url']
+
+    def send():
+        code = slow_http_get(url, client_delay)
+        return None if code == 200 else code
+
+    timings, errors, elapsed = run_load(send, requests_qty, concurrency)
+    summary = load_summary(timings, elapsed)
+    stdout.write(f'== GET {url} concurrency={concurrency} '
+                 f'client_delay={client_delay}s')
+    stdout.write(format_load_summary(summary) + f'  errors: {dict(errors)}')
+    return {f'GET {url}': summary}
+
+
+class EndpointScenarios:
+    """
+    Requests to every OrderViewSet endpoint made with test client. Random
+    parameters come from seeded generator, so runs on the same dataset make
+    the same requests. Write scenarios change dataset: created orders are
+    removed by 'delete', new orders accepted or failed leave new status.
+    """
+    list_url = reverse('orders-list')
+
+    def __init__(self, seed: int = 0, pool_size: int = 1000):
+        self.rnd = random.Random(seed)
+        self.rnd_lock = threading.Lock()
+        self.clients = threading.local()
+        bounds = Order.objects.aggregate(min_id=Min('id'), max_id=Max('id'))
+        self.min_id = bounds['min_id'] or 0
+        self.max_id = bounds['max_id'] or 0
+        self.orders_qty = Order.objects.count()
+        self.product_ids = list(Product.objects.values_list('id', flat=True))
+        self.new_ids = deque(
+            Order.objects.filter(status=Status.NEW)
+            .order_by('-id').values_list('id', flat=True)[:pool_size * 2]
+        )
+        self.created_ids = deque()
+        # consumer of accepted orders keeping up with change feed.
+        self.feed_cursor = OrderEvent.objects.aggregate(
+            head=Max('seq'))['head'] or 0
+
+    @property
+    def client(self) -> Client:
+        client = getattr(self.clients, 'client', None)
+        if client is None:
+            client = self.clients.client = Client()
+        return client
+
+    def randint(self, low: int, high: int) -> int:
+        with self.rnd_lock:
+            return self.rnd.randint(low, high)
+
+    def get(self, url, params=None, expected=200):
+        response = self.client.get(url, params or {})
+        return None if response.status_code == expected \
+            else response.status_code
+
+    def get_order_data(self) -> dict:
+        with self.rnd_lock:
+            return {
+                'external_id': f'bench-{self.rnd.getrandbits(32):08x}',
+                'details': [{
+                    'product': {'id': self.rnd.choice(self.product_ids)},
+                    'amount': self.rnd.randint(1, 20),
+                    'price': f'{self.rnd.uniform(1, 1000):.2f}',
+                } for _ in range(self.rnd.randint(1, 3))],
+            }
+
+    def list(self):
+        return self.get(self.list_url)
+
+    def list_status(self):
+        return self.get(self.list_url, {'status': Status.NEW.value})
+
+    def list_external_id(self):
+        order_id = self.randint(self.min_id, self.max_id)
+        return self.get(self.list_url, {'external_id': f'ext-{order_id:09d}'})
+
+    def list_search(self):
+        order_id = self.randint(self.min_id, self.max_id)
+        return self.get(self.list_url, {'search': f'{order_id:09d}'[-6:]})
+
+    def list_prefix(self):
+        order_id = self.randint(self.min_id, self.max_id)
+        return self.get(self.list_url,
+                        {'external_id_prefix': f'ext-{order_id:09d}'[:-2]})
+
+    def list_deep_offset(self):
+        last_offset = max(self.orders_qty - 25, 0)
+        offset = self.randint(
+            min(self.orders_qty - self.orders_qty // 10, last_offset),
+            last_offset)
+        return self.get(self.list_url, {'offset': offset})
+
+    def list_deep_keyset(self):
+        last_id = self.randint(self.min_id, self.max_id)
+        return self.get(self.list_url,
+                        {'cursor': encode_cursor('id', [last_id])})
+
+    def retrieve(self):
+        order_id = self.randint(self.min_id, self.max_id)
+        return self.get(reverse('orders-detail', kwargs={'pk': order_id}))
+
+    def stats(self):
+        return self.get(reverse('orders-stats'))
+
+    def changes(self):
+        return self.get(reverse('orders-changes'), {
+            'after': self.feed_cursor, 'status': Status.ACCEPTED.value})
+
+    def create(self):
+        response = self.client.post(self.list_url, self.get_order_data(),
+                                    content_type='application/json')
+        if response.status_code != 201:
+            return response.status_code
+        self.created_ids.append(response.json()['id'])
+        return None
+
+    def bulk_create(self):
+        data = [self.get_order_data() for _ in range(10)]
+        response = self.client.post(reverse('orders-bulk'), data,
+                                    content_type='application/json')
+        return None if response.status_code == 201 else response.status_code
+
+    def change_status(self, url_name: str):
+        try:
+            order_id = self.new_ids.popleft()
+        except IndexError:
+            return 'no new orders'
+        response = self.client.post(reverse(url_name, kwargs={'pk': order_id}))
+        return None if response.status_code == 200 else response.status_code
+
+    def accept(self):
+        return self.change_status('orders-accept')
+
+    def fail(self):
+        return self.change_status('orders-fail')
+
+    def delete(self):
+        try:
+            order_id = self.created_ids.popleft()
+        except IndexError:
+            return 'no created orders'
+        response = self.client.delete(
+            reverse('orders-detail', kwargs={'pk': order_id}))
+        return None if response.status_code == 204 else response.status_code
+
+    def get_cases(self) -> dict:
+        return {
+            'list': self.list,
+            'list status': self.list_status,
+            'list external_id': self.list_external_id,
+            'list search': self.list_search,
+            'list prefix': self.list_prefix,
+            'list deep offset': self.list_deep_offset,
+            'list deep keyset': self.list_deep_keyset,
+            'retrieve': self.retrieve,
+            'stats': self.stats,
+            'changes': self.changes,
+            'create': self.create,
+            'bulk create': self.bulk_create,
+            'accept': self.accept,
+            'fail': self.fail,
+            'delete': self.delete,
+        }
+
+
+@suite('endpoints')
+def endpoints_suite(options: dict, stdout):
+    """
+    Scripted scenarios against every orders endpoint in process, each one
+    is run --requests times by --concurrency threads. Throttling and response
+    cache are off, so database and serialization work is measured.
+    """
+    concurrency = options['concurrency'] or 1
+    requests_qty = options['requests'] or 200
+    selected = options.get('scenarios')
+    scenarios = EndpointScenarios(seed=options.get('seed', 0),
+                                  pool_size=requests_qty + 1)  # warm up too.
+    results = {}
+    with override_settings(ORDERS_THROTTLE={'ENABLED': False},
+                           ORDERS_RESPONSE_CACHE={'ENABLED': False}):
+        for name, send in scenarios.get_cases().items():
+            if selected and name not in selected:
+                continue
+            send()  # warm up.
+            timings, errors, elapsed = run_load(send, requests_qty,
+                                                concurrency)
+            results[name] = load_summary(timings, elapsed)
+            line = f'{name}: ' + format_load_summary(results[name])
+            if errors:
+                line += f'  errors: {dict(errors)}'
+            stdout.write(line)
+    return results
@@ -0,0 +1,276 @@
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from rest_framework.response import Response
+
+from . import metrics
+from .models import Product
+
+
+PRODUCT_CACHE_DEFAULTS = {
+    'MAX_SIZE': 1024,
+    'TIMEOUT': 300,
+}
+PRODUCTS_VERSION_KEY = 'orders:version:products'
+
+
+def _new_version() -> str:
+    # random tokens instead of counters, so version lost by cache eviction
+    # could never be issued again for other data.
+    return uuid.uuid4().hex
+
+
+class ProductCache:
+    """
+    In-process LRU cache of products by id. Entries expire after timeout
+    seconds. Every change of products bumps their version in django cache,
+    all entries are dropped once it differs from the version they were read
+    under. Version is checked at start of every request, so with shared cache
+    backend changes made by other processes are applied by the next request,
+    otherwise after timeout. Hits and misses are counted in metrics too.
+    """
+    version_key = PRODUCTS_VERSION_KEY
+
+    def __init__(self, max_size: int, timeout: float):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get_many(self, product_ids) -> dict:
+        """
+        Return mapping of product id to product for ids present in database.
+        Only ids missing in cache are fetched, all of them with one query.
+        """
+        found = {}
+        missing = set()
+        now = time.monotonic()
+        with self._lock:
+            for product_id in set(product_ids):
+                item = self._items.get(product_id)
+                if item is None or item[1] <= now:
+                    missing.add(product_id)
+                    continue
+                self._items.move_to_end(product_id)
+                found[product_id] = item[0]
+            self.hits += len(found)
+            self.misses += len(missing)
+        metrics.registry.inc('orders_product_cache_hits', len(found))
+        metrics.registry.inc('orders_product_cache_misses', len(missing))
+        if missing:
+            fetched = Product.objects.in_bulk(missing)
+            self.set_many(fetched)
+            found.update(fetched)
+        return found
+
+    def check_version(self):
+        """Drop all entries if products were changed by other process."""
+        version = cache.get(self.version_key)
+        with self._lock:
+            if version != self._version:
+                self._items.clear()
+                self._version = version
+
+    def get(self, product_id):
+        """Return product with given id or None if there is no such one."""
+        return self.get_many([product_id]).get(product_id)
+
+    def set_many(self, products: dict):
+        expires_at = time.monotonic() + self.timeout
+        with self._lock:
+            for product_id, product in products.items():
+                self._items[product_id] = (product, expires_at)
+                self._items.move_to_end(product_id)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def _bump_version(self):
+        cache.set(self.version_key, _new_version(), timeout=None)
+
+    def invalidate(self, product_id):
+        """
+        Drop changed product here and make other processes drop their
+        entries, once more after commit as they could read it before.
+        """
+        with self._lock:
+            self._items.pop(product_id, None)
+        self._bump_version()
+        transaction.on_commit(self._bump_version)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'size': len(self._items),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+def get_product_cache_settings() -> dict:
+    return {**PRODUCT_CACHE_DEFAULTS,
+            **getattr(settings, 'ORDERS_PRODUCT_CACHE', {})}
+
+
+_product_cache_settings = get_product_cache_settings()
+
+product_cache = ProductCache(
+    max_size=_product_cache_settings['MAX_SIZE'],
+    timeout=_product_cache_settings['TIMEOUT'],
+)
+
+
+# cached responses are invalidated through django cache, so they should be
+# enabled with cache backend shared by all processes only.
+RESPONSE_CACHE_DEFAULTS = {
+    'ENABLED': False,
+    'TIMEOUT': 300,
+}
+RESPONSE_CACHED_HEADERS = ('Content-Type', 'Content-Range', 'Link',
+                           'X-Total-Count')
+
+ALL_ORDERS_VERSION_KEY = 'orders:version:all'
+ORDERS_LIST_VERSION_KEY = 'orders:version:list'
+ORDER_VERSION_KEY = 'orders:version:order:{}'
+
+
+def get_response_cache_settings() -> dict:
+    return {**RESPONSE_CACHE_DEFAULTS,
+            **getattr(settings, 'ORDERS_RESPONSE_CACHE', {})}
+
+
+def get_versions(*keys) -> list:
+    """Return current versions of given keys, missing ones are created."""
+    versions = cache.get_many(keys)
+    missing = {key: _new_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def _bump_versions(order_ids):
+    keys = [ORDERS_LIST_VERSION_KEY]
+    if order_ids is None:
+        keys.append(ALL_ORDERS_VERSION_KEY)
+    else:
+        keys.extend(ORDER_VERSION_KEY.format(pk) for pk in order_ids)
+    cache.set_many({key: _new_version() for key in keys}, timeout=None)
+
+
+def invalidate_orders(order_ids=None):
+    """
+    Drop cached responses containing given orders and all cached lists.
+    :param order_ids: ids of changed orders, None if any order could change.
+    """
+    order_ids = None if order_ids is None else list(order_ids)
+    _bump_versions(order_ids)
+    # responses rendered from data read before commit could be stored under
+    # new versions while transaction is running, so bump them once more.
+    transaction.on_commit(lambda: _bump_versions(order_ids))
+
+
+class ResponseCacheMixin:
+    """
+    Cache rendered JSON responses of list and retrieve actions under versions
+    of orders they contain. Responses are returned with strong ETag,
+    'If-None-Match' requests are answered with 304 from cache without
+    touching database and serializers.
+    """
+    cached_actions = ('list', 'retrieve')
+
+    def get_response_cache_key(self, request):
+        if self.action == 'list':
+            versions = get_versions(ALL_ORDERS_VERSION_KEY,
+                                    ORDERS_LIST_VERSION_KEY)
+        else:
+            versions = get_versions(
+                ALL_ORDERS_VERSION_KEY,
+                ORDER_VERSION_KEY.format(self.kwargs.get(self.lookup_field)),
+            )
+        request_hash = hashlib.md5(
+            request.get_full_path().encode()).hexdigest()
+        return (f'orders:response:{self.action}:{":".join(versions)}:'
+                f'{request_hash}')
+
+    def is_response_cacheable(self, request) -> bool:
+        return (
+            self.action in self.cached_actions
+            and request.method == 'GET'
+            and request.accepted_renderer.format == 'json'
+            and get_response_cache_settings()['ENABLED']
+        )
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.response_cache_key = None
+        if self.is_response_cacheable(request):
+            self.response_cache_key = self.get_response_cache_key(request)
+
+    def get_cached_response(self, request):
+        cached = cache.get(self.response_cache_key)
+        if cached is None:
+            return None
+        content, headers = cached
+        if self.is_not_modified(request, headers['ETag']):
+            return HttpResponseNotModified(headers={'ETag': headers['ETag']})
+        return HttpResponse(content, headers=headers)
+
+    @staticmethod
+    def is_not_modified(request, etag) -> bool:
+        if_none_match = request.headers.get('If-None-Match')
+        if not if_none_match:
+            return False
+        return if_none_match.strip() == '*' or etag in (
+            tag.strip() for tag in if_none_match.split(',')
+        )
+
+    def list(self, request, *args, **kwargs):
+        if self.response_cache_key:
+            response = self.get_cached_response(request)
+            if response is not None:
+                return response
+        return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        if self.response_cache_key:
+            response = self.get_cached_response(request)
+            if response is not None:
+                return response
+        return super().retrieve(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs)
+        if (not getattr(self, 'response_cache_key', None)
+                or not isinstance(response, Response)
+                or response.status_code != 200):
+            return response
+
+        response.render()
+        etag = '"{}"'.format(hashlib.sha1(response.content).hexdigest())
+        response['ETag'] = etag
+        headers = {header: response[header]
+                   for header in RESPONSE_CACHED_HEADERS + ('ETag',)
+                   if header in response}
+        cache.set(self.response_cache_key, (response.content, headers),
+                  get_response_cache_settings()['TIMEOUT'])
+        if self.is_not_modified(request, etag):
+            return HttpResponseNotModified(headers={'ETag': etag})
+        return response
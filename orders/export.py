@@ -0,0 +1,76 @@
+import csv
+import io
+
+from django.db.models import Prefetch, prefetch_related_objects
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import OrderDetail
+from .serializers import OrderSerializer
+
+
+EXPORT_CHUNK_SIZE = 1000
+CSV_COLUMNS = (
+    'order_id', 'status', 'created_at', 'external_id',
+    'detail_id', 'product_id', 'product_name', 'amount', 'price',
+)
+
+
+def iter_order_chunks(queryset, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """
+    Walk through queryset ordered by id with keyset queries, yield lists of
+    serialized orders, at most chunk_size in each. Details and products are
+    loaded by one query per chunk, so memory use does not depend on total
+    amount of orders.
+    """
+    queryset = queryset.order_by('id')
+    last_id = None
+    while True:
+        chunk_queryset = queryset
+        if last_id is not None:
+            chunk_queryset = queryset.filter(id__gt=last_id)
+        orders = list(chunk_queryset[:chunk_size])
+        if not orders:
+            return
+        prefetch_related_objects(orders, Prefetch(
+            'details',
+            queryset=OrderDetail.objects.select_related(
+                'product').order_by('id'),
+        ))
+        yield OrderSerializer(orders, many=True).data
+        if len(orders) < chunk_size:
+            return
+        last_id = orders[-1].id
+
+
+def iter_ndjson(queryset, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Yield orders of queryset as JSON lines, one chunk at once."""
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for orders in iter_order_chunks(queryset, chunk_size):
+        yield ''.join(encoder.encode(order) + '\n' for order in orders)
+
+
+def iter_csv(queryset, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Yield CSV header and one row per order detail, one chunk at once."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for orders in iter_order_chunks(queryset, chunk_size):
+        for order in orders:
+            for detail in order['details']:
+                writer.writerow((
+                    order['id'], order['status'], order['created_at'],
+                    order['external_id'], detail['id'],
+                    detail['product']['id'], detail['product']['name'],
+                    detail['amount'], detail['price'],
+                ))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():  # header of empty export.
+        yield buffer.getvalue()
+
+
+EXPORTERS = {
+    'ndjson': iter_ndjson,
+    'csv': iter_csv,
+}
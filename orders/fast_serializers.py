@@ -0,0 +1,186 @@
+"""
+Read only serialization of orders, which builds the same output as
+OrderSerializer from flat values() rows instead of model instances and
+serializer fields.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+
+from .metrics import timed
+from .models import OrderDetail
+from .serializers import EXPANSIONS, OrderDetailSerializer, OrderSerializer
+
+
+ORDER_FIELDS = ('id', 'status', 'created_at', 'external_id')
+DETAIL_FIELDS = ('order_id', 'id', 'product_id', 'product__name', 'amount',
+                 'price')
+DETAIL_FIELDS_WITHOUT_PRODUCT = ('order_id', 'id', 'product_id', 'amount',
+                                 'price')
+SNAPSHOT_FIELD = 'details_snapshot'
+
+_formatters = {}
+
+
+def get_formatters() -> tuple:
+    """
+    Return to_representation of created_at and price serializer fields, so
+    output format follows DATETIME_FORMAT and decimal settings of DRF.
+    """
+    if not _formatters:
+        _formatters['created_at'] = (
+            OrderSerializer().fields['created_at'].to_representation)
+        _formatters['price'] = (
+            OrderDetailSerializer().fields['price'].to_representation)
+    return _formatters['created_at'], _formatters['price']
+
+
+def get_order_rows(queryset, with_snapshot: bool = False):
+    """
+    Turn orders queryset into queryset of flat rows for serialize_orders.
+    :param with_snapshot: include details snapshots, so details of orders
+    having them are not fetched.
+    """
+    fields = ORDER_FIELDS
+    if with_snapshot:
+        fields += (SNAPSHOT_FIELD,)
+    return queryset.prefetch_related(None).values(*fields)
+
+
+def get_details(order_ids, expand_product: bool = True) -> dict:
+    """
+    Fetch details of orders with one query, joined with products if
+    expand_product.
+    :return: mapping of order id to list of represented details.
+    """
+    _, format_price = get_formatters()
+    details = (
+        OrderDetail.objects
+        .filter(order_id__in=order_ids)
+        .order_by('id')
+    )
+    if expand_product:
+        detail_rows = (
+            (order_id, pk, {'id': product_id, 'name': product_name}, amount,
+             price)
+            for order_id, pk, product_id, product_name, amount, price in
+            details.values_list(*DETAIL_FIELDS)
+        )
+    else:
+        detail_rows = (
+            (order_id, pk, {'id': product_id}, amount, price)
+            for order_id, pk, product_id, amount, price in
+            details.values_list(*DETAIL_FIELDS_WITHOUT_PRODUCT)
+        )
+    details_by_order = defaultdict(list)
+    for order_id, pk, product, amount, price in detail_rows:
+        details_by_order[order_id].append({
+            'id': pk,
+            'product': product,
+            'amount': amount,
+            'price': format_price(price),
+        })
+    return details_by_order
+
+
+def serialize_orders(order_rows, fields=None,
+                     expand=EXPANSIONS) -> list:
+    """
+    Build representation of orders given as values() rows, details of all
+    of them are fetched with one query joined with products.
+    :param order_rows: dicts with ORDER_FIELDS keys and optionally with
+    details snapshot.
+    :param fields: names of represented fields, all of them by default.
+    :param expand: expansions as for OrderSerializer, details are not
+    fetched without 'details' and products are not joined without
+    'details.product'.
+    :return: list of dicts equal to OrderSerializer(many=True, fields=fields,
+    expand=expand).data.
+    """
+    with timed('serialize'):
+        return _serialize_orders(order_rows, fields, expand)
+
+
+def _serialize_orders(order_rows, fields, expand) -> list:
+    format_created_at, _ = get_formatters()
+    with_details = 'details' in expand and (fields is None
+                                            or 'details' in fields)
+    expand_product = 'details.product' in expand
+    orders = []
+    details_by_order = {}  # orders without snapshot.
+    for row in order_rows:
+        order = {
+            'id': row['id'],
+            'status': row['status'],
+            'created_at': format_created_at(row['created_at']),
+            'external_id': row['external_id'],
+        }
+        if with_details:
+            snapshot = row.get(SNAPSHOT_FIELD)
+            if snapshot is None:
+                order['details'] = details_by_order[row['id']] = []
+            elif expand_product:
+                order['details'] = snapshot
+            else:
+                order['details'] = [
+                    {**detail, 'product': {'id': detail['product']['id']}}
+                    for detail in snapshot
+                ]
+        if fields is not None:
+            order = {name: order[name] for name in OrderSerializer.Meta.fields
+                     if name in fields and name in order}
+        orders.append(order)
+    if details_by_order:
+        fetched = get_details(details_by_order, expand_product)
+        for order_id, details in details_by_order.items():
+            details.extend(fetched.get(order_id, ()))
+    return orders
+
+
+def is_fast_serialization_enabled() -> bool:
+    return getattr(settings, 'ORDERS_FAST_SERIALIZATION', False)
+
+
+def is_snapshot_enabled() -> bool:
+    return getattr(settings, 'ORDERS_DETAILS_SNAPSHOT', False)
+
+
+class FastReadMixin:
+    """
+    Serve list and retrieve actions with serialize_orders when
+    ORDERS_FAST_SERIALIZATION or ORDERS_DETAILS_SNAPSHOT setting is on, in
+    the latter case details are taken from snapshots.
+    """
+
+    def get_representation(self) -> tuple:
+        """Return (fields, expand) orders are serialized with."""
+        return None, EXPANSIONS
+
+    def get_fast_rows(self, fields, expand):
+        with_snapshot = is_snapshot_enabled() and 'details' in expand and (
+            fields is None or 'details' in fields)
+        return get_order_rows(self.filter_queryset(self.get_queryset()),
+                              with_snapshot)
+
+    def list(self, request, *args, **kwargs):
+        if not (is_fast_serialization_enabled() or is_snapshot_enabled()):
+            return super().list(request, *args, **kwargs)
+        fields, expand = self.get_representation()
+        rows = self.get_fast_rows(fields, expand)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(
+                serialize_orders(page, fields, expand))
+        return Response(serialize_orders(rows, fields, expand))
+
+    def retrieve(self, request, *args, **kwargs):
+        if not (is_fast_serialization_enabled() or is_snapshot_enabled()):
+            return super().retrieve(request, *args, **kwargs)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        fields, expand = self.get_representation()
+        row = get_object_or_404(
+            self.get_fast_rows(fields, expand),
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return Response(serialize_orders([row], fields, expand)[0])
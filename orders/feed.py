@@ -0,0 +1,208 @@
+"""
+Change feed of orders. Every create, update, status change and deletion
+done by orders services appends OrderEvent in the same transaction, so
+consumers read only changes after sequence number they have seen instead of
+listing orders again. Sequence numbers are given by readers to committed
+events, so event committed later than others never gets lower number and
+consumer's cursor does not skip it, while writers take no locks. Events are
+read in batches by long-poll or streamed as Server-Sent Events. Events older
+than RETENTION_DAYS are compacted by `manage.py compact_order_events`: only
+the latest event of every existing order is kept, so consumer starting from 0
+still gets every order once. Consumers lagging more than RETENTION_DAYS could
+miss deletions.
+"""
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import BigIntegerField, Case, F, Max, Value, When
+from django.utils import timezone
+
+from .models import EventType, OrderEvent
+
+
+FEED_DEFAULTS = {
+    'ENABLED': True,
+    'RETENTION_DAYS': 7,
+    'POLL_TIMEOUT': 30,
+    'POLL_INTERVAL': 1,
+    'STREAM_TIMEOUT': 300,
+}
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+COMPACT_BATCH_SIZE = 1000
+# key of PostgreSQL advisory lock taken by reader numbering events.
+NUMBERING_LOCK_KEY = 0x6f726465
+
+# after: sequence number of the last seen event, limit: events read at once,
+# status: of orders after events or None, wait: long-poll seconds.
+FeedQuery = namedtuple('FeedQuery', ('after', 'limit', 'status', 'wait'))
+
+
+def get_feed_settings() -> dict:
+    return {**FEED_DEFAULTS, **getattr(settings, 'ORDERS_CHANGE_FEED', {})}
+
+
+def is_feed_enabled() -> bool:
+    return get_feed_settings()['ENABLED']
+
+
+def _number_events() -> int:
+    """
+    Give committed events without sequence numbers next ones in order of
+    their ids, MAX_LIMIT events at most.
+    :return: amount of numbered events.
+    """
+    event_ids = list(
+        OrderEvent.objects.filter(seq__isnull=True)
+        .order_by('id').values_list('id', flat=True)[:MAX_LIMIT]
+    )
+    if not event_ids:
+        return 0
+    head = OrderEvent.objects.aggregate(head=Max('seq'))['head'] or 0
+    return OrderEvent.objects.filter(id__in=event_ids).update(seq=Case(
+        *(When(id=event_id, then=Value(head + idx))
+          for idx, event_id in enumerate(event_ids, 1)),
+        output_field=BigIntegerField(),
+    ))
+
+
+def publish_events():
+    """
+    Number events committed since the previous read. SQLite allows one
+    writer, which commits before the next one inserts events, so ids are in
+    order of commits there and become numbers as is. Elsewhere events are
+    numbered in order they are seen committed: on PostgreSQL by one reader
+    at once, others read ones numbered so far; on other databases readers
+    numbering the same events conflict on unique seq and numbers of the
+    first one are kept.
+    """
+    if not OrderEvent.objects.filter(seq__isnull=True).exists():
+        return
+    if connection.vendor == 'sqlite':
+        OrderEvent.objects.filter(seq__isnull=True).update(seq=F('id'))
+        return
+    try:
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT pg_try_advisory_xact_lock(%s)',
+                                   [NUMBERING_LOCK_KEY])
+                    if not cursor.fetchone()[0]:
+                        return
+            while _number_events() == MAX_LIMIT:
+                pass
+    except IntegrityError:
+        pass
+
+
+def record_events(event_type: str, rows):
+    """
+    Append events of changed orders, should be called in the same
+    transaction as the change.
+    :param rows: (order id, status, external_id) of every order after the
+    change, or before it for deletion.
+    """
+    if not is_feed_enabled():
+        return
+    events = [
+        OrderEvent(order_id=order_id, type=event_type, status=order_status,
+                   external_id=external_id)
+        for order_id, order_status, external_id in rows
+    ]
+    if events:
+        OrderEvent.objects.bulk_create(events, batch_size=MAX_LIMIT)
+
+
+def read_events(after: int, limit: int = DEFAULT_LIMIT,
+                status: str = None) -> tuple:
+    """
+    :param after: sequence number of the last seen event.
+    :param status: read only events leaving orders in this status.
+    :return: (events, sequence number to read next events after).
+    """
+    publish_events()
+    events = OrderEvent.objects.filter(seq__gt=after).order_by('seq')
+    if status is None:
+        events = list(events[:limit])
+        return events, events[-1].seq if events else after
+    # filtered out events are skipped too, newer ones are not visible yet.
+    head = OrderEvent.objects.aggregate(head=Max('seq'))['head'] or 0
+    events = list(events.filter(seq__lte=head, status=status)[:limit])
+    if len(events) == limit:
+        return events, events[-1].seq
+    return events, max(head, after)
+
+
+def wait_events(after: int, limit: int = DEFAULT_LIMIT, status: str = None,
+                timeout: float = 0) -> tuple:
+    """Read events, waiting up to timeout seconds for new ones (long-poll)."""
+    deadline = time.monotonic() + timeout
+    interval = get_feed_settings()['POLL_INTERVAL']
+    while True:
+        events, after = read_events(after, limit, status)
+        remaining = deadline - time.monotonic()
+        if events or remaining <= 0:
+            return events, after
+        time.sleep(min(interval, remaining))
+
+
+def iter_events(after: int, limit: int = DEFAULT_LIMIT, status: str = None,
+                timeout: float = None):
+    """
+    Yield (events, next sequence number) of every read till timeout
+    (STREAM_TIMEOUT by default), reads finding no events are made every
+    POLL_INTERVAL seconds.
+    """
+    feed_settings = get_feed_settings()
+    if timeout is None:
+        timeout = feed_settings['STREAM_TIMEOUT']
+    deadline = time.monotonic() + timeout
+    while True:
+        events, after = read_events(after, limit, status)
+        yield events, after
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        if len(events) < limit:
+            time.sleep(min(feed_settings['POLL_INTERVAL'], remaining))
+
+
+def compact_events(older_than=None,
+                   batch_size: int = COMPACT_BATCH_SIZE) -> int:
+    """
+    Delete events created before older_than (RETENTION_DAYS ago by default)
+    except the latest event of every existing order, every batch in its own
+    transaction.
+    :return: amount of deleted events.
+    """
+    if older_than is None:
+        older_than = timezone.now() - timedelta(
+            days=get_feed_settings()['RETENTION_DAYS'])
+    deleted = 0
+    last_id = 0
+    while True:
+        batch = list(
+            OrderEvent.objects.filter(id__gt=last_id,
+                                      created_at__lt=older_than)
+            .values_list('id', 'order_id', 'type')[:batch_size]
+        )
+        if not batch:
+            return deleted
+        last_id = batch[-1][0]
+        with transaction.atomic():
+            latest = dict(
+                OrderEvent.objects.filter(
+                    order_id__in={order_id for _, order_id, _ in batch})
+                .order_by().values_list('order_id').annotate(Max('id'))
+            )
+            event_ids = [
+                event_id for event_id, order_id, event_type in batch
+                if event_id != latest[order_id]
+                or event_type == EventType.DELETED
+            ]
+            deleted += OrderEvent.objects.filter(id__in=event_ids).delete()[0]
+        if len(batch) < batch_size:
+            return deleted
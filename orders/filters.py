@@ -0,0 +1,38 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
+
+
+UNKNOWN_ORDERING_TEXT = 'Unknown ordering: {}. Available are: {}.'
+
+
+class IndexedOrderingFilter(OrderingFilter):
+    """
+    Ordering chosen by 'ordering' parameter from view.orderings, mapping of
+    option to fields of index it is served by. Options combining fields in
+    other ways are rejected, as they would need to sort all filtered rows.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        option = request.query_params.get(self.ordering_param)
+        if not option:
+            return self.get_default_ordering(view)
+        orderings = view.orderings
+        if option not in orderings:
+            raise ValidationError({self.ordering_param: (
+                UNKNOWN_ORDERING_TEXT.format(option, ', '.join(orderings)))})
+        return orderings[option]
+
+    def get_default_ordering(self, view):
+        """
+        Lists filtered by range of ordering field are ordered by it, so only
+        the range is read from its index.
+        """
+        params = view.request.query_params
+        for option, ordering in view.orderings.items():
+            if not option.startswith('-') and any(
+                    param.startswith(option + '__') for param in params):
+                return ordering
+        return super().get_default_ordering(view)
+
+    def get_valid_fields(self, queryset, view, context={}):
+        return [(option, option) for option in view.orderings]
@@ -0,0 +1,117 @@
+"""
+Requests made with Idempotency-Key header are handled once per key: the key
+is claimed in the same transaction as changes made by the request together
+with its response, retries with the same key get that response back without
+writing again. Concurrent retry waits on the claimed key until the first
+request is committed. Keys expire after ORDERS_IDEMPOTENCY['TIMEOUT']
+seconds, only their digests are stored.
+"""
+import hashlib
+import itertools
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import IdempotencyKey
+
+
+IDEMPOTENCY_DEFAULTS = {
+    'TIMEOUT': 24 * 60 * 60,
+    'PURGE_INTERVAL': 100,
+}
+KEY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+KEY_TOO_LONG_TEXT = f'{KEY_HEADER} should not be longer than ' \
+                    f'{MAX_KEY_LENGTH} characters.'
+KEY_REUSED_TEXT = f'{KEY_HEADER} is already used for other request.'
+
+_claims = itertools.count(1)
+
+
+def get_idempotency_settings() -> dict:
+    return {**IDEMPOTENCY_DEFAULTS,
+            **getattr(settings, 'ORDERS_IDEMPOTENCY', {})}
+
+
+def get_digest(*parts: str) -> str:
+    return hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+
+
+def get_key_digest(request, key: str) -> str:
+    """Keys of different users do not collide."""
+    user_id = request.user.pk if request.user.is_authenticated else ''
+    return get_digest(str(user_id), request.method, request.path, key)
+
+
+def get_request_digest(request) -> str:
+    return get_digest(json.dumps(request.data, cls=JSONEncoder,
+                                 sort_keys=True))
+
+
+def replay(stored: IdempotencyKey, request_digest: str) -> Response:
+    if stored.request != request_digest:
+        return Response(KEY_REUSED_TEXT,
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    return Response(json.loads(stored.response),
+                    status=stored.status_code,
+                    headers={REPLAYED_HEADER: 'true'})
+
+
+def purge_expired_keys(now=None) -> int:
+    return IdempotencyKey.objects.filter(
+        expires_at__lte=now or timezone.now()).delete()[0]
+
+
+def _claim(key_digest: str, request_digest: str, now) -> IdempotencyKey:
+    idempotency_settings = get_idempotency_settings()
+    if next(_claims) % idempotency_settings['PURGE_INTERVAL'] == 0:
+        purge_expired_keys(now)
+    else:
+        IdempotencyKey.objects.filter(key=key_digest,
+                                      expires_at__lte=now).delete()
+    return IdempotencyKey.objects.create(
+        key=key_digest, request=request_digest,
+        expires_at=now + timedelta(seconds=idempotency_settings['TIMEOUT']),
+    )
+
+
+def run_once(request, handler) -> Response:
+    """
+    Return response of handler, or response stored for Idempotency-Key of
+    request if it was handled already. Exception raised by handler rolls
+    back its changes and the key, so request could be retried.
+    :param handler: callable returning Response, all its changes are made
+    in one transaction with the key.
+    """
+    key = request.headers.get(KEY_HEADER)
+    if not key:
+        return handler()
+    if len(key) > MAX_KEY_LENGTH:
+        raise ValidationError({KEY_HEADER: KEY_TOO_LONG_TEXT})
+    key_digest = get_key_digest(request, key)
+    request_digest = get_request_digest(request)
+    now = timezone.now()
+    stored = IdempotencyKey.objects.filter(
+        key=key_digest, expires_at__gt=now).first()
+    if stored is not None:
+        return replay(stored, request_digest)
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                claimed = _claim(key_digest, request_digest, now)
+        except IntegrityError:  # claimed by concurrent request meanwhile.
+            return replay(IdempotencyKey.objects.get(key=key_digest),
+                          request_digest)
+        response = handler()
+        claimed.status_code = response.status_code
+        claimed.response = json.dumps(response.data, cls=JSONEncoder)
+        claimed.save(update_fields=('status_code', 'response'))
+    return response
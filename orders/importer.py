@@ -0,0 +1,264 @@
+"""
+Import of orders from JSON lines or CSV files. Records are parsed and
+validated by OrderSerializer in pool of processes, valid ones are written by
+batched inserts in one transaction per batch. Progress is saved to checkpoint
+in the same transaction as the batch, so interrupted import is resumed right
+after the last committed batch and no orders are imported twice.
+"""
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import as_serializer_error
+
+from . import services
+from .cache import product_cache
+from .models import ImportCheckpoint
+from .serializers import OrderSerializer
+from .services import NO_DETAILS_TEXT, NO_PRODUCT_FOUND_TEXT
+
+
+IMPORT_BATCH_SIZE = 1000
+VALIDATION_CHUNK_SIZE = 200
+FORMATS = ('jsonl', 'csv')
+
+
+def guess_format(path: str) -> str:
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def read_jsonl(source):
+    """Yield (line number, raw line) for every non blank line."""
+    for line_no, line in enumerate(source, start=1):
+        if line.strip():
+            yield line_no, line.rstrip('\r\n')
+
+
+def read_csv(source):
+    """
+    Yield (line number, order data) from CSV with columns of orders export,
+    row per order detail. Consecutive rows with the same order_id (or
+    external_id, if there is no order_id column) make one order.
+    """
+    reader = csv.DictReader(source)
+    group_column = 'order_id' if 'order_id' in (reader.fieldnames or ()) \
+        else 'external_id'
+    rows = ((reader.line_num, row) for row in reader)
+    for _, group in itertools.groupby(rows, key=lambda item: item[1].get(
+            group_column)):
+        group = list(group)
+        details = []
+        for _, row in group:
+            product = {'id': row.get('product_id')}
+            if row.get('product_name'):
+                product['name'] = row['product_name']
+            details.append({'product': product, 'amount': row.get('amount'),
+                            'price': row.get('price')})
+        yield group[0][0], {'external_id': group[0][1].get('external_id'),
+                            'details': details}
+
+
+READERS = {
+    'jsonl': read_jsonl,
+    'csv': read_csv,
+}
+
+
+def validate_records(records: list) -> list:
+    """
+    Parse and validate raw records, is run in worker processes.
+    :param records: (line number, raw line or order data) pairs.
+    :return: (validated data, errors) pair for every record, one of them
+    is None.
+    """
+    # one serializer for all records, so its fields are built once.
+    serializer = OrderSerializer()
+    results = []
+    for _, raw in records:
+        if isinstance(raw, str):
+            try:
+                raw = json.loads(raw)
+            except ValueError as exc:
+                results.append((None, f'Invalid JSON: {exc}'))
+                continue
+        if not isinstance(raw, dict):
+            results.append((None, 'Order should be an object.'))
+            continue
+        try:
+            validated_data = serializer.run_validation(raw)
+        except ValidationError as exc:
+            # plain structures are cheaper to send between processes.
+            errors = json.loads(json.dumps(as_serializer_error(exc)))
+            results.append((None, errors))
+            continue
+        if not validated_data['details']:
+            results.append((None, NO_DETAILS_TEXT))
+        else:
+            results.append((validated_data, None))
+    return results
+
+
+def _iter_chunks(records, chunk_size: int):
+    while True:
+        chunk = list(itertools.islice(records, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _iter_results(chunk: list, results: list):
+    for (line_no, raw), (validated_data, errors) in zip(chunk, results):
+        yield line_no, raw, validated_data, errors
+
+
+def iter_validated(records, workers: int = 0,
+                   chunk_size: int = VALIDATION_CHUNK_SIZE):
+    """
+    Validate records by chunks in pool of workers processes or in this
+    process if workers is 0. At most two chunks per worker are in flight,
+    so memory use does not depend on size of input.
+    :return: iterator of (line number, raw record, validated data, errors)
+    in the order of records.
+    """
+    chunks = _iter_chunks(iter(records), chunk_size)
+    if not workers:
+        for chunk in chunks:
+            yield from _iter_results(chunk, validate_records(chunk))
+        return
+
+    # spawned workers do not inherit database connections of this process.
+    with ProcessPoolExecutor(max_workers=workers,
+                             mp_context=multiprocessing.get_context('spawn'),
+                             initializer=django.setup) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append((chunk, executor.submit(validate_records, chunk)))
+            if len(pending) >= workers * 2:
+                chunk, future = pending.popleft()
+                yield from _iter_results(chunk, future.result())
+        while pending:
+            chunk, future = pending.popleft()
+            yield from _iter_results(chunk, future.result())
+
+
+def load_checkpoint(name: str) -> dict:
+    checkpoint = ImportCheckpoint.objects.filter(name=name).first()
+    return checkpoint.progress if checkpoint else {}
+
+
+def save_checkpoint(name: str, progress: dict):
+    """Should be called in the transaction of the batch it is saved after."""
+    ImportCheckpoint.objects.update_or_create(
+        name=name, defaults={'progress': progress})
+
+
+def _write_reject(rejects, line_no: int, raw, errors):
+    rejects.write(json.dumps({'line': line_no, 'record': raw,
+                              'errors': errors}, ensure_ascii=False) + '\n')
+
+
+def write_batch(batch: list, rejects) -> int:
+    """
+    Insert valid orders of batch in one transaction, orders referencing
+    missing products are rejected.
+    :param batch: (line number, raw record, validated data) triples.
+    :return: amount of inserted orders.
+    """
+    product_cache.check_version()
+    products = services.get_products(
+        product_id
+        for _, _, validated_data in batch
+        for product_id in services.get_detail_product_ids(
+            validated_data['details'])
+    )
+    creatable = []
+    for line_no, raw, validated_data in batch:
+        product_ids = services.get_detail_product_ids(
+            validated_data['details'])
+        if all(product_id in products for product_id in product_ids):
+            creatable.append(validated_data)
+        else:
+            _write_reject(rejects, line_no, raw, NO_PRODUCT_FOUND_TEXT)
+    if creatable:
+        services.create_orders(creatable, products)
+    return len(creatable)
+
+
+def import_orders(path: str, fmt: str = None,
+                  batch_size: int = IMPORT_BATCH_SIZE, workers: int = 0,
+                  chunk_size: int = VALIDATION_CHUNK_SIZE,
+                  checkpoint_name: str = None, rejects_path: str = None,
+                  restart: bool = False, stdout=None) -> dict:
+    """
+    Import orders from file, continue from checkpoint if there is one.
+    :param fmt: 'jsonl' or 'csv', guessed from file extension by default.
+    :param batch_size: amount of records committed in one transaction.
+    :param workers: amount of validating processes, 0 validates in this one.
+    :param checkpoint_name: defaults to absolute path of file.
+    :param rejects_path: JSON lines file of rejected records with errors,
+    defaults to path with '.rejects' suffix.
+    :param restart: ignore checkpoint and import whole file again.
+    :return: progress with amount of processed records, imported and
+    rejected orders and records per second rate of this run.
+    """
+    fmt = fmt or guess_format(path)
+    checkpoint_name = checkpoint_name or os.path.abspath(path)
+    rejects_path = rejects_path or path + '.rejects'
+    progress = {'records': 0, 'imported': 0, 'rejected': 0,
+                'rejects_size': 0}
+    if not restart:
+        progress.update(load_checkpoint(checkpoint_name))
+    resumed_from = progress['records']
+
+    started = time.perf_counter()
+
+    def get_rate() -> float:
+        elapsed = time.perf_counter() - started
+        return (progress['records'] - resumed_from) / elapsed if elapsed else 0
+
+    with open(path, newline='', encoding='utf-8') as source, \
+            open(rejects_path, 'a', encoding='utf-8') as rejects:
+        # rejects written after the last checkpoint are written again.
+        rejects.truncate(progress['rejects_size'])
+        records = itertools.islice(READERS[fmt](source), resumed_from, None)
+        batch = []
+        batch_records = 0
+
+        def commit_batch():
+            nonlocal batch, batch_records
+            with transaction.atomic():
+                imported = write_batch(batch, rejects)
+                progress['imported'] += imported
+                progress['rejected'] += len(batch) - imported
+                progress['records'] += batch_records
+                rejects.flush()
+                progress['rejects_size'] = rejects.tell()
+                save_checkpoint(checkpoint_name, progress)
+            batch, batch_records = [], 0
+            if stdout is not None:
+                stdout.write(
+                    f'{progress["records"]} records: {progress["imported"]} '
+                    f'imported, {progress["rejected"]} rejected, '
+                    f'{get_rate():.0f} records/s')
+
+        for line_no, raw, validated_data, errors in iter_validated(
+                records, workers, chunk_size):
+            batch_records += 1
+            if errors is None:
+                batch.append((line_no, raw, validated_data))
+            else:
+                _write_reject(rejects, line_no, raw, errors)
+                progress['rejected'] += 1
+            if batch_records >= batch_size:
+                commit_batch()
+        if batch_records:
+            commit_batch()
+    return {**progress, 'rate': get_rate()}
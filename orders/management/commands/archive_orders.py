@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders.archive import archive_orders, get_archive_settings
+
+
+class Command(BaseCommand):
+    help = ('Move accepted and failed orders older than given age into '
+            'archive table, they stay available read only.')
+
+    def add_arguments(self, parser):
+        archive_settings = get_archive_settings()
+        parser.add_argument(
+            '--age-days', type=int, default=archive_settings['AGE_DAYS'],
+            help='Archive orders created more than this days ago.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=archive_settings['BATCH_SIZE'],
+            help='Orders archived in one transaction.',
+        )
+
+    def handle(self, *args, **options):
+        older_than = timezone.now() - timedelta(days=options['age_days'])
+        archived = archive_orders(older_than, options['batch_size'])
+        self.stdout.write(f'Archived {archived} orders created before '
+                          f'{older_than:%Y-%m-%d %H:%M:%S}.')
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from orders.models import Order
+from orders.snapshots import SNAPSHOT_BATCH_SIZE, refresh_snapshots
+
+
+class Command(BaseCommand):
+    help = ('Store details snapshots of orders which do not have them, '
+            'e.g. created before ORDERS_DETAILS_SNAPSHOT was turned on.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=SNAPSHOT_BATCH_SIZE,
+            help='Orders updated in one transaction.',
+        )
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Render snapshots of all orders again.',
+        )
+
+    def handle(self, *args, **options):
+        orders = Order.objects.all()
+        if not options['all']:
+            orders = orders.filter(details_snapshot__isnull=True)
+        refreshed = refresh_snapshots(orders, options['batch_size'])
+        self.stdout.write(f'Stored snapshots of {refreshed} orders.')
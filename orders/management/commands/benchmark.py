@@ -0,0 +1,105 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.benchmarks import (SUITES, compare_with_baseline, save_baseline,
+                               seed_orders)
+
+
+# options results depend on, runs with other values are not comparable.
+BASELINE_PARAMS = ('concurrency', 'requests', 'client_delay', 'url')
+DEFAULT_ORDERS = 1_000_000
+# suites measuring other server, local database is not used by them.
+REMOTE_SUITES = ('http',)
+
+
+class Command(BaseCommand):
+    help = 'Run performance benchmark suite against configured database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('suite', choices=sorted(SUITES))
+        parser.add_argument(
+            '--orders', type=int,
+            help=f'Seed orders until there are at least that many of them, '
+                 f'{DEFAULT_ORDERS} by default, http suite seeds none.',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Amount of measured runs of every case.',
+        )
+        parser.add_argument('--limit', type=int, default=25)
+        parser.add_argument('--offset', type=int, default=0)
+        parser.add_argument(
+            '--url', default='http://127.0.0.1:8001/api/v1/orders/',
+            help='Url requested by http suite.',
+        )
+        parser.add_argument(
+            '--concurrency', type=int,
+            help='Amount of concurrent clients, 100 for http suite and 1 '
+                 'for endpoints suite by default.',
+        )
+        parser.add_argument(
+            '--requests', type=int,
+            help='Amount of requests of every case, 1000 for http suite and '
+                 '200 for endpoints suite by default.',
+        )
+        parser.add_argument(
+            '--client-delay', type=float, default=0.0,
+            help='Seconds slow clients wait before finishing request.',
+        )
+        parser.add_argument(
+            '--scenarios', nargs='+',
+            help='Names of endpoints suite scenarios to run, all by default.',
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Random generator seed of request parameters.',
+        )
+        parser.add_argument(
+            '--save-baseline', metavar='PATH',
+            help='Store results of the run as baseline.',
+        )
+        parser.add_argument(
+            '--baseline', metavar='PATH',
+            help='Fail if results are worse than in stored baseline.',
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help='Allowed share of p95 latency growth and throughput drop '
+                 'against baseline.',
+        )
+
+    def handle(self, *args, **options):
+        orders_qty = options['orders']
+        if orders_qty is None:
+            orders_qty = 0 if options['suite'] in REMOTE_SUITES \
+                else DEFAULT_ORDERS
+        if orders_qty:
+            seed_orders(orders_qty, stdout=self.stdout)
+        results = SUITES[options['suite']](options, self.stdout)
+        if not results:
+            if options['baseline'] or options['save_baseline']:
+                raise CommandError(
+                    f'Suite {options["suite"]} does not support baselines.')
+            return
+
+        params = {name: options[name] for name in BASELINE_PARAMS}
+        if options['save_baseline']:
+            save_baseline(options['save_baseline'], options['suite'], params,
+                          results)
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as baseline:
+                baseline = json.load(baseline)
+            if baseline['suite'] != options['suite']:
+                raise CommandError(
+                    f'Baseline is stored for suite {baseline["suite"]}.')
+            if baseline['params'] != params:
+                raise CommandError(
+                    f'Baseline is stored with other options: '
+                    f'{baseline["params"]}.')
+            regressions = compare_with_baseline(
+                results, baseline['results'], options['tolerance'])
+            if regressions:
+                raise CommandError('Performance regression:\n'
+                                   + '\n'.join(regressions))
+            self.stdout.write('No regressions against baseline.')
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.models import Order
+from orders.snapshots import SNAPSHOT_BATCH_SIZE, check_snapshots
+
+
+class Command(BaseCommand):
+    help = ('Find orders which details snapshots differ from their details, '
+            'fails if there are any unless they are repaired.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repair', action='store_true',
+            help='Store fresh snapshots of drifted orders.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=SNAPSHOT_BATCH_SIZE,
+            help='Orders checked in one transaction.',
+        )
+
+    def handle(self, *args, **options):
+        drifted = check_snapshots(Order.objects.all(), options['repair'],
+                                  options['batch_size'])
+        if not drifted:
+            self.stdout.write('All snapshots match details.')
+            return
+        ids = ', '.join(map(str, drifted[:20]))
+        if len(drifted) > 20:
+            ids += ', ...'
+        if not options['repair']:
+            raise CommandError(
+                f'{len(drifted)} orders have stale snapshots: {ids}.')
+        self.stdout.write(f'Repaired snapshots of {len(drifted)} orders: '
+                          f'{ids}.')
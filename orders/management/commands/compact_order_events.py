@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders.feed import COMPACT_BATCH_SIZE, compact_events, get_feed_settings
+
+
+class Command(BaseCommand):
+    help = ('Delete change feed events older than given age, except the '
+            'latest event of every existing order.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days', type=int,
+            default=get_feed_settings()['RETENTION_DAYS'],
+            help='Compact events created more than this days ago.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=COMPACT_BATCH_SIZE,
+            help='Events compacted in one transaction.',
+        )
+
+    def handle(self, *args, **options):
+        older_than = timezone.now() - timedelta(
+            days=options['retention_days'])
+        deleted = compact_events(older_than, options['batch_size'])
+        self.stdout.write(f'Deleted {deleted} events created before '
+                          f'{older_than:%Y-%m-%d %H:%M:%S}.')
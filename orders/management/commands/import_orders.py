@@ -0,0 +1,56 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from orders.importer import (FORMATS, IMPORT_BATCH_SIZE, VALIDATION_CHUNK_SIZE,
+                             import_orders)
+
+
+class Command(BaseCommand):
+    help = ('Import orders from JSON lines or CSV file, continue from '
+            'checkpoint of interrupted import.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Format of file, guessed from its extension by default.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+            help='Amount of records committed in one transaction.',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Amount of validating processes, 0 validates in this one.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=VALIDATION_CHUNK_SIZE,
+            help='Amount of records validated by worker at once.',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Name of checkpoint, absolute path of file by default.',
+        )
+        parser.add_argument('--rejects', help='Path of rejected records file.')
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Ignore checkpoint and import whole file again.',
+        )
+
+    def handle(self, *args, **options):
+        progress = import_orders(
+            options['path'],
+            fmt=options['format'],
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            checkpoint_name=options['checkpoint'],
+            rejects_path=options['rejects'],
+            restart=options['restart'],
+            stdout=self.stdout,
+        )
+        self.stdout.write(
+            f'Done: {progress["imported"]} imported, '
+            f'{progress["rejected"]} rejected, '
+            f'{progress["rate"]:.0f} records/s.')
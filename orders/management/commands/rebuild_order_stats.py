@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from orders import stats
+
+
+class Command(BaseCommand):
+    help = ('Recalculate order status counters and product totals from '
+            'orders, e.g. after orders were written bypassing the API.')
+
+    def handle(self, *args, **options):
+        stats.rebuild()
+        counts = stats.get_status_counts()
+        self.stdout.write(', '.join(
+            f'{status}: {count}' for status, count in counts.items()))
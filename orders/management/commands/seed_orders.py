@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.benchmarks import seed_orders
+
+
+class Command(BaseCommand):
+    help = ('Add generated orders with details until there are at least '
+            'given amount of them.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('orders', type=int)
+        parser.add_argument(
+            '--products', type=int, default=50,
+            help='Required total amount of products.',
+        )
+        parser.add_argument(
+            '--min-details', type=int, default=1,
+            help='Min amount of details in one order.',
+        )
+        parser.add_argument(
+            '--max-details', type=int, default=3,
+            help='Max amount of details in one order.',
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='Orders creation dates are spread over that many past days.',
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Random generator seed, the same one gives the same data.',
+        )
+
+    def handle(self, *args, **options):
+        if not 1 <= options['min_details'] <= options['max_details']:
+            raise CommandError(
+                'Details amounts should satisfy 1 <= min <= max.')
+        added = seed_orders(
+            options['orders'],
+            products_qty=options['products'],
+            details_per_order=(options['min_details'],
+                               options['max_details']),
+            days=options['days'],
+            seed=options['seed'],
+            stdout=self.stdout,
+        )
+        self.stdout.write(f'Added {added} orders.')
@@ -0,0 +1,434 @@
+"""
+Per-request performance instrumentation. RequestMetricsMiddleware collects
+query count, database time and time of named phases (pagination count,
+serialization, rendering) of every request, returns them in Server-Timing
+header and aggregates them into histograms exposed in Prometheus text format
+by metrics_view. Histograms are kept in memory of every process; with STORE
+set every process adds them to shared SQLite file every FLUSH_INTERVAL
+seconds and metrics_view renders totals of all processes from it.
+"""
+import hmac
+import json
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.deprecation import MiddlewareMixin
+
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                    1, 2.5, 5, 10)
+QUERIES_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+PHASES = ('db', 'count', 'serialize', 'render')
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# counters incremented outside of requests, by name with documentation.
+COUNTERS = {
+    'orders_product_cache_hits': 'Products taken from in-process cache.',
+    'orders_product_cache_misses': 'Products fetched from database by cache.',
+}
+
+METRICS_DEFAULTS = {
+    'STORE': None,
+    'FLUSH_INTERVAL': 5.0,
+    'TOKEN': None,
+}
+
+_current = ContextVar('orders_request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Measurements of one request."""
+    __slots__ = ('started', 'queries', 'timings', 'active', 'view', 'action')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.timings = dict.fromkeys(PHASES, 0.0)
+        self.active = set()
+        self.view = None
+        self.action = None
+
+    def add(self, phase: str, duration: float):
+        self.timings[phase] = self.timings.get(phase, 0.0) + duration
+
+    def get_server_timing(self, total: float) -> str:
+        items = [f'db;dur={self.timings["db"] * 1000:.2f};'
+                 f'desc="{self.queries} queries"']
+        items.extend(f'{phase};dur={self.timings[phase] * 1000:.2f}'
+                     for phase in PHASES[1:] if self.timings[phase])
+        items.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(items)
+
+
+def get_current():
+    """Return metrics of request being handled in this context or None."""
+    return _current.get()
+
+
+@contextmanager
+def activate(request_metrics):
+    """Collect queries and phases run in this context into request_metrics."""
+    token = _current.set(request_metrics)
+    try:
+        yield request_metrics
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def timed(phase: str):
+    """
+    Add duration of the block to phase of current request. Nested blocks of
+    the same phase are counted once.
+    """
+    request_metrics = _current.get()
+    if request_metrics is None or phase in request_metrics.active:
+        yield
+        return
+    request_metrics.active.add(phase)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        request_metrics.add(phase, time.perf_counter() - started)
+        request_metrics.active.discard(phase)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper counting queries of current request."""
+    request_metrics = _current.get()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        request_metrics.queries += 1
+        request_metrics.add('db', time.perf_counter() - started)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """connection_created receiver, adds record_query to new connections."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+class Histogram:
+    """Cumulative histogram with fixed buckets per labels combination."""
+
+    def __init__(self, name: str, documentation: str, buckets: tuple):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self._series = {}
+
+    def _get_series(self, labels: tuple) -> list:
+        series = self._series.get(labels)
+        if series is None:
+            # bucket counters, then +Inf, sum and count.
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) \
+                + [0.0, 0]
+        return series
+
+    def observe(self, labels: tuple, value: float):
+        series = self._get_series(labels)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def get_samples(self) -> dict:
+        """Return mapping of (labels, index in series) to value."""
+        return {(labels, idx): value
+                for labels, series in self._series.items()
+                for idx, value in enumerate(series) if value}
+
+    def add(self, labels: tuple, idx: int, value: float):
+        self._get_series(labels)[idx] += value
+
+    def render(self, label_names: tuple) -> list:
+        lines = [f'# HELP {self.name} {self.documentation}',
+                 f'# TYPE {self.name} histogram']
+        for labels, series in sorted(self._series.items()):
+            label_text = ','.join(f'{name}="{value}"'
+                                  for name, value in zip(label_names, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket'
+                             f'{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {series[-2]}')
+            lines.append(f'{self.name}_count{{{label_text}}} {series[-1]}')
+        return lines
+
+
+class SQLiteMetricsStore:
+    """Samples of metrics added by all processes in SQLite file."""
+
+    def __init__(self, path: str, timeout: float = 0.5):
+        self.path = path
+        self.timeout = timeout
+        self._connection = None
+        self._pid = None
+
+    def get_connection(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():  # connections do not survive fork.
+            self._connection = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None,
+                check_same_thread=False,
+            )
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS metric_sample ('
+                'key TEXT NOT NULL PRIMARY KEY, value REAL NOT NULL)'
+            )
+            self._pid = os.getpid()
+        return self._connection
+
+    def add(self, samples: dict):
+        """
+        :param samples: mapping of (metric, labels, index in series) to
+        value added since the previous call.
+        """
+        self.get_connection().executemany(
+            'INSERT INTO metric_sample (key, value) VALUES (?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = value + excluded.value',
+            [(json.dumps(key), value) for key, value in samples.items()],
+        )
+
+    def read(self) -> dict:
+        rows = self.get_connection().execute(
+            'SELECT key, value FROM metric_sample')
+        return {tuple(tuple(part) if isinstance(part, list) else part
+                      for part in json.loads(key)): value
+                for key, value in rows}
+
+    def clear(self):
+        self.get_connection().execute('DELETE FROM metric_sample')
+
+
+class MetricsRegistry:
+    label_names = ('view', 'action', 'method')
+
+    def __init__(self, store=None, flush_interval: float = 5.0):
+        self.store = store
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        """Start collecting from scratch, should be called under lock."""
+        self._last_flush = time.monotonic()
+        self.requests = {}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.duration = Histogram(
+            'orders_request_duration_seconds',
+            'Total duration of requests.', DURATION_BUCKETS)
+        self.phases = {
+            phase: Histogram(
+                f'orders_request_{phase}_duration_seconds',
+                f'Time of requests spent in {phase} phase.', DURATION_BUCKETS)
+            for phase in PHASES
+        }
+        self.queries = Histogram(
+            'orders_request_queries', 'Database queries per request.',
+            QUERIES_BUCKETS)
+        self.size = Histogram(
+            'orders_response_size_bytes', 'Size of response content.',
+            SIZE_BUCKETS)
+
+    def observe(self, labels: tuple, status_code: int, total: float,
+                request_metrics: RequestMetrics, size: int = None):
+        with self._lock:
+            key = labels + (status_code,)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.duration.observe(labels, total)
+            for phase, histogram in self.phases.items():
+                histogram.observe(labels, request_metrics.timings[phase])
+            self.queries.observe(labels, request_metrics.queries)
+            if size is not None:
+                self.size.observe(labels, size)
+        if (self.store is not None
+                and time.monotonic() - self._last_flush
+                >= self.flush_interval):
+            self.flush()
+
+    def inc(self, name: str, amount: int = 1):
+        """Increment one of COUNTERS."""
+        with self._lock:
+            self.counters[name] += amount
+
+    def get_histograms(self) -> tuple:
+        return (self.duration, *self.phases.values(), self.queries,
+                self.size)
+
+    def get_samples(self) -> dict:
+        """Return mapping of (metric, labels, index in series) to value."""
+        samples = {('orders_requests_total', key, 0): count
+                   for key, count in self.requests.items()}
+        samples.update(((name, (), 0), count)
+                       for name, count in self.counters.items() if count)
+        for histogram in self.get_histograms():
+            for (labels, idx), value in histogram.get_samples().items():
+                samples[histogram.name, labels, idx] = value
+        return samples
+
+    def add_samples(self, samples: dict):
+        histograms = {histogram.name: histogram
+                      for histogram in self.get_histograms()}
+        with self._lock:
+            for (name, labels, idx), value in samples.items():
+                if name == 'orders_requests_total':
+                    self.requests[labels] = \
+                        self.requests.get(labels, 0) + int(value)
+                elif name in self.counters:
+                    self.counters[name] += int(value)
+                elif name in histograms:
+                    histograms[name].add(labels, idx, value)
+
+    def flush(self):
+        """Move samples collected since the previous flush to store."""
+        with self._lock:
+            samples = self.get_samples()
+            self._reset()
+        if not samples:
+            return
+        try:
+            self.store.add(samples)
+        except sqlite3.Error:
+            self.add_samples(samples)  # retried with the next flush.
+
+    def render(self) -> str:
+        """Render metrics of this process or of all processes from store."""
+        if self.store is None:
+            return self.render_samples()
+        self.flush()
+        totals = MetricsRegistry()
+        totals.add_samples(self.store.read())
+        return totals.render_samples()
+
+    def render_samples(self) -> str:
+        with self._lock:
+            lines = ['# HELP orders_requests_total Handled requests.',
+                     '# TYPE orders_requests_total counter']
+            for key, count in sorted(self.requests.items()):
+                label_text = ','.join(
+                    f'{name}="{value}"' for name, value in
+                    zip(self.label_names + ('status',), key))
+                lines.append(f'orders_requests_total{{{label_text}}} {count}')
+            for name, count in self.counters.items():
+                lines.extend((f'# HELP {name} {COUNTERS[name]}',
+                              f'# TYPE {name} counter', f'{name} {count}'))
+            for histogram in self.get_histograms():
+                lines.extend(histogram.render(self.label_names))
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+        if self.store is not None:
+            self.store.clear()
+
+
+def get_metrics_settings() -> dict:
+    return {**METRICS_DEFAULTS, **getattr(settings, 'ORDERS_METRICS', {})}
+
+
+def create_registry() -> MetricsRegistry:
+    metrics_settings = get_metrics_settings()
+    store = None
+    if metrics_settings['STORE']:
+        store = SQLiteMetricsStore(metrics_settings['STORE'])
+    return MetricsRegistry(store, metrics_settings['FLUSH_INTERVAL'])
+
+
+registry = create_registry()
+
+
+def is_metrics_enabled() -> bool:
+    return getattr(settings, 'ORDERS_METRICS_ENABLED', True)
+
+
+def get_view_labels(view_func, method: str) -> tuple:
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return view_func.__name__, ''
+    actions = getattr(view_func, 'actions', None) or {}
+    return view_class.__name__, actions.get(method.lower(), '')
+
+
+class RequestMetricsMiddleware(MiddlewareMixin):
+    """
+    Should be the first middleware, so total duration covers the others and
+    rendering starts right after its process_template_response.
+    """
+
+    def __init__(self, get_response=None):
+        if not is_metrics_enabled():
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_request(self, request):
+        request.metrics = RequestMetrics()
+        request.metrics_token = _current.set(request.metrics)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics.view, request.metrics.action = get_view_labels(
+            view_func, request.method)
+
+    def process_template_response(self, request, response):
+        request_metrics = request.metrics
+        started = time.perf_counter()
+
+        def finish_render(rendered):
+            request_metrics.add('render', time.perf_counter() - started)
+        response.add_post_render_callback(finish_render)
+        return response
+
+    def process_response(self, request, response):
+        request_metrics = getattr(request, 'metrics', None)
+        if request_metrics is None:
+            return response
+        try:
+            _current.reset(request.metrics_token)
+        except ValueError:
+            # async handler runs hooks in copies of context, which are
+            # propagated back to request context.
+            _current.set(None)
+        total = time.perf_counter() - request_metrics.started
+        response['Server-Timing'] = request_metrics.get_server_timing(total)
+        if request_metrics.view is not None:
+            size = None if response.streaming else len(response.content)
+            registry.observe(
+                (request_metrics.view, request_metrics.action,
+                 request.method),
+                response.status_code, total, request_metrics, size,
+            )
+        return response
+
+
+def is_metrics_request_allowed(request) -> bool:
+    """Allow staff users and requests with 'Authorization: Bearer TOKEN'."""
+    token = get_metrics_settings()['TOKEN']
+    if token:
+        authorization = request.headers.get('Authorization', '')
+        if hmac.compare_digest(authorization.encode(),
+                               f'Bearer {token}'.encode()):
+            return True
+    user = getattr(request, 'user', None)
+    return bool(user is not None and user.is_staff)
+
+
+def metrics_view(request):
+    """Aggregated request metrics in Prometheus format."""
+    if not is_metrics_request_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(),
+                        content_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,60 @@
+# Generated by Django 3.2 on 2026-10-18 08:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_stats(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    OrderDetail = apps.get_model('orders', 'OrderDetail')
+    ProductTotal = apps.get_model('orders', 'ProductTotal')
+    StatusCounter = apps.get_model('orders', 'StatusCounter')
+
+    counts = dict(
+        Order.objects.order_by().values_list('status')
+        .annotate(count=models.Count('id'))
+    )
+    StatusCounter.objects.bulk_create(
+        StatusCounter(status=status, count=counts.get(status, 0))
+        for status in ('new', 'accepted', 'failed')
+    )
+    ProductTotal.objects.bulk_create(
+        ProductTotal(product_id=row['product_id'], amount=row['total_amount'],
+                     revenue=row['total_revenue'])
+        for row in OrderDetail.objects.order_by().values('product_id')
+        .annotate(
+            total_amount=models.Sum('amount'),
+            total_revenue=models.Sum(models.ExpressionWrapper(
+                models.F('price') * models.F('amount'),
+                output_field=models.DecimalField(max_digits=20,
+                                                 decimal_places=2),
+            )),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_order_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductTotal',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='total', serialize=False, to='orders.product')),
+                ('amount', models.BigIntegerField(default=0, verbose_name='Amount')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='Revenue')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StatusCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('new', 'New'), ('accepted', 'Accepted'), ('failed', 'Failed')], max_length=12, unique=True, verbose_name='Status')),
+                ('count', models.BigIntegerField(default=0, verbose_name='Orders amount')),
+            ],
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
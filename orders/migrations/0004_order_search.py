@@ -0,0 +1,77 @@
+from django.db import migrations
+
+
+# SQL of search index as of this migration, triggers dropped by later table
+# alterations are restored by orders.search.ensure_search_triggers.
+SEARCH_TABLE = 'orders_order_search'
+TRIGRAM_INDEX = 'order_external_id_trgm_idx'
+
+SQLITE_TRIGGERS = {
+    f'{SEARCH_TABLE}_insert': (
+        'AFTER INSERT ON orders_order BEGIN '
+        f'INSERT INTO {SEARCH_TABLE} (rowid, external_id) '
+        'VALUES (new.id, new.external_id); END'
+    ),
+    f'{SEARCH_TABLE}_delete': (
+        'AFTER DELETE ON orders_order BEGIN '
+        f'INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, external_id) '
+        "VALUES ('delete', old.id, old.external_id); END"
+    ),
+    f'{SEARCH_TABLE}_update': (
+        'AFTER UPDATE OF external_id ON orders_order BEGIN '
+        f'INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, external_id) '
+        "VALUES ('delete', old.id, old.external_id); "
+        f'INSERT INTO {SEARCH_TABLE} (rowid, external_id) '
+        'VALUES (new.id, new.external_id); END'
+    ),
+}
+
+
+def create_index(apps, schema_editor):
+    """
+    Create substring search index of external_id, if database supports it.
+    Existing orders are indexed too.
+    """
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    f'CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5('
+                    "external_id, content='orders_order', "
+                    "content_rowid='id', tokenize='trigram')"
+                )
+            except connection.Database.OperationalError:
+                return  # SQLite is built without FTS5 or older than 3.34.
+            for trigger, sql in SQLITE_TRIGGERS.items():
+                cursor.execute(f'CREATE TRIGGER {trigger} {sql}')
+            cursor.execute(f'INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) '
+                           "VALUES ('rebuild')")
+        elif connection.vendor == 'postgresql':
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX} ON orders_order '
+                'USING gin (UPPER(external_id::text) gin_trgm_ops)'
+            )
+
+
+def drop_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for trigger in SQLITE_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+            cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f'DROP INDEX IF EXISTS {TRIGRAM_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_order_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.2 on 2026-10-18 08:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_order_created_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('new', 'New'), ('accepted', 'Accepted'), ('failed', 'Failed')], max_length=12, verbose_name='Status')),
+                ('created_at', models.DateTimeField(verbose_name='Creation date')),
+                ('external_id', models.CharField(db_index=True, max_length=128, verbose_name='External identifier')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Archiving date')),
+                ('data', models.TextField(verbose_name='Rendered order')),
+            ],
+            options={
+                'ordering': ('id',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['status', 'id'], name='archived_status_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='archived_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['created_at', 'id'], name='archived_created_id_idx'),
+        ),
+    ]
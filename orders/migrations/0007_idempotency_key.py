@@ -0,0 +1,23 @@
+# Generated by Django 3.2 on 2026-10-18 08:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_archived_order'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='Key digest')),
+                ('request', models.CharField(max_length=64, verbose_name='Request digest')),
+                ('status_code', models.PositiveSmallIntegerField(null=True, verbose_name='Status code')),
+                ('response', models.TextField(blank=True, verbose_name='Rendered response')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Expiration date')),
+            ],
+        ),
+    ]
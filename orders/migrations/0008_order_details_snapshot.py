@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-18 08:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='details_snapshot',
+            field=models.JSONField(blank=True, editable=False, null=True, verbose_name='Details snapshot'),
+        ),
+    ]
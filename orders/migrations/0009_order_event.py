@@ -0,0 +1,31 @@
+# Generated by Django 3.2 on 2026-10-18 08:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_order_details_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('order_id', models.IntegerField(verbose_name='Order id')),
+                ('type', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('status_changed', 'Status changed'), ('deleted', 'Deleted')], max_length=14, verbose_name='Type')),
+                ('status', models.CharField(choices=[('new', 'New'), ('accepted', 'Accepted'), ('failed', 'Failed')], max_length=12, verbose_name='Status')),
+                ('external_id', models.CharField(max_length=128, verbose_name='External identifier')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Creation date')),
+            ],
+            options={
+                'ordering': ('id',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='orderevent',
+            index=models.Index(fields=['order_id', 'id'], name='order_event_order_id_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.2 on 2026-10-18 14:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_order_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderevent',
+            name='seq',
+            field=models.BigIntegerField(null=True, unique=True, verbose_name='Sequence number'),
+        ),
+        # ids of recorded events were their sequence numbers.
+        migrations.RunSQL(
+            'UPDATE orders_orderevent SET seq = id',
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='orderevent',
+            index=models.Index(condition=models.Q(('seq__isnull', True)), fields=['id'], name='order_event_unnumbered_idx'),
+        ),
+    ]
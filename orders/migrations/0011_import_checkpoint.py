@@ -0,0 +1,21 @@
+# Generated by Django 3.2 on 2026-10-18 09:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_order_event_seq'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False, verbose_name='Name')),
+                ('progress', models.JSONField(verbose_name='Progress')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Update date')),
+            ],
+        ),
+    ]
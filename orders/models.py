@@ -15,10 +15,35 @@ class Order(models.Model):
         default=Status.NEW,
     )
     created_at = models.DateTimeField('Creation date', auto_now_add=True)
-    external_id = models.CharField('External identifier', max_length=128)
+    external_id = models.CharField(
+        'External identifier',
+        max_length=128,
+        db_index=True,
+    )
+    # rendered details with products, see orders.snapshots.
+    details_snapshot = models.JSONField(
+        'Details snapshot',
+        null=True,
+        blank=True,
+        editable=False,
+    )
 
     class Meta:
-        ordering = ('id', 'status', 'external_id',)
+        ordering = ('id',)  # primary key index satisfies it without sort.
+        indexes = (
+            models.Index(
+                fields=('status', 'id'),
+                name='order_status_id_idx',
+            ),
+            models.Index(
+                fields=('status', 'created_at', 'id'),
+                name='order_status_created_id_idx',
+            ),
+            models.Index(
+                fields=('created_at', 'id'),
+                name='order_created_id_idx',
+            ),
+        )
 
     def __str__(self):
         return f'order id_{self.id}'
@@ -51,3 +76,138 @@ class OrderDetail(models.Model):
 
     def __str__(self):
         return f'{self.order}_details'
+
+
+class StatusCounter(models.Model):
+    """Materialized amount of orders with each status."""
+    status = models.CharField(
+        'Status',
+        max_length=12,
+        choices=Status.choices,
+        unique=True,
+    )
+    count = models.BigIntegerField('Orders amount', default=0)
+
+    def __str__(self):
+        return f'{self.status}: {self.count}'
+
+
+class ProductTotal(models.Model):
+    """Materialized amount and revenue of all order details of product."""
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='total',
+    )
+    amount = models.BigIntegerField('Amount', default=0)
+    revenue = models.DecimalField(
+        'Revenue',
+        max_digits=20,
+        decimal_places=2,
+        default=0,
+    )
+
+    def __str__(self):
+        return f'{self.product}_total'
+
+
+class ArchivedOrder(models.Model):
+    """
+    Finished order moved out of orders table by `manage.py archive_orders`.
+    Its representation with details is rendered once into data, other fields
+    are kept for filtering and ordering.
+    """
+    id = models.IntegerField(primary_key=True)  # id of archived order.
+    status = models.CharField('Status', max_length=12, choices=Status.choices)
+    created_at = models.DateTimeField('Creation date')
+    external_id = models.CharField(
+        'External identifier',
+        max_length=128,
+        db_index=True,
+    )
+    archived_at = models.DateTimeField('Archiving date', auto_now_add=True)
+    data = models.TextField('Rendered order')
+
+    class Meta:
+        ordering = ('id',)
+        indexes = (
+            models.Index(
+                fields=('status', 'id'),
+                name='archived_status_id_idx',
+            ),
+            models.Index(
+                fields=('status', 'created_at', 'id'),
+                name='archived_status_created_idx',
+            ),
+            models.Index(
+                fields=('created_at', 'id'),
+                name='archived_created_id_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'archived order id_{self.id}'
+
+
+class IdempotencyKey(models.Model):
+    """Stored response of request made with Idempotency-Key header."""
+    key = models.CharField('Key digest', max_length=64, primary_key=True)
+    request = models.CharField('Request digest', max_length=64)
+    status_code = models.PositiveSmallIntegerField('Status code', null=True)
+    response = models.TextField('Rendered response', blank=True)
+    expires_at = models.DateTimeField('Expiration date', db_index=True)
+
+    def __str__(self):
+        return self.key
+
+
+class EventType(models.TextChoices):
+    CREATED = 'created', 'Created'
+    UPDATED = 'updated', 'Updated'
+    STATUS_CHANGED = 'status_changed', 'Status changed'
+    DELETED = 'deleted', 'Deleted'
+
+
+class OrderEvent(models.Model):
+    """
+    Change of order appended to change feed in the same transaction as the
+    change itself, see orders.feed. Sequence number is given to event after
+    commit, events without it are not visible in the feed yet.
+    """
+    id = models.BigAutoField(primary_key=True)
+    seq = models.BigIntegerField('Sequence number', null=True, unique=True)
+    order_id = models.IntegerField('Order id')  # order could be deleted.
+    type = models.CharField('Type', max_length=14, choices=EventType.choices)
+    status = models.CharField('Status', max_length=12, choices=Status.choices)
+    external_id = models.CharField('External identifier', max_length=128)
+    created_at = models.DateTimeField('Creation date', auto_now_add=True)
+
+    class Meta:
+        ordering = ('id',)
+        indexes = (
+            models.Index(
+                fields=('order_id', 'id'),
+                name='order_event_order_id_idx',
+            ),
+            models.Index(
+                fields=('id',),
+                name='order_event_unnumbered_idx',
+                condition=models.Q(seq__isnull=True),
+            ),
+        )
+
+    def __str__(self):
+        return f'order event {self.id}'
+
+
+class ImportCheckpoint(models.Model):
+    """
+    Progress of orders import, saved in the same transaction as its batch.
+    """
+    name = models.CharField('Name', max_length=255, primary_key=True)
+    progress = models.JSONField('Progress')
+    updated_at = models.DateTimeField('Update date', auto_now=True)
+
+    def __str__(self):
+        return self.name
@@ -1,5 +1,23 @@
+import hashlib
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .cache import (ALL_ORDERS_VERSION_KEY, ORDERS_LIST_VERSION_KEY,
+                    get_versions)
+from .metrics import timed
+
+
+COUNT_EXACT = 'exact'
+COUNT_CACHED = 'cached'
+COUNT_NONE = 'none'
 
 
 def calc_end_index(items_qty: int, limit_value: int, start_index: int) -> int:
@@ -18,11 +36,209 @@ def calc_end_index(items_qty: int, limit_value: int, start_index: int) -> int:
         return min(last_index, items_qty - 1)
 
 
+def encode_cursor(keyset: str, values: list, reverse: bool = False) -> str:
+    """Pack seek position into opaque url-safe string."""
+    payload = json.dumps({'k': keyset, 'v': values, 'r': int(reverse)},
+                         separators=(',', ':'))
+    return urlsafe_b64encode(payload.encode()).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> dict:
+    """Unpack seek position, raise ValueError if cursor is malformed."""
+    try:
+        payload = json.loads(urlsafe_b64decode(cursor.encode('ascii')))
+    except (TypeError, ValueError) as error:
+        raise ValueError(cursor) from error
+    if (not isinstance(payload, dict)
+            or not isinstance(payload.get('v'), list)
+            or not isinstance(payload.get('k'), str)):
+        raise ValueError(cursor)
+    for value in payload['v']:
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise ValueError(cursor)
+    return payload
+
+
 class CustomPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination with Content-Range header. Keyset mode is enabled
+    when 'cursor' query parameter is given (empty value for the first page):
+    rows are seeked by ordering key instead of offset and next/prev links are
+    returned in Link header.
+    """
+    cursor_query_param = 'cursor'
+    keyset_query_param = 'keyset'
+    count_query_param = 'count'
+    keyset_orderings = {
+        'id': ('id',),
+        'created_at': ('created_at', 'id'),
+    }
+    default_keyset = 'id'
+    count_cache_timeout = 60
+    invalid_cursor_message = 'Invalid cursor.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.view = view
+        self.keyset = None
+        is_keyset = self.cursor_query_param in request.query_params
+        # total count is what keyset mode avoids, so it is opt-in there.
+        default_count_mode = COUNT_NONE if is_keyset else COUNT_EXACT
+        self.count_mode = request.query_params.get(
+            self.count_query_param, default_count_mode)
+        if self.count_mode not in (COUNT_EXACT, COUNT_CACHED, COUNT_NONE):
+            self.count_mode = default_count_mode
+
+        if is_keyset:
+            return self.paginate_keyset(queryset, request)
+
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.offset = self.get_offset(request)
+        self.count = self.get_count(queryset)
+        # cached and materialized counts could lag behind rows, so they are
+        # not trusted to skip the page.
+        if self.count_is_exact and (self.count == 0
+                                    or self.offset > self.count):
+            self.page_size = 0
+            return []
+        page = list(queryset[self.offset:self.offset + self.limit])
+        self.page_size = len(page)
+        return page
+
+    def get_count(self, queryset):
+        """
+        Return total amount of items according to requested count mode,
+        None means that count was skipped. Exact count is taken from
+        view.get_materialized_count() when it is known there. count_is_exact
+        is set if the count was made by COUNT query now.
+        """
+        self.count_is_exact = False
+        if self.count_mode == COUNT_NONE:
+            return None
+        with timed('count'):
+            if self.count_mode == COUNT_CACHED:
+                # counts are dropped by changes of orders like cached
+                # lists, per-process cache keeps them for timeout at most.
+                versions = get_versions(ALL_ORDERS_VERSION_KEY,
+                                        ORDERS_LIST_VERSION_KEY)
+                cache_key = 'orders:count:{}:{}'.format(
+                    ':'.join(versions),
+                    hashlib.md5(str(queryset.query).encode()).hexdigest(),
+                )
+                count = cache.get(cache_key)
+                if count is None:
+                    count = super().get_count(queryset)
+                    cache.set(cache_key, count, self.count_cache_timeout)
+                return count
+            get_materialized_count = getattr(
+                self.view, 'get_materialized_count', None)
+            if get_materialized_count is not None:
+                count = get_materialized_count()
+                if count is not None:
+                    return count
+            self.count_is_exact = True
+            return super().get_count(queryset)
+
+    def paginate_keyset(self, queryset, request):
+        self.limit = self.get_limit(request) or self.default_limit
+        self.count = self.get_count(queryset)
+        cursor = request.query_params[self.cursor_query_param]
+        if cursor:
+            try:
+                position = decode_cursor(cursor)
+            except ValueError:
+                raise NotFound(self.invalid_cursor_message)
+            self.keyset = position['k']
+            reverse = bool(position.get('r'))
+        else:
+            position = None
+            self.keyset = request.query_params.get(
+                self.keyset_query_param, self.default_keyset)
+            reverse = False
+        fields = self.keyset_orderings.get(self.keyset)
+        if fields is None or (position and len(position['v']) != len(fields)):
+            raise NotFound(self.invalid_cursor_message)
+
+        ordering = [f'-{field}' if reverse else field for field in fields]
+        queryset = queryset.order_by(*ordering)
+        if position:
+            try:
+                queryset = queryset.filter(self.get_seek_filter(
+                    queryset.model, fields, position['v'], reverse))
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+        rows = list(queryset[:self.limit + 1])
+        has_more = len(rows) > self.limit
+        rows = rows[:self.limit]
+        if reverse:
+            rows.reverse()
+
+        self.page_size = len(rows)
+        self.next_position = self.prev_position = None
+        if rows and (has_more or reverse):
+            self.next_position = self.get_position(rows[-1], fields)
+        if rows and (has_more if reverse else position is not None):
+            self.prev_position = self.get_position(rows[0], fields)
+        return rows
+
+    @staticmethod
+    def get_seek_filter(model, fields, values, reverse):
+        """
+        Build condition selecting rows placed after (before for reverse) given
+        position: (a > x) OR (a = x AND b > y) for (a, b) key.
+        """
+        lookup = 'lt' if reverse else 'gt'
+        values = [
+            model._meta.get_field(field).to_python(value)
+            for field, value in zip(fields, values)
+        ]
+        condition = Q()
+        for idx, field in enumerate(fields):
+            equal_part = {fields[i]: values[i] for i in range(idx)}
+            condition |= Q(**equal_part, **{f'{field}__{lookup}': values[idx]})
+        return condition
+
+    @staticmethod
+    def get_position(row, fields) -> list:
+        values = []
+        for field in fields:
+            if isinstance(row, dict):
+                value = row[field]
+            else:
+                value = getattr(row, field)
+            values.append(value if isinstance(value, int)
+                          else value.isoformat())
+        return values
+
+    def get_keyset_link(self, position, reverse):
+        if position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.keyset_query_param)
+        return replace_query_param(
+            url, self.cursor_query_param,
+            encode_cursor(self.keyset, position, reverse)
+        )
 
     def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.get_keyset_paginated_response(data)
+
         total_items = self.count
         items_start_idx = self.offset
+        if total_items is not None and not self.count_is_exact:
+            total_items = max(total_items, items_start_idx + self.page_size)
+        if total_items is None:
+            if not self.page_size:
+                return Response(data, headers={'Content-Range': '-/*'})
+            items_end_idx = items_start_idx + self.page_size - 1
+            headers = {
+                'Content-Range': f'{items_start_idx}-{items_end_idx}/*'
+            }
+            return Response(data, headers=headers)
+
         if items_start_idx >= total_items:
             headers = {'Content-Range': f'-/{total_items}'}
             return Response(data, headers=headers)
@@ -37,3 +253,18 @@ class CustomPagination(LimitOffsetPagination):
             'Content-Range': f'{items_start_idx}-{items_end_idx}/{total_items}'
         }
         return Response(data, headers=headers)
+
+    def get_keyset_paginated_response(self, data):
+        links = []
+        next_link = self.get_keyset_link(self.next_position, reverse=False)
+        if next_link:
+            links.append(f'<{next_link}>; rel="next"')
+        prev_link = self.get_keyset_link(self.prev_position, reverse=True)
+        if prev_link:
+            links.append(f'<{prev_link}>; rel="prev"')
+        headers = {}
+        if links:
+            headers['Link'] = ', '.join(links)
+        if self.count is not None:
+            headers['X-Total-Count'] = str(self.count)
+        return Response(data, headers=headers)
@@ -0,0 +1,103 @@
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional, FastJSONRenderer falls back to JSONRenderer.
+    orjson = None
+
+
+# JSONRenderer escapes them, so output is a subset of JavaScript.
+LINE_SEPARATORS = (
+    (b'\xe2\x80\xa8', b'\\u2028'),
+    (b'\xe2\x80\xa9', b'\\u2029'),
+)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Newline delimited JSON. Exports stream their rows themselves, renderer is
+    used for content negotiation and for error responses.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return (json.dumps(data, cls=JSONEncoder, ensure_ascii=False,
+                           separators=(',', ':')) + '\n').encode(self.charset)
+
+
+class CSVRenderer(NDJSONRenderer):
+    """
+    Comma separated values. Exports stream their rows themselves, error
+    responses are rendered as JSON line.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+def render_event(data, event: str = None, event_id=None) -> bytes:
+    """Server-Sent Event with data in JSON format."""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event is not None:
+        lines.append(f'event: {event}')
+    lines.append('data: ' + json.dumps(data, cls=JSONEncoder,
+                                       ensure_ascii=False,
+                                       separators=(',', ':')))
+    return ('\n'.join(lines) + '\n\n').encode()
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Server-Sent Events. Change feed streams events itself, renderer is used
+    for content negotiation and for error responses, sent as 'error' event.
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return render_event(data, 'error')
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer producing the same bytes with orjson, which encodes dicts,
+    lists, strings and integers of serialized orders natively instead of
+    walking them by json encoder. Other values (datetimes, decimals, lazy
+    strings) are converted by encoder_class as before. Indented, escaped to
+    ASCII or not compact output, data orjson does not support (integers
+    out of 64 bits, not string keys) and missing orjson fall back to
+    JSONRenderer. Floats in exponent notation (out of 1e-4..1e16) and NaN
+    differ from json module (1e16 instead of 1e+16, null instead of NaN),
+    orders API renders no floats.
+    """
+
+    def __init__(self):
+        self.default = self.encoder_class().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii
+                or not self.compact or self.get_indent(
+                    accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.default,
+                               option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        if b'\xe2\x80' in ret:
+            for separator, escaped in LINE_SEPARATORS:
+                ret = ret.replace(separator, escaped)
+        return ret
@@ -0,0 +1,145 @@
+"""
+Indexed search of orders by external_id. Prefix search is a range over
+B-tree index of external_id. Substring search uses FTS5 table with trigram
+tokenizer on SQLite, kept in sync with orders by triggers, and trigram GIN
+index of pg_trgm on PostgreSQL; other backends scan orders with LIKE. Both
+indexes are created by migration 0004_order_search.
+"""
+import sys
+
+from django.db import connections
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+
+from .models import Order
+
+
+SEARCH_TABLE = 'orders_order_search'
+TRIGRAM_SIZE = 3
+
+SQLITE_TRIGGERS = {
+    f'{SEARCH_TABLE}_insert': (
+        'AFTER INSERT ON orders_order BEGIN '
+        f'INSERT INTO {SEARCH_TABLE} (rowid, external_id) '
+        'VALUES (new.id, new.external_id); END'
+    ),
+    f'{SEARCH_TABLE}_delete': (
+        'AFTER DELETE ON orders_order BEGIN '
+        f'INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, external_id) '
+        "VALUES ('delete', old.id, old.external_id); END"
+    ),
+    f'{SEARCH_TABLE}_update': (
+        'AFTER UPDATE OF external_id ON orders_order BEGIN '
+        f'INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, external_id) '
+        "VALUES ('delete', old.id, old.external_id); "
+        f'INSERT INTO {SEARCH_TABLE} (rowid, external_id) '
+        'VALUES (new.id, new.external_id); END'
+    ),
+}
+
+_indexed_aliases = set()
+
+
+def _get_sqlite_objects(cursor, object_type: str) -> set:
+    cursor.execute('SELECT name FROM sqlite_master WHERE type = %s',
+                   [object_type])
+    return {name for name, in cursor.fetchall()}
+
+
+def ensure_search_triggers(connection):
+    """
+    Create missing triggers of SQLite search table and index all orders
+    again. SQLite backend recreates table on most of its alterations, which
+    drops its triggers, so it is called after every migration.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        if SEARCH_TABLE not in _get_sqlite_objects(cursor, 'table'):
+            return
+        missing = set(SQLITE_TRIGGERS) - _get_sqlite_objects(
+            cursor, 'trigger')
+        if not missing:
+            return
+        for trigger in missing:
+            cursor.execute(
+                f'CREATE TRIGGER {trigger} {SQLITE_TRIGGERS[trigger]}')
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('rebuild')")
+
+
+def has_search_table(connection) -> bool:
+    """Return whether SQLite search table exists, positive result is kept."""
+    if connection.alias not in _indexed_aliases:
+        with connection.cursor() as cursor:
+            if SEARCH_TABLE in _get_sqlite_objects(cursor, 'table'):
+                _indexed_aliases.add(connection.alias)
+    return connection.alias in _indexed_aliases
+
+
+def get_prefix_end(prefix: str):
+    """
+    Return the least string greater than all strings starting with prefix,
+    None if there is no such one (prefix consists of U+10FFFF only).
+    """
+    prefix = prefix.rstrip(chr(sys.maxunicode))
+    if not prefix:
+        return None
+    code = ord(prefix[-1]) + 1
+    if 0xD800 <= code <= 0xDFFF:
+        code = 0xE000  # surrogates could not be encoded.
+    return prefix[:-1] + chr(code)
+
+
+def filter_prefix(queryset, prefix: str):
+    """Orders which external_id starts with prefix, case sensitive."""
+    if not prefix:
+        return queryset
+    if connections[queryset.db].vendor == 'sqlite':
+        # LIKE is case insensitive in SQLite, so it could not use index.
+        queryset = queryset.filter(external_id__gte=prefix)
+        prefix_end = get_prefix_end(prefix)
+        if prefix_end is None:
+            return queryset
+        return queryset.filter(external_id__lt=prefix_end)
+    return queryset.filter(external_id__startswith=prefix)
+
+
+def filter_substring(queryset, term: str):
+    """
+    Orders which external_id contains term, case insensitive. Archived
+    orders are not indexed, they are scanned.
+    """
+    connection = connections[queryset.db]
+    if (queryset.model is Order and connection.vendor == 'sqlite'
+            and len(term) >= TRIGRAM_SIZE
+            and has_search_table(connection)):
+        phrase = '"{}"'.format(term.replace('"', '""'))
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s',
+            (phrase,),
+        ))
+    return queryset.filter(external_id__icontains=term)
+
+
+class OrderSearchFilter(SearchFilter):
+    """
+    Filter orders by substrings of external_id given in 'search' parameter
+    and by its prefix given in 'external_id_prefix' one.
+    """
+    prefix_param = 'external_id_prefix'
+
+    def filter_queryset(self, request, queryset, view):
+        for term in self.get_search_terms(request):
+            queryset = filter_substring(queryset, term)
+        return filter_prefix(
+            queryset, request.query_params.get(self.prefix_param, ''))
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + [{
+            'name': self.prefix_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Prefix of external_id.',
+            'schema': {'type': 'string'},
+        }]
@@ -1,6 +1,14 @@
 from rest_framework import serializers
 
-from .models import Order, OrderDetail, Product
+from . import services
+from .metrics import timed
+from .models import Order, OrderDetail, OrderEvent, Product, ProductTotal
+
+
+NO_PRODUCTS_FOUND_TEXT = 'No products with ids {} in database.'
+
+
+EXPANSIONS = ('details', 'details.product')
 
 
 class ProductSerializer(serializers.ModelSerializer):
@@ -12,6 +20,17 @@ class ProductSerializer(serializers.ModelSerializer):
         fields = ('id', 'name')
 
 
+class ProductReferenceField(serializers.Field):
+    """Not expanded product represented by its id only."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('source', 'product_id')
+        super().__init__(read_only=True, **kwargs)
+
+    def to_representation(self, value):
+        return {'id': value}
+
+
 class OrderDetailSerializer(serializers.ModelSerializer):
     id = serializers.IntegerField(required=False, read_only=True)
     product = ProductSerializer()
@@ -20,6 +39,15 @@ class OrderDetailSerializer(serializers.ModelSerializer):
         model = OrderDetail
         fields = ('id', 'product', 'amount', 'price')
 
+    def __init__(self, *args, expand_product=True, **kwargs):
+        """
+        :param expand_product: represent product by id only if False, so
+        products do not have to be loaded.
+        """
+        super().__init__(*args, **kwargs)
+        if not expand_product:
+            self.fields['product'] = ProductReferenceField()
+
 
 class OrderUpdateOnlySerializer(serializers.ModelSerializer):
     details = OrderDetailSerializer(many=True, required=False)
@@ -37,6 +65,14 @@ class OrderUpdateOnlySerializer(serializers.ModelSerializer):
         return in_data
 
 
+class OrderListSerializer(serializers.ListSerializer):
+
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
+
+
 class OrderSerializer(serializers.ModelSerializer):
     details = OrderDetailSerializer(many=True)  # this is variant as details should be in each order.
 
@@ -44,12 +80,55 @@ class OrderSerializer(serializers.ModelSerializer):
         model = Order
         fields = ('id', 'status', 'created_at', 'external_id', 'details')
         read_only_fields = ('id', 'status', 'created_at')
+        list_serializer_class = OrderListSerializer
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        """
+        :param fields: names of represented fields, all of them by default.
+        :param expand: EXPANSIONS represented in full, details are left out
+        without 'details' and their products are represented by id without
+        'details.product'. All of them by default.
+        """
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        if expand is not None and 'details' in self.fields:
+            if 'details' not in expand:
+                self.fields.pop('details')
+            elif 'details.product' not in expand:
+                self.fields['details'] = OrderDetailSerializer(
+                    many=True, expand_product=False)
+
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
 
     def create(self, validated_data):
-        details = validated_data.pop('details')
-        order = Order.objects.create(**validated_data)
-        for detail in details:
-            product_data = detail.pop('product')
-            product, created = Product.objects.get_or_create(**product_data)
-            OrderDetail.objects.create(**detail, order=order, product=product)  # I set that just created products could be choosen.
-        return order
+        """Insert order with details in one transaction, see create_orders."""
+        product_ids = services.get_detail_product_ids(
+            validated_data['details'])
+        products = services.get_products(product_ids)
+        missing = sorted(set(product_ids) - set(products))
+        if missing:
+            raise serializers.ValidationError(
+                NO_PRODUCTS_FOUND_TEXT.format(missing))
+        return services.create_orders([validated_data], products)[0]
+
+
+class ProductTotalSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='product_id')
+    name = serializers.CharField(source='product.name')
+
+    class Meta:
+        model = ProductTotal
+        fields = ('id', 'name', 'amount', 'revenue')
+
+
+class OrderEventSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = OrderEvent
+        fields = ('seq', 'type', 'order_id', 'status', 'external_id',
+                  'created_at')
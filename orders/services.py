@@ -0,0 +1,162 @@
+from django.db import connection, transaction
+from django.db.models import Case, CharField, Max, Value, When
+
+from . import fast_serializers, feed, snapshots, stats
+from .cache import invalidate_orders, product_cache
+from .models import EventType, Order, OrderDetail, Status
+
+
+BULK_BATCH_SIZE = 500
+NO_PRODUCT_FOUND_TEXT = 'No product with such id in database.'
+NO_DETAILS_TEXT = 'Order details should pointed.'
+
+
+def get_products(product_ids) -> dict:
+    """
+    Fetch products for all given ids from cache, ids missing in cache are
+    fetched with one query.
+    :param product_ids: iterable of product ids, duplicates are allowed.
+    :return: mapping of product id to product for ids present in database.
+    """
+    return product_cache.get_many(product_ids)
+
+
+def get_detail_product_ids(details) -> list:
+    """Return product ids referenced by validated order details."""
+    return [detail['product']['id'] for detail in details]
+
+
+def _insert_with_ids(model, objects: list) -> list:
+    """Bulk insert objects of model, setting their ids."""
+    if connection.features.can_return_rows_from_bulk_insert:
+        return model.objects.bulk_create(objects, batch_size=BULK_BATCH_SIZE)
+    if connection.vendor == 'sqlite':
+        # the caller's transaction holds the database write lock, so rows
+        # get consecutive ids after the largest one, which is read back.
+        model.objects.bulk_create(objects, batch_size=BULK_BATCH_SIZE)
+        last_id = model.objects.aggregate(last_id=Max('id'))['last_id']
+        for pk, obj in enumerate(objects, start=last_id - len(objects) + 1):
+            obj.pk = pk
+        return objects
+    for obj in objects:  # backend could not return ids of bulk inserted rows.
+        obj.save(force_insert=True)
+    return objects
+
+
+def create_orders(orders_data: list, products: dict) -> list:
+    """
+    Insert orders with their details using batched inserts in one transaction,
+    with ORDERS_DETAILS_SNAPSHOT on their snapshots are stored too. Changes
+    of orders made by functions of this module are appended to change feed.
+    :param orders_data: validated data of OrderSerializer for every order.
+    :param products: mapping of product id to product, should contain every
+    product referenced by orders details.
+    :return: created orders in the same sequence as orders_data.
+    """
+    orders = [
+        Order(**{key: value for key, value in order_data.items()
+                 if key != 'details'})
+        for order_data in orders_data
+    ]
+    with transaction.atomic():
+        _insert_with_ids(Order, orders)
+        details = [
+            OrderDetail(
+                order=order,
+                product=products[detail['product']['id']],
+                amount=detail['amount'],
+                price=detail['price'],
+            )
+            for order, order_data in zip(orders, orders_data)
+            for detail in order_data['details']
+        ]
+        if fast_serializers.is_snapshot_enabled():
+            _insert_with_ids(OrderDetail, details)
+            snapshots.write_snapshots(orders, details)
+        else:
+            OrderDetail.objects.bulk_create(details,
+                                            batch_size=BULK_BATCH_SIZE)
+        stats.record_orders_created(len(orders), details)
+        feed.record_events(EventType.CREATED, (
+            (order.pk, order.status, order.external_id) for order in orders))
+        invalidate_orders(())  # new orders could be only in cached lists.
+    return orders
+
+
+def change_orders_status(queryset, new_status: str, order_ids=None) -> int:
+    """
+    Move orders with status 'new' from queryset to new_status by one
+    conditional UPDATE.
+    :param order_ids: ids of orders queryset is limited to, if known.
+    :return: amount of changed orders.
+    """
+    queryset = queryset.filter(status=Status.NEW)
+    with transaction.atomic():
+        if feed.is_feed_enabled():
+            # rows are locked, so the same ones are changed below.
+            rows = queryset.select_for_update().values_list('id',
+                                                            'external_id')
+            feed.record_events(EventType.STATUS_CHANGED, (
+                (pk, new_status, external_id) for pk, external_id in rows))
+        changed = queryset.update(status=new_status)
+        if changed:
+            stats.record_status_changed(Status.NEW, new_status, changed)
+            invalidate_orders(order_ids)
+    return changed
+
+
+def change_external_ids(external_ids: dict) -> int:
+    """
+    Set external_id of orders with status 'new' by one conditional UPDATE.
+    :param external_ids: mapping of order id to its new external_id.
+    :return: amount of changed orders.
+    """
+    if not external_ids:
+        return 0
+    orders = Order.objects.filter(pk__in=external_ids, status=Status.NEW)
+    with transaction.atomic():
+        if feed.is_feed_enabled():
+            order_ids = list(orders.select_for_update()
+                             .values_list('id', flat=True))
+            feed.record_events(EventType.UPDATED, (
+                (pk, Status.NEW, external_ids[pk]) for pk in order_ids))
+        changed = orders.update(external_id=Case(
+            *(When(pk=pk, then=Value(external_id))
+              for pk, external_id in external_ids.items()),
+            output_field=CharField(),
+        ))
+        if changed:
+            invalidate_orders(external_ids)
+    return changed
+
+
+def delete_orders(queryset) -> int:
+    """
+    Delete orders of queryset with their details, discount them from
+    statistics.
+    :return: amount of deleted orders.
+    """
+    with transaction.atomic():
+        rows = list(queryset.values_list('id', 'status', 'external_id'))
+        if not rows:
+            return 0
+        order_ids = [pk for pk, _, _ in rows]
+        feed.record_events(EventType.DELETED, rows)
+        orders = Order.objects.filter(id__in=order_ids)
+        stats.record_orders_deleted(orders)
+        # plain DELETE, cached responses are invalidated once below instead
+        # of by deletion signals of every order and detail.
+        details = OrderDetail.objects.filter(order_id__in=order_ids)
+        details._raw_delete(details.db)
+        orders._raw_delete(orders.db)
+        invalidate_orders(order_ids)
+    return len(order_ids)
+
+
+def delete_order(order):
+    """Delete order with its details, discount them from statistics."""
+    with transaction.atomic():
+        stats.record_orders_deleted(Order.objects.filter(pk=order.pk))
+        feed.record_events(EventType.DELETED,
+                           [(order.pk, order.status, order.external_id)])
+        order.delete()
@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from . import snapshots
+from .cache import invalidate_orders, product_cache
+from .metrics import install_query_recorder
+from .models import Order, OrderDetail, Product
+from .search import ensure_search_triggers
+
+
+@receiver((post_save, post_delete), sender=Product)
+def invalidate_cached_product(sender, instance, **kwargs):
+    product_cache.invalidate(instance.pk)
+    invalidate_orders()  # product could be included in any order.
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_name(sender, instance, raw=False, **kwargs):
+    instance.saved_name = None
+    if instance.pk is not None and not raw:
+        instance.saved_name = Product.objects.filter(
+            pk=instance.pk).values_list('name', flat=True).first()
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_snapshots(sender, instance, created, **kwargs):
+    if not created and getattr(instance, 'saved_name', None) not in (
+            None, instance.name):
+        snapshots.refresh_product_on_commit(instance.pk)
+
+
+@receiver(pre_delete, sender=Product)
+def drop_product_snapshots(sender, instance, **kwargs):
+    snapshots.drop_product(instance.pk)
+
+
+@receiver((post_save, post_delete), sender=Order)
+def invalidate_cached_order(sender, instance, **kwargs):
+    invalidate_orders([instance.pk])
+
+
+@receiver((post_save, post_delete), sender=OrderDetail)
+def invalidate_cached_order_detail(sender, instance, **kwargs):
+    invalidate_orders([instance.order_id])
+
+
+@receiver(request_started)
+def close_unusable_connections(**kwargs):
+    """
+    Close persistent connections broken since the previous request, if
+    ORDERS_DB_HEALTH_CHECKS is on, so they are opened again instead of
+    failing the request. Every check is a query to database.
+    """
+    if not getattr(settings, 'ORDERS_DB_HEALTH_CHECKS', False):
+        return
+    for connection in connections.all():
+        if (connection.connection is not None
+                and not connection.is_usable()):
+            connection.close()
+
+
+@receiver(request_started)
+def check_product_cache_version(**kwargs):
+    product_cache.check_version()
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    if sender.label == 'orders':
+        ensure_search_triggers(connections[using])
+
+
+connection_created.connect(install_query_recorder)
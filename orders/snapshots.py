@@ -0,0 +1,149 @@
+"""
+Denormalized details of orders. With ORDERS_DETAILS_SNAPSHOT setting on,
+details of created orders with their products are rendered into
+Order.details_snapshot, so orders are read by one query of orders table.
+Details never change after creation, so snapshot goes stale only when
+product is renamed (snapshots are rendered again after commit) or deleted
+(snapshots are dropped). Orders without snapshot are read with details
+query as before, they are filled by `manage.py backfill_order_snapshots`,
+drift caused by writes bypassing the API is found and repaired by
+`manage.py check_order_snapshots`.
+"""
+from django.db import transaction
+
+from . import fast_serializers
+from .cache import invalidate_orders
+from .models import Order, OrderDetail
+
+
+SNAPSHOT_BATCH_SIZE = 1000
+
+
+def render_details(details) -> list:
+    """
+    Render snapshot of just created details, the same as get_details does.
+    :param details: OrderDetail instances of one order ordered by id, with
+    products.
+    """
+    _, format_price = fast_serializers.get_formatters()
+    return [
+        {
+            'id': detail.pk,
+            'product': {'id': detail.product_id, 'name': detail.product.name},
+            'amount': detail.amount,
+            'price': format_price(detail.price),
+        }
+        for detail in details
+    ]
+
+
+def write_snapshots(orders: list, details: list):
+    """
+    Store snapshots of just created orders.
+    :param details: created OrderDetail instances of orders with ids.
+    """
+    details_by_order = {order.pk: [] for order in orders}
+    for detail in details:
+        details_by_order[detail.order_id].append(detail)
+    for order in orders:
+        order.details_snapshot = render_details(details_by_order[order.pk])
+    Order.objects.bulk_update(orders, [fast_serializers.SNAPSHOT_FIELD],
+                              batch_size=SNAPSHOT_BATCH_SIZE)
+
+
+def iter_id_batches(queryset, batch_size: int = SNAPSHOT_BATCH_SIZE):
+    """Yield lists of ids of orders of queryset, seeked by id."""
+    queryset = queryset.order_by('id').values_list('id', flat=True)
+    last_id = None
+    while True:
+        batch_queryset = queryset
+        if last_id is not None:
+            batch_queryset = queryset.filter(id__gt=last_id)
+        order_ids = list(batch_queryset[:batch_size])
+        if not order_ids:
+            return
+        yield order_ids
+        last_id = order_ids[-1]
+
+
+def _store(snapshots: dict):
+    Order.objects.bulk_update(
+        [Order(id=order_id, details_snapshot=snapshot)
+         for order_id, snapshot in snapshots.items()],
+        [fast_serializers.SNAPSHOT_FIELD], batch_size=SNAPSHOT_BATCH_SIZE,
+    )
+
+
+def refresh_snapshots(queryset,
+                      batch_size: int = SNAPSHOT_BATCH_SIZE) -> int:
+    """
+    Render snapshots of orders of queryset from their details, every batch
+    in its own transaction.
+    :return: amount of refreshed orders.
+    """
+    refreshed = 0
+    for order_ids in iter_id_batches(queryset, batch_size):
+        with transaction.atomic():
+            details = fast_serializers.get_details(order_ids)
+            _store({order_id: details.get(order_id, [])
+                    for order_id in order_ids})
+        refreshed += len(order_ids)
+    return refreshed
+
+
+def check_snapshots(queryset, repair: bool = False,
+                    batch_size: int = SNAPSHOT_BATCH_SIZE) -> list:
+    """
+    Compare stored snapshots of orders of queryset with their details,
+    orders without snapshot are skipped.
+    :param repair: store fresh snapshots of drifted orders.
+    :return: ids of drifted orders.
+    """
+    queryset = queryset.filter(details_snapshot__isnull=False)
+    drifted = []
+    for order_ids in iter_id_batches(queryset, batch_size):
+        with transaction.atomic():
+            stored = dict(Order.objects.filter(id__in=order_ids)
+                          .values_list('id', fast_serializers.SNAPSHOT_FIELD))
+            details = fast_serializers.get_details(order_ids)
+            fresh = {}
+            for order_id, snapshot in stored.items():
+                order_details = details.get(order_id, [])
+                if snapshot != order_details:
+                    fresh[order_id] = order_details
+            if repair and fresh:
+                _store(fresh)
+        drifted.extend(fresh)
+    return drifted
+
+
+def get_product_orders(product_id):
+    """Orders with snapshot including given product."""
+    return Order.objects.filter(
+        id__in=OrderDetail.objects.filter(
+            product_id=product_id).values('order_id'),
+        details_snapshot__isnull=False,
+    )
+
+
+def refresh_product(product_id) -> int:
+    """Render snapshots including renamed product again."""
+    return refresh_snapshots(get_product_orders(product_id))
+
+
+def refresh_product_on_commit(product_id):
+    """
+    Render snapshots including renamed product again after commit, batch by
+    batch, so renaming does not rewrite all its orders in one transaction.
+    Orders are read with the old name till then.
+    """
+    def refresh():
+        refresh_product(product_id)
+        # responses could be cached from old snapshots meanwhile.
+        invalidate_orders()
+    transaction.on_commit(refresh)
+
+
+def drop_product(product_id) -> int:
+    """Drop snapshots including product, which details are being deleted."""
+    return get_product_orders(product_id).update(details_snapshot=None)
@@ -0,0 +1,184 @@
+"""
+Incrementally maintained order statistics. Every function changing them
+should be called in the same transaction as the change of orders itself.
+"""
+import json
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import (BigIntegerField, Case, Count, DecimalField,
+                              ExpressionWrapper, F, Sum, Value, When)
+
+from .models import (ArchivedOrder, Order, OrderDetail, Product, ProductTotal,
+                     Status, StatusCounter)
+
+
+REVENUE_FIELD = DecimalField(max_digits=20, decimal_places=2)
+
+
+def get_revenue_expression():
+    return ExpressionWrapper(F('price') * F('amount'),
+                             output_field=REVENUE_FIELD)
+
+
+def _update_status_counts(deltas: dict) -> int:
+    return StatusCounter.objects.filter(status__in=deltas).update(count=(
+        F('count') + Case(
+            *(When(status=status, then=Value(delta))
+              for status, delta in deltas.items()),
+            output_field=BigIntegerField(),
+        )
+    ))
+
+
+def _change_status_counts(deltas: dict):
+    """
+    Apply deltas of all counters by one UPDATE. Missing counters are created
+    empty ignoring ones created concurrently and updated then.
+    """
+    deltas = {status: delta for status, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    updated = _update_status_counts(deltas)
+    if updated < len(deltas):
+        existing = set(StatusCounter.objects.filter(status__in=deltas)
+                       .values_list('status', flat=True))
+        missing = {status: delta for status, delta in deltas.items()
+                   if status not in existing}
+        StatusCounter.objects.bulk_create(
+            (StatusCounter(status=status) for status in missing),
+            ignore_conflicts=True,
+        )
+        _update_status_counts(missing)
+
+
+def _change_product_totals(totals: dict):
+    """
+    Missing totals are created empty ignoring ones created concurrently and
+    updated then.
+    :param totals: mapping of product id to (amount, revenue) deltas.
+    """
+    for product_id, (amount, revenue) in totals.items():
+        product_total = ProductTotal.objects.filter(product_id=product_id)
+        changes = {'amount': F('amount') + amount,
+                   'revenue': F('revenue') + revenue}
+        if not product_total.update(**changes):
+            ProductTotal.objects.bulk_create(
+                [ProductTotal(product_id=product_id)], ignore_conflicts=True)
+            product_total.update(**changes)
+
+
+def record_orders_created(orders_qty: int, details):
+    """
+    Count just created orders with status 'new' and their details.
+    :param details: OrderDetail instances or dicts with product_id, amount
+    and price of every detail of created orders.
+    """
+    totals = defaultdict(lambda: [0, Decimal(0)])
+    for detail in details:
+        if isinstance(detail, OrderDetail):
+            detail = {'product_id': detail.product_id,
+                      'amount': detail.amount, 'price': detail.price}
+        total = totals[detail['product_id']]
+        total[0] += detail['amount']
+        total[1] += Decimal(detail['price']) * detail['amount']
+    _change_status_counts({Status.NEW: orders_qty})
+    _change_product_totals(totals)
+
+
+def record_status_changed(old_status: str, new_status: str, orders_qty: int):
+    _change_status_counts({old_status: -orders_qty, new_status: orders_qty})
+
+
+def record_orders_deleted(queryset):
+    """
+    Discount orders of queryset, should be called right before their
+    deletion.
+    """
+    order_ids = queryset.values('id')
+    status_counts = (
+        Order.objects.filter(id__in=order_ids)
+        .order_by().values_list('status').annotate(count=Count('id'))
+    )
+    _change_status_counts(
+        {status: -count for status, count in status_counts})
+    product_totals = (
+        OrderDetail.objects.filter(order_id__in=order_ids)
+        .order_by().values_list('product_id')
+        .annotate(total_amount=Sum('amount'),
+                  total_revenue=Sum(get_revenue_expression()))
+    )
+    _change_product_totals({
+        product_id: (-amount, -revenue)
+        for product_id, amount, revenue in product_totals
+    })
+
+
+def get_archived_product_totals() -> dict:
+    """
+    Return mapping of product id to [amount, revenue] of archived orders
+    details, which are read from rendered orders.
+    """
+    totals = defaultdict(lambda: [0, Decimal(0)])
+    archived_data = ArchivedOrder.objects.values_list(
+        'data', flat=True).iterator(chunk_size=2000)
+    for data in archived_data:
+        for detail in json.loads(data)['details']:
+            total = totals[detail['product']['id']]
+            total[0] += detail['amount']
+            total[1] += Decimal(detail['price']) * detail['amount']
+    return totals
+
+
+def rebuild():
+    """Recalculate all statistics from scratch, archived orders included."""
+    with transaction.atomic():
+        StatusCounter.objects.all().delete()
+        ProductTotal.objects.all().delete()
+        counts = Counter()
+        for model in (Order, ArchivedOrder):
+            counts.update(dict(
+                model.objects.order_by().values_list('status')
+                .annotate(count=Count('id'))
+            ))
+        StatusCounter.objects.bulk_create(
+            StatusCounter(status=status, count=counts.get(status, 0))
+            for status in Status.values
+        )
+        totals = get_archived_product_totals()
+        for product_id, amount, revenue in (
+            OrderDetail.objects.order_by().values_list('product_id')
+            .annotate(total_amount=Sum('amount'),
+                      total_revenue=Sum(get_revenue_expression()))
+        ):
+            totals[product_id][0] += amount
+            totals[product_id][1] += revenue
+        # products of archived orders could be deleted since.
+        product_ids = set(Product.objects.values_list('id', flat=True))
+        ProductTotal.objects.bulk_create(
+            ProductTotal(product_id=product_id, amount=amount,
+                         revenue=revenue)
+            for product_id, (amount, revenue) in totals.items()
+            if product_id in product_ids
+        )
+
+
+def get_orders_count(status: str = None):
+    """
+    Return materialized amount of orders with given status or of all orders,
+    None if there is no counter for it.
+    """
+    counters = StatusCounter.objects.all()
+    if status is not None:
+        counters = counters.filter(status=status)
+    values = list(counters.values_list('count', flat=True))
+    if not values:
+        return None
+    return sum(values)
+
+
+def get_status_counts() -> dict:
+    """Return materialized amount of orders per status."""
+    counts = dict(StatusCounter.objects.values_list('status', 'count'))
+    return {status: counts.get(status, 0) for status in Status.values}
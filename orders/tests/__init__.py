@@ -0,0 +1,11 @@
+from rest_framework.test import APITestCase
+
+from orders import throttling
+
+
+class OrdersAPITestCase(APITestCase):
+    """Start every test with empty throttle counters, as they outlive it."""
+
+    def setUp(self):
+        super().setUp()
+        throttling.counters.clear()
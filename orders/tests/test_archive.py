@@ -0,0 +1,107 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from orders import stats
+from orders.archive import archive_orders
+from orders.models import (ArchivedOrder, Order, OrderDetail, Product,
+                           ProductTotal, Status)
+from orders.tests import OrdersAPITestCase
+
+
+LIST_URL = reverse('orders-list')
+
+
+class ArchiveTest(OrdersAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.product = Product.objects.create(name='Test_product')
+        old = timezone.now() - timedelta(days=100)
+        for external_id, order_status in (('old-accepted', Status.ACCEPTED),
+                                          ('old-new', Status.NEW),
+                                          ('old-failed', Status.FAILED),
+                                          ('recent', Status.ACCEPTED)):
+            order = Order.objects.create(external_id=external_id,
+                                         status=order_status)
+            OrderDetail.objects.create(order=order, product=self.product,
+                                       amount=2, price='3.50')
+            if external_id.startswith('old'):
+                Order.objects.filter(pk=order.pk).update(created_at=old)
+        stats.rebuild()
+        self.expected = self.client.get(LIST_URL).data
+
+    def get_list(self, params: dict) -> list:
+        response = self.client.get(LIST_URL, {'include_archived': '1',
+                                              **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_finished_old_orders_archived(self):
+        self.assertEqual(archive_orders(batch_size=1), 2)
+        self.assertEqual(
+            sorted(Order.objects.values_list('external_id', flat=True)),
+            ['old-new', 'recent'])
+        self.assertEqual(OrderDetail.objects.count(), 2)
+        self.assertEqual(
+            sorted(ArchivedOrder.objects.values_list('external_id',
+                                                     flat=True)),
+            ['old-accepted', 'old-failed'])
+
+    def test_archived_orders_listed_and_retrieved(self):
+        call_command('archive_orders', stdout=StringIO())
+        response = self.client.get(LIST_URL)
+        self.assertEqual(response['Content-Range'], '0-1/2')
+        self.assertEqual(self.get_list({}), self.expected)
+        self.assertEqual(self.get_list({'ordering': '-id', 'limit': 2}),
+                         self.expected[::-1][:2])
+        self.assertEqual(
+            self.get_list({'status': Status.FAILED}),
+            [order for order in self.expected
+             if order['status'] == Status.FAILED])
+        self.assertEqual(
+            [order['external_id'] for order in self.get_list(
+                {'search': 'old', 'fields': 'external_id'})],
+            ['old-accepted', 'old-new', 'old-failed'])
+
+        archived = self.expected[0]
+        response = self.client.get(
+            reverse('orders-detail', kwargs={'pk': archived['id']}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, archived)
+        response = self.client.get(
+            reverse('orders-detail', kwargs={'pk': archived['id']}),
+            {'fields': 'id,details', 'expand': 'details'})
+        self.assertEqual(response.data, {'id': archived['id'], 'details': [
+            {**detail, 'product': {'id': self.product.id}}
+            for detail in archived['details']
+        ]})
+
+    def test_keyset_pages_include_archived(self):
+        archive_orders()
+        response = self.client.get(LIST_URL, {
+            'include_archived': 'true', 'cursor': '', 'limit': 3})
+        self.assertEqual(response.data, self.expected[:3])
+        response = self.client.get(response['Link'][1:].split('>')[0])
+        self.assertEqual(response.data, self.expected[3:])
+
+    @override_settings(ORDERS_MATERIALIZED_COUNTS=True)
+    def test_statistics_kept(self):
+        counts = stats.get_status_counts()
+        archive_orders()
+        self.assertEqual(stats.get_status_counts(), counts)
+        stats.rebuild()
+        self.assertEqual(stats.get_status_counts(), counts)
+        self.assertEqual(ProductTotal.objects.get().amount, 8)
+        response = self.client.get(LIST_URL, {'status': Status.ACCEPTED})
+        self.assertEqual(response['Content-Range'], '0-0/1')
+        response = self.client.get(LIST_URL, {'status': Status.ACCEPTED,
+                                              'include_archived': '1'})
+        self.assertEqual(response['Content-Range'], '0-1/2')
@@ -0,0 +1,133 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.db import connections
+from django.test import AsyncClient, override_settings
+from django.urls import include, path
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITransactionTestCase
+
+from orders import async_views, throttling
+from orders.models import Order, OrderDetail, OrderEvent, Product
+from orders.serializers import OrderSerializer
+from orders.urls import get_async_urlpatterns, v1_router
+
+
+def share_connection(conn):
+    # in-memory test database is visible only via connection of main thread.
+    connections[conn.alias] = conn
+
+
+urlpatterns = [
+    path('api/v1/', include(get_async_urlpatterns())),
+    path('api/v1/', include(v1_router.urls)),
+]
+
+
+@override_settings(ROOT_URLCONF='orders.tests.test_async_views',
+                   ORDERS_RESPONSE_CACHE={'ENABLED': False})
+class AsyncViewsTest(APITransactionTestCase):
+    """Verify async entry points keep semantics of OrderViewSet actions."""
+
+    def setUp(self):
+        super().setUp()
+        throttling.counters.clear()
+        conn = connections['default']
+        conn.inc_thread_sharing()
+        self.addCleanup(conn.dec_thread_sharing)
+        executor = ThreadPoolExecutor(max_workers=2,
+                                      initializer=share_connection,
+                                      initargs=(conn,))
+        self.addCleanup(executor.shutdown)
+        patcher = mock.patch.object(async_views, 'get_executor',
+                                    return_value=executor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.async_client = AsyncClient()
+        self.product = Product.objects.create(name='Test_product')
+        self.order = Order.objects.create(external_id='test_ext_id')
+        OrderDetail.objects.create(
+            product=self.product, order=self.order, amount=5, price=7.95)
+        self.detail_url = f'/api/v1/orders/{self.order.pk}/'
+
+    def request(self, method, url, data=None):
+        kwargs = {}
+        if data is not None:
+            kwargs = {'data': json.dumps(data),
+                      'content_type': 'application/json'}
+        return async_to_sync(getattr(self.async_client, method))(url, **kwargs)
+
+    def test_list_and_retrieve_served(self):
+        response = self.request('get', '/api/v1/orders/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Range'], '0-0/1')
+        self.assertEqual(
+            response.content,
+            JSONRenderer().render(
+                OrderSerializer(Order.objects.all(), many=True).data),
+        )
+        response = self.request('get', self.detail_url)
+        self.assertEqual(
+            response.content,
+            JSONRenderer().render(OrderSerializer(self.order).data))
+
+    def test_crud_semantics_kept(self):
+        response = self.request('post', '/api/v1/orders/', {
+            'external_id': 'created',
+            'details': [{'product': {'id': self.product.pk},
+                         'amount': 1, 'price': '2.00'}],
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.request('put', self.detail_url,
+                                {'external_id': 'changed'})
+        self.assertEqual(response.json()['external_id'], 'changed')
+
+        response = self.request('delete', self.detail_url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = self.request('get', self.detail_url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(ORDERS_CHANGE_FEED={'POLL_INTERVAL': 0.01})
+    def test_changes_long_polled(self):
+        self.request('post', '/api/v1/orders/', {
+            'external_id': 'created',
+            'details': [{'product': {'id': self.product.pk},
+                         'amount': 1, 'price': '2.00'}],
+        })
+        response = self.request('get', '/api/v1/orders/changes/?wait=1')
+        event = OrderEvent.objects.get()
+        self.assertEqual(response.json()['events'][0]['seq'], event.seq)
+
+        response = self.request(
+            'get', f'/api/v1/orders/changes/?after={event.seq}&wait=0.05')
+        self.assertEqual(response.json(), {'events': [], 'next': event.seq})
+        response = self.request('get', '/api/v1/orders/changes/?format=sse')
+        self.assertEqual(response.status_code,
+                         status.HTTP_406_NOT_ACCEPTABLE)
+
+    def test_list_actions_served_by_router(self):
+        response = self.request('get', '/api/v1/orders/stats/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('orders', response.json())
+        response = self.request('get', '/api/v1/orders/export/?format=ndjson')
+        self.assertEqual(response.status_code,
+                         status.HTTP_406_NOT_ACCEPTABLE)
+        self.assertFalse(response.streaming)
+        self.assertEqual(json.loads(response.content),
+                         async_views.EXPORT_NOT_SUPPORTED_TEXT)
+        response = self.request('post', '/api/v1/orders/bulk/', [{
+            'external_id': 'bulk',
+            'details': [{'product': {'id': self.product.pk},
+                         'amount': 1, 'price': '2.00'}],
+        }])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.request('post', '/api/v1/orders/batch/', {
+            'operations': [{'op': 'fail', 'id': self.order.pk}]})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.request('post', '/api/v1/orders/accept/', {
+            'ids': [self.order.pk]})
+        self.assertEqual(response.json(), {'updated': 0})
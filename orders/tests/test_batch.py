@@ -0,0 +1,136 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from orders import stats
+from orders.models import Order, OrderDetail, Product, Status
+from orders.tests import OrdersAPITestCase
+
+
+BATCH_URL = reverse('orders-batch')
+
+
+class BatchOperationsTest(OrdersAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.product = Product.objects.create(name='Sofa')
+        self.orders = {
+            order_status: self.create_order(f'ext-{order_status}',
+                                            order_status)
+            for order_status in Status.values
+        }
+        stats.rebuild()
+
+    def create_order(self, external_id, order_status=Status.NEW):
+        order = Order.objects.create(external_id=external_id,
+                                     status=order_status)
+        OrderDetail.objects.create(order=order, product=self.product,
+                                   amount=2, price='3.50')
+        return order
+
+    def get_order_data(self, external_id='created'):
+        return {'external_id': external_id,
+                'details': [{'product': {'id': self.product.id},
+                             'amount': 1, 'price': '7.00'}]}
+
+    def post(self, operations, **options):
+        return self.client.post(BATCH_URL,
+                                {'operations': operations, **options},
+                                format='json')
+
+    def get_statuses(self, results):
+        return [(result['index'], result['status']) for result in results]
+
+    def test_operations_applied(self):
+        new = self.orders[Status.NEW]
+        other = self.create_order('other')
+        draft = self.create_order('draft')
+        stats.rebuild()
+        response = self.post([
+            {'op': 'create', 'data': self.get_order_data()},
+            {'op': 'update', 'id': new.id, 'data': {'external_id': 'fixed'}},
+            {'op': 'accept', 'id': new.id},
+            {'op': 'fail', 'id': other.id},
+            {'op': 'delete', 'id': draft.id},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data
+        self.assertEqual(self.get_statuses(results), [
+            (0, 201), (1, 200), (2, 200), (3, 200), (4, 204)])
+        self.assertEqual(results[0]['order']['external_id'], 'created')
+        self.assertEqual(results[1]['order']['status'], Status.NEW)
+        self.assertEqual(results[2]['order']['external_id'], 'fixed')
+        self.assertEqual(results[2]['order']['status'], Status.ACCEPTED)
+        self.assertEqual(Order.objects.get(pk=other.pk).status, Status.FAILED)
+        self.assertFalse(Order.objects.filter(pk=draft.pk).exists())
+        self.assertFalse(OrderDetail.objects.filter(order=draft.pk).exists())
+        self.assertEqual(stats.get_status_counts(), {
+            Status.NEW: 1, Status.ACCEPTED: 2, Status.FAILED: 2})
+
+    def test_individual_rules_checked(self):
+        accepted = self.orders[Status.ACCEPTED]
+        failed = self.orders[Status.FAILED]
+        new = self.orders[Status.NEW]
+        operations = [
+            {'op': 'update', 'id': accepted.id, 'data': {'external_id': 'x'}},
+            {'op': 'accept', 'id': failed.id},
+            {'op': 'delete', 'id': accepted.id},
+            {'op': 'fail', 'id': 999},
+            {'op': 'create', 'data': {'external_id': 'no details'}},
+            {'op': 'archive', 'id': new.id},
+            {'op': 'accept', 'id': new.id},
+            {'op': 'accept', 'id': new.id},
+            {'op': 'delete', 'id': failed.id},
+            {'op': 'delete', 'id': failed.id},
+        ]
+        expected = [(0, 405), (1, 409), (2, 405), (3, 404), (4, 400),
+                    (5, 400), (6, 200), (7, 409), (8, 204), (9, 404)]
+
+        response = self.post(operations)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.get_statuses(response.data),
+                         [item for item in expected if item[1] >= 400])
+        self.assertEqual(Order.objects.get(pk=new.pk).status, Status.NEW)
+        self.assertTrue(Order.objects.filter(pk=failed.pk).exists())
+        self.assertEqual(stats.get_orders_count(), 3)
+
+        response = self.post(operations, atomic=False)
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(self.get_statuses(response.data), expected)
+        self.assertEqual(Order.objects.get(pk=new.pk).status, Status.ACCEPTED)
+        self.assertFalse(Order.objects.filter(pk=failed.pk).exists())
+        self.assertEqual(stats.get_status_counts(), {
+            Status.NEW: 0, Status.ACCEPTED: 2, Status.FAILED: 0})
+
+    def test_operations_of_same_kind_grouped(self):
+        def count_queries(size):
+            orders = [self.create_order(f'ext-{idx}') for idx in range(size)]
+            operations = [
+                {'op': 'update', 'id': order.id,
+                 'data': {'external_id': f'new-{order.id}'}}
+                for order in orders
+            ] + [
+                {'op': 'fail', 'id': order.id} for order in orders
+            ] + [
+                {'op': 'delete', 'id': order.id} for order in orders
+            ] + [
+                {'op': 'create', 'data': self.get_order_data(f'c-{idx}')}
+                for idx in range(size)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.post(operations)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(queries)
+
+        count_queries(1)  # products are cached.
+        self.assertEqual(count_queries(2), count_queries(20))
+
+    def test_invalid_envelope_rejected(self):
+        for data in ([], {'operations': {}}, {'atomic': False}):
+            response = self.client.post(BATCH_URL, data, format='json')
+            self.assertEqual(response.status_code,
+                             status.HTTP_400_BAD_REQUEST)
+        response = self.post([{'op': 'accept', 'id': 1}] * 1001)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,123 @@
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.core.management.base import OutputWrapper
+from django.db.models import Count
+from django.test import SimpleTestCase, TestCase
+
+from orders import benchmarks, stats
+from orders.models import Order, Product
+
+
+class SeedOrdersCommandTest(TestCase):
+
+    def test_orders_seeded(self):
+        call_command('seed_orders', '30', '--products', '5', '--min-details',
+                     '2', '--max-details', '4', stdout=io.StringIO())
+        self.assertEqual(Order.objects.count(), 30)
+        self.assertEqual(Product.objects.count(), 5)
+        details_counts = set(Order.objects.annotate(
+            qty=Count('details')).values_list('qty', flat=True))
+        self.assertTrue(details_counts <= {2, 3, 4})
+        self.assertEqual(stats.get_orders_count(), 30)
+
+        call_command('seed_orders', '30', stdout=io.StringIO())
+        self.assertEqual(Order.objects.count(), 30)
+
+    def test_invalid_details_range(self):
+        with self.assertRaises(CommandError):
+            call_command('seed_orders', '1', '--min-details', '3',
+                         '--max-details', '2')
+
+
+class BaselineTest(SimpleTestCase):
+
+    def test_regressions_found(self):
+        baseline = {
+            'list': {'throughput': 100.0, 'p95': 10.0},
+            'retrieve': {'throughput': 100.0, 'p95': 10.0},
+        }
+        results = {
+            'list': {'throughput': 90.0, 'p95': 12.0},
+            'retrieve': {'throughput': 70.0, 'p95': 13.0},
+            'create': {'throughput': 1.0, 'p95': 1000.0},
+        }
+        regressions = benchmarks.compare_with_baseline(results, baseline, 0.25)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith('retrieve: p95'))
+        self.assertTrue(regressions[1].startswith('retrieve: throughput'))
+
+
+class EndpointsSuiteTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        benchmarks.seed_orders(200, products_qty=3)
+
+    def test_every_scenario_run(self):
+        stdout = OutputWrapper(io.StringIO())
+        results = benchmarks.endpoints_suite(
+            {'concurrency': 1, 'requests': 2}, stdout)
+        self.assertEqual(set(results), set(
+            benchmarks.EndpointScenarios().get_cases()))
+        self.assertNotIn('errors', stdout._out.getvalue())
+        self.assertTrue(all(summary['throughput'] > 0
+                            for summary in results.values()))
+
+    def test_regression_fails_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            call_command('benchmark', 'endpoints', '--orders', '0',
+                         '--requests', '1', '--scenarios', 'retrieve',
+                         '--save-baseline', path, stdout=io.StringIO())
+            with open(path) as baseline:
+                data = json.load(baseline)
+            data['results']['retrieve']['throughput'] = 10 ** 9
+            with open(path, 'w') as baseline:
+                json.dump(data, baseline)
+            with self.assertRaisesMessage(CommandError, 'retrieve'):
+                call_command('benchmark', 'endpoints', '--orders', '0',
+                             '--requests', '1', '--scenarios', 'retrieve',
+                             '--baseline', path, stdout=io.StringIO())
+
+
+class HttpSuiteTest(TestCase):
+
+    def test_local_database_not_seeded(self):
+        suites = {'http': lambda options, stdout: None}
+        with mock.patch.dict(benchmarks.SUITES, suites):
+            call_command('benchmark', 'http', stdout=io.StringIO())
+        self.assertFalse(Order.objects.exists())
+
+
+class FiltersSuiteTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        benchmarks.seed_orders(200, products_qty=3)
+
+    def test_no_full_scan_with_sort(self):
+        stdout = io.StringIO()
+        call_command('benchmark', 'filters', '--orders', '0', '--repeat', '1',
+                     stdout=stdout)
+        self.assertIn('No full scans with sort.', stdout.getvalue())
+
+    def test_full_scan_with_sort_detected(self):
+        plan = Order.objects.order_by('external_id', 'status').explain()
+        self.assertTrue(benchmarks.is_full_scan_sort(plan))
+        plan = Order.objects.order_by('-created_at', '-id').explain()
+        self.assertFalse(benchmarks.is_full_scan_sort(plan))
+
+
+class RenderersSuiteTest(TestCase):
+
+    def test_renderers_compared(self):
+        benchmarks.seed_orders(30, products_qty=3)
+        stdout = io.StringIO()
+        call_command('benchmark', 'renderers', '--orders', '0', '--repeat',
+                     '1', stdout=stdout)
+        self.assertIn('FastJSONRenderer', stdout.getvalue())
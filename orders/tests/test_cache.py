@@ -0,0 +1,138 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from orders.cache import ProductCache, product_cache
+from orders.models import Order, OrderDetail, Product, Status
+from orders.tests import OrdersAPITestCase
+
+
+LIST_URL = reverse('orders-list')
+
+
+class ProductCacheTest(OrdersAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.products = [
+            Product.objects.create(name=f'test_product_{idx}')
+            for idx in range(3)
+        ]
+        self.cache = ProductCache(max_size=2, timeout=60)
+
+    def test_cached_products_are_taken_without_queries(self):
+        ids = [self.products[0].id, self.products[1].id]
+        with self.assertNumQueries(1):
+            self.cache.get_many(ids)
+        with self.assertNumQueries(0):
+            found = self.cache.get_many(ids)
+        self.assertEqual(found[ids[0]].name, 'test_product_0')
+        self.assertEqual(self.cache.stats()['hits'], 2)
+        self.assertEqual(self.cache.stats()['misses'], 2)
+
+    def test_missing_products_are_not_returned(self):
+        self.assertIsNone(self.cache.get(999))
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+    def test_least_recently_used_product_evicted(self):
+        first, second, third = (product.id for product in self.products)
+        self.cache.get_many([first, second])
+        self.cache.get(first)
+        self.cache.get(third)
+        self.assertEqual(list(self.cache._items), [first, third])
+
+    def test_expired_products_fetched_again(self):
+        product_id = self.products[0].id
+        with mock.patch('orders.cache.time.monotonic', return_value=0):
+            self.cache.get(product_id)
+        with mock.patch('orders.cache.time.monotonic', return_value=61):
+            with self.assertNumQueries(1):
+                self.cache.get(product_id)
+
+    def test_changed_product_invalidated(self):
+        product = self.products[0]
+        product_cache.get(product.id)
+        product.name = 'renamed_product'
+        product.save()
+        self.assertEqual(product_cache.get(product.id).name,
+                         'renamed_product')
+        product.delete()
+        self.assertIsNone(product_cache.get(product.id))
+
+    def test_products_changed_elsewhere_dropped(self):
+        self.cache.get(self.products[0].id)
+        cache.set(ProductCache.version_key, 'changed', timeout=None)
+        with self.assertNumQueries(0):
+            self.cache.get(self.products[0].id)
+        self.cache.check_version()
+        with self.assertNumQueries(1):
+            self.cache.get(self.products[0].id)
+        with self.assertNumQueries(0):
+            self.cache.get(self.products[0].id)
+
+
+# shared cache of tests process is used, exact COUNT query is expected.
+@override_settings(ORDERS_RESPONSE_CACHE={'ENABLED': True},
+                   ORDERS_MATERIALIZED_COUNTS=False)
+class ResponseCacheTest(OrdersAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.product = Product.objects.create(name='Test_product')
+        self.order = Order.objects.create(external_id='test_ext_id')
+        OrderDetail.objects.create(
+            product=self.product, order=self.order, amount=5, price=7.95)
+        self.detail_url = reverse('orders-detail',
+                                  kwargs={'pk': self.order.pk})
+
+    def test_repeated_requests_served_from_cache(self):
+        for url in (LIST_URL, self.detail_url):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                with self.assertNumQueries(0):
+                    cached_response = self.client.get(url)
+                self.assertEqual(cached_response.status_code,
+                                 status.HTTP_200_OK)
+                self.assertEqual(cached_response.content, response.content)
+                self.assertEqual(cached_response['ETag'], response['ETag'])
+
+    def test_not_modified_returned_for_known_etag(self):
+        etag = self.client.get(LIST_URL)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(LIST_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_cache_invalidated_by_status_change(self):
+        etag = self.client.get(self.detail_url)['ETag']
+        self.client.post(
+            reverse('orders-accept', kwargs={'pk': self.order.pk}))
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['status'], Status.ACCEPTED)
+
+    def test_cache_invalidated_by_order_update(self):
+        self.client.get(LIST_URL)
+        self.client.put(self.detail_url, {'external_id': 'changed_ext_id'},
+                        format='json')
+        response = self.client.get(LIST_URL)
+        self.assertEqual(response.json()[0]['external_id'], 'changed_ext_id')
+
+    def test_cache_invalidated_by_product_change(self):
+        self.client.get(LIST_URL)
+        self.product.name = 'Renamed_product'
+        self.product.save()
+        response = self.client.get(LIST_URL)
+        self.assertEqual(response.json()[0]['details'][0]['product']['name'],
+                         'Renamed_product')
+
+    @override_settings(ORDERS_RESPONSE_CACHE={'ENABLED': False})
+    def test_cache_could_be_disabled(self):
+        self.client.get(LIST_URL)
+        with self.assertNumQueries(3):
+            response = self.client.get(LIST_URL)
+        self.assertNotIn('ETag', response)
@@ -0,0 +1,86 @@
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+
+from orders.fast_serializers import get_order_rows, serialize_orders
+from orders.models import Order, OrderDetail, Product, Status
+from orders.serializers import OrderSerializer
+from orders.tests import OrdersAPITestCase
+
+
+LIST_URL = reverse('orders-list')
+
+
+class FastSerializersParityTest(OrdersAPITestCase):
+    """Verify fast serialization renders the same bytes as OrderSerializer."""
+
+    def setUp(self):
+        super().setUp()
+        products = [
+            Product.objects.create(name=name)
+            for name in ('Sofa', 'Стул "lux"', 'Table ')
+        ]
+        prices = ('0.10', '7.95', '1234567890.5', '12', '-3.333')
+        for idx in range(4):
+            order = Order.objects.create(external_id=f'ext-{idx}é')
+            for detail_idx in range(idx):
+                OrderDetail.objects.create(
+                    order=order,
+                    product=products[detail_idx % len(products)],
+                    amount=detail_idx * 7,
+                    price=prices[(idx + detail_idx) % len(prices)],
+                )
+        Order.objects.filter(pk=order.pk).update(status=Status.FAILED)
+
+    def render(self, data):
+        return JSONRenderer().render(data)
+
+    def test_orders_rendered_byte_for_byte(self):
+        orders = Order.objects.all()
+        self.assertEqual(
+            self.render(serialize_orders(get_order_rows(orders))),
+            self.render(OrderSerializer(orders, many=True).data),
+        )
+
+    @override_settings(REST_FRAMEWORK={'DATETIME_FORMAT': '%Y/%m/%d %H:%M'})
+    def test_datetime_format_setting_followed(self):
+        orders = Order.objects.all()
+        data = serialize_orders(get_order_rows(orders))
+        self.assertEqual(data, OrderSerializer(orders, many=True).data)
+        self.assertRegex(data[0]['created_at'], r'^\d{4}/\d\d/\d\d \d\d:\d\d$')
+
+    def test_empty_rows_serialized_without_queries(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(serialize_orders([]), [])
+
+    def test_endpoints_return_same_content(self):
+        order = Order.objects.last()
+        urls = (
+            LIST_URL,
+            LIST_URL + '?limit=2&offset=1',
+            LIST_URL + '?status=failed',
+            LIST_URL + '?fields=id,status',
+            LIST_URL + '?expand=details',
+            LIST_URL + '?fields=external_id,details,id&expand=details.product',
+            reverse('orders-detail', kwargs={'pk': order.pk}),
+            reverse('orders-detail', kwargs={'pk': order.pk}) + '?expand=',
+        )
+        disabled = {'ENABLED': False}
+        for url in urls:
+            with self.subTest(url=url):
+                with self.settings(ORDERS_RESPONSE_CACHE=disabled):
+                    expected = self.client.get(url)
+                with self.settings(ORDERS_RESPONSE_CACHE=disabled,
+                                   ORDERS_FAST_SERIALIZATION=True):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(response.content, expected.content)
+                self.assertEqual(response.get('Content-Range'),
+                                 expected.get('Content-Range'))
+
+    @override_settings(ORDERS_FAST_SERIALIZATION=True,
+                       ORDERS_RESPONSE_CACHE={'ENABLED': False})
+    def test_missing_order_not_found(self):
+        response = self.client.get(reverse('orders-detail',
+                                           kwargs={'pk': 999}))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,156 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from orders import feed
+from orders.models import EventType, Order, OrderEvent, Product, Status
+from orders.tests import OrdersAPITestCase
+
+
+CHANGES_URL = reverse('orders-changes')
+
+
+@override_settings(ORDERS_CHANGE_FEED={'POLL_INTERVAL': 0.01,
+                                       'STREAM_TIMEOUT': 0})
+class ChangeFeedTest(OrdersAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.product = Product.objects.create(name='Sofa')
+
+    def create_orders(self, *external_ids):
+        response = self.client.post(reverse('orders-bulk'), [
+            {'external_id': external_id,
+             'details': [{'product': {'id': self.product.id}, 'amount': 1,
+                          'price': '2.00'}]}
+            for external_id in external_ids
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return [result['order']['id'] for result in response.data]
+
+    def get_changes(self, **params):
+        response = self.client.get(CHANGES_URL, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def get_events(self, data):
+        return [(event['type'], event['order_id'], event['status'],
+                 event['external_id']) for event in data['events']]
+
+    def test_changes_read_after_cursor(self):
+        first, second, third = self.create_orders('a', 'b', 'c')
+        data = self.get_changes(limit=2)
+        self.assertEqual(self.get_events(data), [
+            (EventType.CREATED, first, Status.NEW, 'a'),
+            (EventType.CREATED, second, Status.NEW, 'b'),
+        ])
+        cursor = data['next']
+        self.assertEqual(cursor, data['events'][-1]['seq'])
+
+        self.client.put(reverse('orders-detail', kwargs={'pk': first}),
+                        {'external_id': 'a2'}, format='json')
+        self.client.post(reverse('orders-accept', kwargs={'pk': first}))
+        self.client.post(reverse('orders-fail-many'), {'ids': [second]},
+                         format='json')
+        self.client.delete(reverse('orders-detail', kwargs={'pk': second}))
+        data = self.get_changes(after=cursor)
+        self.assertEqual(self.get_events(data), [
+            (EventType.CREATED, third, Status.NEW, 'c'),
+            (EventType.UPDATED, first, Status.NEW, 'a2'),
+            (EventType.STATUS_CHANGED, first, Status.ACCEPTED, 'a2'),
+            (EventType.STATUS_CHANGED, second, Status.FAILED, 'b'),
+            (EventType.DELETED, second, Status.FAILED, 'b'),
+        ])
+        data = self.get_changes(after=data['next'], wait=0.05)
+        self.assertEqual(data['events'], [])
+
+    def test_status_filter_moves_cursor(self):
+        first, second = self.create_orders('a', 'b')
+        self.client.post(reverse('orders-accept', kwargs={'pk': second}))
+        data = self.get_changes(status=Status.ACCEPTED)
+        self.assertEqual(self.get_events(data), [
+            (EventType.STATUS_CHANGED, second, Status.ACCEPTED, 'b')])
+        self.client.post(reverse('orders-fail', kwargs={'pk': first}))
+        data = self.get_changes(status=Status.ACCEPTED, after=data['next'])
+        self.assertEqual(data['events'], [])
+        self.assertEqual(data['next'], OrderEvent.objects.last().seq)
+
+    def test_rolled_back_changes_not_recorded(self):
+        order_id, = self.create_orders('a')
+        response = self.client.post(reverse('orders-batch'), {'operations': [
+            {'op': 'accept', 'id': order_id},
+            {'op': 'delete', 'id': 999},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(OrderEvent.objects.count(), 1)
+
+        with override_settings(ORDERS_CHANGE_FEED={'ENABLED': False}):
+            self.create_orders('b')
+        self.assertEqual(OrderEvent.objects.count(), 1)
+
+    def test_changes_streamed(self):
+        self.create_orders('a', 'b')
+        response = self.client.get(CHANGES_URL, {'format': 'sse'},
+                                   HTTP_LAST_EVENT_ID='0')
+        self.assertEqual(response['Content-Type'],
+                         'text/event-stream; charset=utf-8')
+        content = b''.join(response.streaming_content).decode()
+        messages = content.split('\n\n')
+        self.assertEqual(messages[0], 'retry: 10')
+        first = OrderEvent.objects.first()
+        self.assertTrue(messages[1].startswith(
+            f'id: {first.seq}\nevent: created\ndata: {{"seq":{first.seq},'))
+        self.assertEqual(len(messages), 4)
+
+    def test_events_committed_later_numbered_after_read_ones(self):
+        first, second = self.create_orders('a', 'b')
+        cursor = self.get_changes()['next']
+        # event of transaction committed after the newer one was read.
+        late = OrderEvent.objects.get(order_id=first)
+        OrderEvent.objects.filter(id=late.id).update(seq=None)
+        self.assertEqual(feed._number_events(), 1)
+        data = self.get_changes(after=cursor)
+        self.assertEqual(self.get_events(data), [
+            (EventType.CREATED, first, Status.NEW, 'a')])
+        self.assertEqual(data['next'], cursor + 1)
+
+    def test_events_numbered_in_order_seen_on_other_databases(self):
+        first, second = self.create_orders('a', 'b')
+        cursor = self.get_changes()['next']
+        late = OrderEvent.objects.get(order_id=first)
+        OrderEvent.objects.filter(id=late.id).update(seq=None)
+        with mock.patch.object(connection, 'vendor', 'mysql'):
+            feed.publish_events()
+        self.assertEqual(OrderEvent.objects.get(id=late.id).seq, cursor + 1)
+
+    def test_invalid_params_rejected(self):
+        for params in ({'after': -1}, {'limit': 0}, {'wait': 'soon'},
+                       {'wait': 31}, {'status': 'deleted'}):
+            response = self.client.get(CHANGES_URL, params)
+            self.assertEqual(response.status_code,
+                             status.HTTP_400_BAD_REQUEST)
+
+    def test_old_events_compacted(self):
+        first, second, third = self.create_orders('a', 'b', 'c')
+        self.client.post(reverse('orders-accept', kwargs={'pk': first}))
+        self.client.delete(reverse('orders-detail', kwargs={'pk': second}))
+        OrderEvent.objects.update(
+            created_at=timezone.now() - timedelta(days=8))
+        self.client.post(reverse('orders-fail', kwargs={'pk': third}))
+
+        out = StringIO()
+        call_command('compact_order_events', batch_size=2, stdout=out)
+        self.assertIn('Deleted 4 events', out.getvalue())
+        self.assertEqual(self.get_events(self.get_changes()), [
+            (EventType.STATUS_CHANGED, first, Status.ACCEPTED, 'a'),
+            (EventType.STATUS_CHANGED, third, Status.FAILED, 'c'),
+        ])
+        self.assertEqual(set(Order.objects.values_list('id', flat=True)),
+                         {first, third})
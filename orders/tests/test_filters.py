@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+from django.urls import reverse
+from rest_framework import status
+
+from orders.models import Order
+from orders.tests import OrdersAPITestCase
+
+
+LIST_URL = reverse('orders-list')
+START = datetime(2021, 6, 15, 12, 0)
+
+
+class CreatedAtFilterTest(OrdersAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        # ids do not follow creation time, two orders are created together.
+        for idx, minutes in enumerate((30, 0, 90, 60, 60)):
+            order = Order.objects.create(external_id=f'ext-{idx}')
+            Order.objects.filter(pk=order.pk).update(
+                created_at=START + timedelta(minutes=minutes))
+        self.ids = list(Order.objects.values_list('id', flat=True))
+
+    def get_ids(self, params: dict) -> list:
+        response = self.client.get(LIST_URL, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [order['id'] for order in response.data]
+
+    def test_created_at_range(self):
+        ids = self.get_ids({
+            'created_at__gte': (START + timedelta(minutes=30)).isoformat(),
+            'created_at__lt': (START + timedelta(minutes=90)).isoformat(),
+        })
+        # ordered by created_at, as range is filtered.
+        self.assertEqual(ids, [self.ids[0], self.ids[3], self.ids[4]])
+
+    def test_orderings(self):
+        first, second, third, fourth, fifth = self.ids
+        cases = {
+            '': self.ids,
+            'id': self.ids,
+            '-id': self.ids[::-1],
+            'created_at': [second, first, fourth, fifth, third],
+            '-created_at': [third, fifth, fourth, first, second],
+        }
+        for ordering, expected in cases.items():
+            with self.subTest(ordering=ordering):
+                self.assertEqual(self.get_ids({'ordering': ordering}),
+                                 expected)
+
+    def test_explicit_ordering_of_range(self):
+        ids = self.get_ids({'created_at__gte': START.isoformat(),
+                            'ordering': '-id'})
+        self.assertEqual(ids, self.ids[::-1])
+
+    def test_unknown_ordering_rejected(self):
+        for ordering in ('status', 'created_at,id', 'external_id'):
+            with self.subTest(ordering=ordering):
+                response = self.client.get(LIST_URL, {'ordering': ordering})
+                self.assertEqual(response.status_code,
+                                 status.HTTP_400_BAD_REQUEST)
+                self.assertIn('ordering', response.data)
@@ -0,0 +1,95 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from orders import idempotency, stats
+from orders.models import IdempotencyKey, Order, OrderDetail, Product
+from orders.tests import OrdersAPITestCase
+
+
+LIST_URL = reverse('orders-list')
+BULK_URL = reverse('orders-bulk')
+
+
+class IdempotentCreateTest(OrdersAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.product = Product.objects.create(name='Test_product')
+        self.order_data = {
+            'external_id': 'first',
+            'details': [{'product': {'id': self.product.id}, 'amount': 2,
+                         'price': '3.50'}],
+        }
+
+    def post(self, data, key=None, url=LIST_URL):
+        headers = {} if key is None else {'HTTP_IDEMPOTENCY_KEY': key}
+        return self.client.post(url, data, format='json', **headers)
+
+    def test_retry_returns_stored_response(self):
+        response = self.post(self.order_data, key='abc')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        retry = self.post(self.order_data, key='abc')
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, response.data)
+        self.assertEqual(retry[idempotency.REPLAYED_HEADER], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(stats.get_orders_count(), 1)
+
+        self.post(self.order_data, key='other')
+        self.post(self.order_data)
+        self.assertEqual(Order.objects.count(), 3)
+
+    def test_key_reused_for_other_request_rejected(self):
+        self.post(self.order_data, key='abc')
+        response = self.post({**self.order_data, 'external_id': 'second'},
+                             key='abc')
+        self.assertEqual(response.status_code,
+                         status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_expired_key_handled_again(self):
+        self.post(self.order_data, key='abc')
+        IdempotencyKey.objects.update(
+            expires_at=timezone.now() - timedelta(seconds=1))
+        response = self.post(self.order_data, key='abc')
+        self.assertNotIn(idempotency.REPLAYED_HEADER, response)
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+    def test_failed_request_could_be_retried(self):
+        with mock.patch.object(stats, 'record_orders_created',
+                               side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.post(self.order_data, key='abc')
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderDetail.objects.exists())
+        self.assertFalse(IdempotencyKey.objects.exists())
+        response = self.post(self.order_data, key='abc')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_every_detail_product_validated(self):
+        self.order_data['details'].append(
+            {'product': {'id': 999, 'name': 'new'}, 'amount': 1,
+             'price': '1.00'})
+        response = self.post(self.order_data, key='abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(Product.objects.filter(pk=999).exists())
+
+    def test_bulk_retry_returns_stored_response(self):
+        response = self.post([self.order_data] * 2, key='abc', url=BULK_URL)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        retry = self.post([self.order_data] * 2, key='abc', url=BULK_URL)
+        self.assertEqual(retry.data, response.data)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_long_key_rejected(self):
+        response = self.post(self.order_data, key='k' * 256)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
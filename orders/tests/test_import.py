@@ -0,0 +1,134 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import TestCase
+
+from orders import importer
+from orders.models import Order, OrderDetail, Product, Status, StatusCounter
+
+
+class ImportOrdersTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.product = Product.objects.create(name='Test_product')
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write_file(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def get_order_line(self, external_id, product_id=None):
+        return json.dumps({
+            'external_id': external_id,
+            'details': [{'product': {'id': product_id or self.product.id},
+                         'amount': 2, 'price': '3.50'}],
+        }) + '\n'
+
+    def read_rejects(self, path):
+        with open(path + '.rejects', encoding='utf-8') as rejects:
+            return [json.loads(line) for line in rejects]
+
+    def test_jsonl_imported_and_rejects_written(self):
+        path = self.write_file('orders.jsonl', ''.join((
+            self.get_order_line('first'),
+            'not json\n',
+            '\n',
+            self.get_order_line('missing_product', 999),
+            json.dumps({'external_id': 'no_details', 'details': []}) + '\n',
+            self.get_order_line('second'),
+        )))
+        progress = importer.import_orders(path, batch_size=2)
+        self.assertEqual(
+            (progress['records'], progress['imported'], progress['rejected']),
+            (5, 2, 3),
+        )
+        self.assertEqual(
+            list(Order.objects.values_list('external_id', flat=True)),
+            ['first', 'second'])
+        self.assertEqual(OrderDetail.objects.count(), 2)
+        self.assertEqual(
+            StatusCounter.objects.get(status=Status.NEW).count, 2)
+        self.assertEqual(
+            sorted(reject['line'] for reject in self.read_rejects(path)),
+            [2, 4, 5])
+
+    def test_csv_rows_grouped_into_orders(self):
+        path = self.write_file('orders.csv', (
+            'order_id,status,created_at,external_id,detail_id,product_id,'
+            'product_name,amount,price\n'
+            f'1,new,,first,1,{self.product.id},Test_product,1,2.00\n'
+            f'1,new,,first,2,{self.product.id},Test_product,3,4.00\n'
+            f'2,new,,second,3,{self.product.id},Test_product,5,6.00\n'
+        ))
+        progress = importer.import_orders(path)
+        self.assertEqual(progress['imported'], 2)
+        first = Order.objects.get(external_id='first')
+        self.assertEqual(
+            list(first.details.values_list('amount', flat=True)), [1, 3])
+
+    def test_import_resumed_from_checkpoint(self):
+        path = self.write_file('orders.jsonl', ''.join(
+            self.get_order_line(f'order_{idx}') for idx in range(5)
+        ) + 'not json\n')
+        write_batch = importer.write_batch
+
+        def interrupted_write_batch(batch, rejects):
+            if batch[0][2]['external_id'] == 'order_4':
+                raise KeyboardInterrupt
+            return write_batch(batch, rejects)
+
+        with mock.patch.object(importer, 'write_batch',
+                               interrupted_write_batch):
+            with self.assertRaises(KeyboardInterrupt):
+                importer.import_orders(path, batch_size=2)
+        self.assertEqual(Order.objects.count(), 4)
+
+        progress = importer.import_orders(path, batch_size=2)
+        self.assertEqual(
+            (progress['records'], progress['imported'], progress['rejected']),
+            (6, 5, 1),
+        )
+        self.assertEqual(Order.objects.count(), 5)
+        self.assertEqual(len(self.read_rejects(path)), 1)
+
+        progress = importer.import_orders(path)
+        self.assertEqual(Order.objects.count(), 5)
+
+    def test_batch_rolled_back_without_checkpoint(self):
+        path = self.write_file('orders.jsonl', ''.join(
+            self.get_order_line(f'order_{idx}') for idx in range(4)))
+        save_checkpoint = importer.save_checkpoint
+
+        def interrupted_save_checkpoint(name, progress):
+            if progress['records'] > 2:
+                raise KeyboardInterrupt
+            save_checkpoint(name, progress)
+
+        with mock.patch.object(importer, 'save_checkpoint',
+                               interrupted_save_checkpoint):
+            with self.assertRaises(KeyboardInterrupt):
+                importer.import_orders(path, batch_size=2)
+        self.assertEqual(Order.objects.count(), 2)
+
+        progress = importer.import_orders(path, batch_size=2)
+        self.assertEqual((progress['records'], progress['imported']), (4, 4))
+        self.assertEqual(
+            list(Order.objects.values_list('external_id', flat=True)),
+            [f'order_{idx}' for idx in range(4)])
+
+    def test_validated_in_worker_processes(self):
+        path = self.write_file('orders.jsonl', ''.join(
+            self.get_order_line(f'order_{idx}') for idx in range(10)
+        ) + 'not json\n')
+        progress = importer.import_orders(path, workers=2, chunk_size=3)
+        self.assertEqual((progress['imported'], progress['rejected']), (10, 1))
+        self.assertEqual(
+            list(Order.objects.values_list('external_id', flat=True)),
+            [f'order_{idx}' for idx in range(10)])
@@ -0,0 +1,147 @@
+import os
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from orders import metrics
+from orders.cache import product_cache
+from orders.models import Order, OrderDetail, Product
+from orders.tests import OrdersAPITestCase
+
+
+LIST_URL = reverse('orders-list')
+METRICS_URL = reverse('metrics')
+METRICS_TOKEN = 'secret'
+
+
+# exact COUNT query is expected.
+@override_settings(ORDERS_MATERIALIZED_COUNTS=False,
+                   ORDERS_METRICS={'TOKEN': METRICS_TOKEN})
+class MetricsMiddlewareTest(OrdersAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        metrics.registry.clear()
+        product = Product.objects.create(name='Test_product')
+        order = Order.objects.create(external_id='test_ext_id')
+        OrderDetail.objects.create(product=product, order=order, amount=5,
+                                   price=7.95)
+
+    def get_server_timing(self, response) -> dict:
+        timings = {}
+        for item in response['Server-Timing'].split(', '):
+            name, *params = item.split(';')
+            timings[name] = dict(param.split('=', 1) for param in params)
+        return timings
+
+    def test_server_timing_header(self):
+        response = self.client.get(LIST_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timings = self.get_server_timing(response)
+        # count + orders + details joined with products.
+        self.assertEqual(timings['db']['desc'], '"3 queries"')
+        self.assertEqual(
+            set(timings), {'db', 'count', 'serialize', 'render', 'total'})
+        self.assertGreaterEqual(float(timings['total']['dur']),
+                                float(timings['db']['dur']))
+
+    def test_cached_count_skips_count_phase(self):
+        response = self.client.get(LIST_URL, {'count': 'none'})
+        self.assertNotIn('count', self.get_server_timing(response))
+
+    def test_metrics_endpoint(self):
+        self.client.get(LIST_URL)
+        self.client.get(reverse('orders-detail', kwargs={'pk': 999}))
+        response = self.client.get(
+            METRICS_URL, HTTP_AUTHORIZATION=f'Bearer {METRICS_TOKEN}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'],
+                         metrics.PROMETHEUS_CONTENT_TYPE)
+        content = response.content.decode()
+        self.assertIn(
+            'orders_requests_total{view="OrderViewSet",action="list",'
+            'method="GET",status="200"} 1', content)
+        self.assertIn(
+            'orders_requests_total{view="OrderViewSet",action="retrieve",'
+            'method="GET",status="404"} 1', content)
+        self.assertIn(
+            'orders_request_queries_bucket{view="OrderViewSet",'
+            'action="list",method="GET",le="3"} 1', content)
+        self.assertIn('orders_request_count_duration_seconds_count'
+                      '{view="OrderViewSet",action="list",method="GET"} 1',
+                      content)
+        self.assertIn('# TYPE orders_product_cache_hits counter', content)
+
+    def test_product_cache_counted(self):
+        product_id = Product.objects.get().id
+        product_cache.clear()
+        product_cache.get_many([product_id, 999])
+        product_cache.get(product_id)
+        content = metrics.registry.render()
+        self.assertIn('orders_product_cache_hits 1\n', content)
+        self.assertIn('orders_product_cache_misses 2\n', content)
+
+    def test_metrics_endpoint_requires_token(self):
+        for authorization in ('', 'Bearer wrong'):
+            response = self.client.get(METRICS_URL,
+                                       HTTP_AUTHORIZATION=authorization)
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(ORDERS_METRICS_ENABLED=False)
+    def test_disabled(self):
+        response = self.client.get(LIST_URL)
+        self.assertNotIn('Server-Timing', response)
+
+
+class HistogramTest(SimpleTestCase):
+
+    def test_buckets_cumulative(self):
+        histogram = metrics.Histogram('test', 'Test.', (1, 5))
+        for value in (0.5, 1, 3, 10):
+            histogram.observe(('a',), value)
+        self.assertEqual(histogram.render(('label',)), [
+            '# HELP test Test.',
+            '# TYPE test histogram',
+            'test_bucket{label="a",le="1"} 2',
+            'test_bucket{label="a",le="5"} 3',
+            'test_bucket{label="a",le="+Inf"} 4',
+            'test_sum{label="a"} 14.5',
+            'test_count{label="a"} 4',
+        ])
+
+    def test_processes_share_store(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'metrics.sqlite3')
+        first, second = (
+            metrics.MetricsRegistry(metrics.SQLiteMetricsStore(path),
+                                    flush_interval=60)
+            for _ in range(2)
+        )
+        request_metrics = metrics.RequestMetrics()
+        labels = ('OrderViewSet', 'list', 'GET')
+        first.observe(labels, 200, 0.002, request_metrics)
+        second.observe(labels, 200, 0.02, request_metrics)
+        second.flush()
+        content = first.render()
+        self.assertIn('orders_requests_total{view="OrderViewSet",'
+                      'action="list",method="GET",status="200"} 2', content)
+        self.assertIn('orders_request_duration_seconds_bucket{'
+                      'view="OrderViewSet",action="list",method="GET",'
+                      'le="0.0025"} 1', content)
+        self.assertEqual(first.render(), content)
+
+    def test_nested_phase_counted_once(self):
+        request_metrics = metrics.RequestMetrics()
+        with metrics.activate(request_metrics):
+            with metrics.timed('serialize'):
+                with metrics.timed('serialize'):
+                    pass
+        self.assertIn('serialize', request_metrics.timings)
+        self.assertFalse(request_metrics.active)
+        self.assertIsNone(metrics.get_current())
@@ -0,0 +1,96 @@
+from urllib.parse import parse_qs, urlparse
+
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from orders.models import Order
+from orders.paginator import calc_end_index, encode_cursor
+from orders.tests import OrdersAPITestCase
+
+
+LIST_URL = reverse('orders-list')
+
+ORDERS_QTY = 7
+
+
+def get_links(response) -> dict:
+    """Parse Link header into mapping of rel to query params."""
+    links = {}
+    for link in filter(None, response.get('Link', '').split(', ')):
+        url, rel = link.split('; ')
+        params = parse_qs(urlparse(url.strip('<>')).query)
+        links[rel[len('rel="'):-1]] = {
+            key: value[0] for key, value in params.items()
+        }
+    return links
+
+
+class CalcEndIndexTest(OrdersAPITestCase):
+
+    def test_end_index_does_not_exceed_last_item(self):
+        self.assertEqual(calc_end_index(10, 25, 0), 9)
+        self.assertEqual(calc_end_index(10, 5, 7), 9)
+        self.assertEqual(calc_end_index(10, 5, 2), 6)
+
+
+# exact COUNT query is expected.
+@override_settings(ORDERS_MATERIALIZED_COUNTS=False)
+class CustomPaginationTest(OrdersAPITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Order.objects.bulk_create(
+            Order(external_id=f'test_ext_id_{idx}')
+            for idx in range(ORDERS_QTY)
+        )
+        cls.ids = list(Order.objects.values_list('id', flat=True))
+
+    def test_offset_mode_sets_content_range(self):
+        response = self.client.get(LIST_URL, {'limit': 3, 'offset': 2})
+        self.assertEqual(response['Content-Range'], f'2-4/{ORDERS_QTY}')
+        self.assertEqual([order['id'] for order in response.data],
+                         self.ids[2:5])
+
+    def test_offset_mode_count_could_be_skipped(self):
+        with self.assertNumQueries(2):  # orders and details, no count.
+            response = self.client.get(
+                LIST_URL, {'limit': 3, 'offset': 5, 'count': 'none'})
+        self.assertEqual(response['Content-Range'], '5-6/*')
+
+    def test_keyset_mode_walks_all_pages_forward_and_back(self):
+        for keyset in ('id', 'created_at'):
+            with self.subTest(keyset=keyset):
+                params = {'limit': 3, 'cursor': '', 'keyset': keyset}
+                seen = []
+                pages = []
+                while params is not None:
+                    response = self.client.get(LIST_URL, params)
+                    self.assertEqual(response.status_code, status.HTTP_200_OK)
+                    self.assertNotIn('Content-Range', response)
+                    page_ids = [order['id'] for order in response.data]
+                    pages.append(page_ids)
+                    seen.extend(page_ids)
+                    params = get_links(response).get('next')
+                self.assertEqual(seen, self.ids)
+
+                links = get_links(response)
+                response = self.client.get(LIST_URL, links['prev'])
+                self.assertEqual([order['id'] for order in response.data],
+                                 pages[-2])
+
+    def test_keyset_mode_count_is_opt_in(self):
+        response = self.client.get(LIST_URL, {'cursor': ''})
+        self.assertNotIn('X-Total-Count', response)
+        response = self.client.get(LIST_URL, {'cursor': '', 'count': 'exact'})
+        self.assertEqual(response['X-Total-Count'], str(ORDERS_QTY))
+
+    def test_invalid_cursor_returns_not_found(self):
+        for cursor in ('garbage', encode_cursor('unknown', [1]),
+                       encode_cursor('id', ['not_number']),
+                       encode_cursor('created_at', [1, 1]),
+                       encode_cursor('id', [None])):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(LIST_URL, {'cursor': cursor})
+                self.assertEqual(response.status_code,
+                                 status.HTTP_404_NOT_FOUND)
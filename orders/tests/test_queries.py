@@ -0,0 +1,89 @@
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from orders.models import Order, OrderDetail, Product
+from orders.tests import OrdersAPITestCase
+
+
+LIST_URL = reverse('orders-list')
+
+ORDERS_QTY = 30
+DETAILS_PER_ORDER = 5
+
+
+# exact COUNT query is expected.
+@override_settings(ORDERS_MATERIALIZED_COUNTS=False)
+class OrderQueriesTest(OrdersAPITestCase):
+    """Verify order endpoints issue a fixed number of queries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Product.objects.bulk_create(
+            Product(name=f'test_product_{idx}')
+            for idx in range(DETAILS_PER_ORDER)
+        )
+        products = list(Product.objects.all())
+        Order.objects.bulk_create(
+            Order(external_id=f'test_ext_id_{idx}')
+            for idx in range(ORDERS_QTY)
+        )
+        orders = list(Order.objects.all())
+        OrderDetail.objects.bulk_create(
+            OrderDetail(order=order, product=product, amount=1, price=2.50)
+            for order in orders
+            for product in products
+        )
+        cls.order = orders[0]
+
+    def test_list_queries_do_not_depend_on_page_size(self):
+        # count + orders + details joined with products.
+        for limit in (1, 10, ORDERS_QTY):
+            with self.subTest(limit=limit):
+                with self.assertNumQueries(3):
+                    response = self.client.get(LIST_URL, {'limit': limit})
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(len(response.data), limit)
+
+    def test_list_without_details_queries(self):
+        # count + orders.
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                LIST_URL, {'fields': 'id,status', 'limit': ORDERS_QTY})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), ORDERS_QTY)
+        self.assertEqual(set(response.data[0]), {'id', 'status'})
+
+    def test_list_without_products_queries(self):
+        # count + orders + details not joined with products.
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(LIST_URL, {'expand': 'details'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(context.captured_queries), 3)
+        self.assertNotIn('orders_product',
+                         context.captured_queries[-1]['sql'])
+
+    def test_retrieve_queries(self):
+        url = reverse('orders-detail', kwargs={'pk': self.order.pk})
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['details']), DETAILS_PER_ORDER)
+
+    def test_accept_queries(self):
+        url = reverse('orders-accept', kwargs={'pk': self.order.pk})
+        # order + details joined with products + locked order, change feed
+        # event, update of order and of status counters inside savepoint.
+        with self.assertNumQueries(8):
+            response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['details']), DETAILS_PER_ORDER)
+
+    def test_fail_queries(self):
+        url = reverse('orders-fail', kwargs={'pk': self.order.pk})
+        with self.assertNumQueries(8):
+            response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['details']), DETAILS_PER_ORDER)
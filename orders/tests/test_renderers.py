@@ -0,0 +1,56 @@
+import datetime
+import uuid
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+
+from orders import renderers
+from orders.renderers import FastJSONRenderer
+
+
+class FastJSONRendererTest(SimpleTestCase):
+
+    def assertSameBytes(self, data, accepted_media_type=None):
+        self.assertEqual(
+            FastJSONRenderer().render(data, accepted_media_type),
+            JSONRenderer().render(data, accepted_media_type),
+        )
+
+    def test_orders_rendered_byte_for_byte(self):
+        strings = ''.join(map(chr, range(0x80))) + 'é Стул 💺 \u2028\u2029'
+        orders = ReturnList([ReturnDict({
+            'id': 2 ** 62,
+            'status': 'new',
+            'created_at': '18-10-2026 08:46:00',
+            'external_id': strings,
+            'details': [{
+                'id': 1,
+                'product': {'id': -1, 'name': '"quoted" \\ slash'},
+                'amount': 0,
+                'price': '-3.33',
+            }],
+        }, serializer=None)], serializer=None)
+        self.assertSameBytes(orders)
+        self.assertSameBytes({'detail': gettext_lazy('Not found.'),
+                              'empty': [{}, [], None, True, False, '']})
+
+    def test_other_types_converted_by_encoder(self):
+        tz = datetime.timezone(datetime.timedelta(hours=3))
+        self.assertSameBytes([
+            datetime.datetime(2021, 6, 15, 16, 27, 27, 5),
+            datetime.datetime(2021, 6, 15, tzinfo=datetime.timezone.utc),
+            datetime.datetime(2021, 6, 15, tzinfo=tz),
+            datetime.date(2021, 6, 15), datetime.time(16, 27),
+            Decimal('12.50'), uuid.UUID(int=1), 0.5,
+        ])
+
+    def test_unsupported_data_falls_back(self):
+        self.assertSameBytes({'big': 2 ** 70, 1: 'not string key'})
+        self.assertSameBytes({'indented': [1]}, 'application/json; indent=4')
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertSameBytes({'id': 1})
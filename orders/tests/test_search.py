@@ -0,0 +1,99 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from orders import search
+from orders.models import Order
+from orders.tests import OrdersAPITestCase
+
+
+LIST_URL = reverse('orders-list')
+
+
+def find(term: str) -> list:
+    return sorted(search.filter_substring(Order.objects.all(), term)
+                  .values_list('external_id', flat=True))
+
+
+class SearchViewTest(OrdersAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        for external_id in ('gh-158-7771', 'GH-159-0001', 'vr-888-gh-15',
+                            'ab-1'):
+            Order.objects.create(external_id=external_id)
+
+    def get_external_ids(self, params: dict) -> list:
+        response = self.client.get(LIST_URL, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [order['external_id'] for order in response.data]
+
+    def test_substring_search_case_insensitive(self):
+        with CaptureQueriesContext(connection) as context:
+            external_ids = self.get_external_ids({'search': 'gh-15'})
+        self.assertEqual(external_ids,
+                         ['gh-158-7771', 'GH-159-0001', 'vr-888-gh-15'])
+        if search.has_search_table(connection):
+            self.assertTrue(any(search.SEARCH_TABLE in query['sql']
+                                for query in context.captured_queries))
+
+    def test_search_terms_combined(self):
+        self.assertEqual(self.get_external_ids({'search': 'gh 7771'}),
+                         ['gh-158-7771'])
+
+    def test_short_term_searched(self):
+        self.assertEqual(self.get_external_ids({'search': 'b-'}), ['ab-1'])
+
+    def test_prefix_search_case_sensitive(self):
+        self.assertEqual(
+            self.get_external_ids({'external_id_prefix': 'gh-15'}),
+            ['gh-158-7771'])
+
+    def test_quotes_in_term_searched(self):
+        self.assertEqual(self.get_external_ids({'search': '"gh-158'}), [])
+
+    def test_prefix_of_last_code_points_searched(self):
+        Order.objects.create(external_id='gh-\U0010ffff')
+        Order.objects.create(external_id='gh-\ud7ff-1')
+        self.assertEqual(search.get_prefix_end('a\U0010ffff'), 'b')
+        self.assertIsNone(search.get_prefix_end('\U0010ffff'))
+        self.assertEqual(search.get_prefix_end('\ud7ff'), '\ue000')
+        for prefix in ('gh-\U0010ffff', '\U0010ffff', 'gh-\ud7ff'):
+            with self.subTest(prefix=prefix):
+                expected = [external_id for external_id in (
+                    'gh-\U0010ffff', 'gh-\ud7ff-1') if
+                    external_id.startswith(prefix)]
+                self.assertEqual(
+                    self.get_external_ids({'external_id_prefix': prefix}),
+                    expected)
+
+
+class SearchIndexSyncTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.order = Order.objects.create(external_id='gh-158-7771')
+
+    def test_updated_external_id_indexed(self):
+        Order.objects.filter(pk=self.order.pk).update(external_id='vr-888')
+        self.assertEqual(find('158'), [])
+        self.assertEqual(find('888'), ['vr-888'])
+
+    def test_deleted_order_removed_from_index(self):
+        self.order.delete()
+        Order.objects.create(external_id='gh-158-7772')
+        self.assertEqual(find('gh-158'), ['gh-158-7772'])
+
+    def test_dropped_triggers_restored(self):
+        if not search.has_search_table(connection):
+            self.skipTest('Database has no search table.')
+        with connection.cursor() as cursor:
+            for trigger in search.SQLITE_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER {trigger}')
+        Order.objects.create(external_id='vr-888')
+        search.ensure_search_triggers(connection)
+        self.assertEqual(find('888'), ['vr-888'])
+        Order.objects.create(external_id='vr-889')
+        self.assertEqual(find('vr-88'), ['vr-888', 'vr-889'])
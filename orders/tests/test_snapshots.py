@@ -0,0 +1,97 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from orders.models import Order, OrderDetail, Product
+from orders.tests import OrdersAPITestCase
+
+
+LIST_URL = reverse('orders-list')
+BULK_URL = reverse('orders-bulk')
+
+
+@override_settings(ORDERS_DETAILS_SNAPSHOT=True,
+                   ORDERS_MATERIALIZED_COUNTS=False,
+                   ORDERS_RESPONSE_CACHE={'ENABLED': False})
+class DetailsSnapshotTest(OrdersAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.products = [Product.objects.create(name=name)
+                         for name in ('Sofa', 'Стул "lux"')]
+        self.order_data = [
+            {
+                'external_id': f'ext-{idx}',
+                'details': [
+                    {'product': {'id': product.id}, 'amount': idx + 1,
+                     'price': price}
+                    for product, price in zip(self.products[:idx + 1],
+                                              ('7.95', '12'))
+                ],
+            }
+            for idx in range(2)
+        ]
+
+    def create_orders(self):
+        response = self.client.post(BULK_URL, self.order_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(LIST_URL, self.order_data[1],
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def get_expected(self, url=LIST_URL, params=None):
+        with override_settings(ORDERS_DETAILS_SNAPSHOT=False):
+            return self.client.get(url, params).data
+
+    def test_created_orders_read_from_snapshot(self):
+        self.create_orders()
+        self.assertFalse(
+            Order.objects.filter(details_snapshot__isnull=True).exists())
+        expected = self.get_expected()
+        with self.assertNumQueries(2):  # count and orders.
+            self.assertEqual(self.client.get(LIST_URL).data, expected)
+        url = reverse('orders-detail', kwargs={'pk': expected[1]['id']})
+        expected_order = self.get_expected(url, {'expand': 'details'})
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                self.client.get(url, {'expand': 'details'}).data,
+                expected_order)
+
+    def test_product_rename_and_deletion_followed(self):
+        self.create_orders()
+        product = self.products[0]
+        product.name = 'Sofa 2'
+        with self.captureOnCommitCallbacks() as callbacks:
+            product.save()
+        self.assertEqual(Order.objects.first().details_snapshot[0]['product'],
+                         {'id': product.id, 'name': 'Sofa'})
+        with self.captureOnCommitCallbacks(execute=True):
+            for callback in callbacks:
+                callback()
+        self.assertEqual(self.client.get(LIST_URL).data, self.get_expected())
+        self.products[1].delete()
+        self.assertEqual(Order.objects.filter(
+            details_snapshot__isnull=True).count(), 2)
+        self.assertEqual(self.client.get(LIST_URL).data, self.get_expected())
+
+    def test_backfill_and_check_commands(self):
+        with override_settings(ORDERS_DETAILS_SNAPSHOT=False):
+            self.create_orders()
+        self.assertFalse(
+            Order.objects.filter(details_snapshot__isnull=False).exists())
+        out = StringIO()
+        call_command('backfill_order_snapshots', batch_size=2, stdout=out)
+        self.assertIn('3 orders', out.getvalue())
+        self.assertEqual(self.client.get(LIST_URL).data, self.get_expected())
+
+        call_command('check_order_snapshots', stdout=out)
+        OrderDetail.objects.filter(order__external_id='ext-0').update(
+            amount=100)  # written bypassing the API.
+        with self.assertRaises(CommandError):
+            call_command('check_order_snapshots', stdout=out)
+        call_command('check_order_snapshots', repair=True, stdout=out)
+        call_command('check_order_snapshots', stdout=out)
+        self.assertEqual(self.client.get(LIST_URL).data, self.get_expected())
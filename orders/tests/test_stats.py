@@ -0,0 +1,116 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from orders import stats
+from orders.models import (Order, OrderDetail, Product, ProductTotal, Status,
+                           StatusCounter)
+from orders.tests import OrdersAPITestCase
+
+
+LIST_URL = reverse('orders-list')
+STATS_URL = reverse('orders-stats')
+
+
+class StatsTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.product = Product.objects.create(name='Test_product')
+        order = Order.objects.create(external_id='first')
+        OrderDetail.objects.create(order=order, product=self.product,
+                                   amount=2, price='1.50')
+        Order.objects.create(external_id='second', status=Status.ACCEPTED)
+
+    def test_rebuild_counts_existing_orders(self):
+        stats.rebuild()
+        self.assertEqual(stats.get_status_counts(), {
+            Status.NEW: 1, Status.ACCEPTED: 1, Status.FAILED: 0})
+        self.assertEqual(stats.get_orders_count(), 2)
+        total = ProductTotal.objects.get(product=self.product)
+        self.assertEqual((total.amount, total.revenue), (2, Decimal('3.00')))
+
+    def test_deleted_orders_discounted(self):
+        stats.rebuild()
+        stats.record_orders_deleted(Order.objects.filter(status=Status.NEW))
+        self.assertEqual(stats.get_orders_count(Status.NEW), 0)
+        total = ProductTotal.objects.get(product=self.product)
+        self.assertEqual((total.amount, total.revenue), (0, Decimal('0.00')))
+
+    def test_missing_counter_is_unknown(self):
+        StatusCounter.objects.all().delete()
+        self.assertIsNone(stats.get_orders_count(Status.NEW))
+
+    def test_rebuild_command(self):
+        call_command('rebuild_order_stats', stdout=open('/dev/null', 'w'))
+        self.assertEqual(stats.get_orders_count(), 2)
+
+
+class StatsViewTest(OrdersAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.product = Product.objects.create(name='Test_product')
+        stats.rebuild()
+
+    def create_order(self, external_id):
+        response = self.client.post(LIST_URL, {
+            'external_id': external_id,
+            'details': [{'product': {'id': self.product.id},
+                         'amount': 3, 'price': '2.00'}],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def test_stats_follow_orders_changes(self):
+        first = self.create_order('first')
+        second = self.create_order('second')
+        self.client.post(reverse('orders-accept', kwargs={'pk': first}))
+        self.client.delete(reverse('orders-detail', kwargs={'pk': second}))
+
+        response = self.client.get(STATS_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['orders'], {
+            Status.NEW: 0, Status.ACCEPTED: 1, Status.FAILED: 0})
+        self.assertEqual(response.data['products'], [{
+            'id': self.product.id, 'name': 'Test_product',
+            'amount': 3, 'revenue': '6.00',
+        }])
+
+    def test_bulk_created_orders_counted(self):
+        detail = {'product': {'id': self.product.id}, 'amount': 1,
+                  'price': '5.00'}
+        self.client.post(reverse('orders-bulk'), [
+            {'external_id': 'first', 'details': [detail]},
+            {'external_id': 'second', 'details': [detail, detail]},
+        ], format='json')
+        self.client.post(reverse('orders-fail-many'), {'ids': [1]},
+                         format='json')
+        self.assertEqual(stats.get_status_counts(), {
+            Status.NEW: 1, Status.ACCEPTED: 0, Status.FAILED: 1})
+        total = ProductTotal.objects.get(product=self.product)
+        self.assertEqual((total.amount, total.revenue), (3, Decimal('15.00')))
+
+    @override_settings(ORDERS_MATERIALIZED_COUNTS=True)
+    def test_list_count_taken_from_counters(self):
+        self.create_order('first')
+        StatusCounter.objects.filter(status=Status.NEW).update(count=42)
+        response = self.client.get(LIST_URL, {'status': Status.NEW})
+        self.assertTrue(response['Content-Range'].endswith('/42'))
+        response = self.client.get(LIST_URL, {'external_id': 'first'})
+        self.assertTrue(response['Content-Range'].endswith('/1'))
+
+    @override_settings(ORDERS_MATERIALIZED_COUNTS=True)
+    def test_stale_counters_do_not_hide_orders(self):
+        self.create_order('first')
+        self.create_order('second')
+        StatusCounter.objects.filter(status=Status.NEW).update(count=0)
+        response = self.client.get(LIST_URL, {'status': Status.NEW,
+                                              'limit': 1, 'offset': 1})
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response['Content-Range'], '1-1/2')
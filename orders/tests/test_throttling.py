@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from orders import throttling
+from orders.tests import OrdersAPITestCase
+
+
+class SlidingWindowCountersTest(SimpleTestCase):
+
+    def test_limit_in_window(self):
+        counters = throttling.SlidingWindowCounters()
+        for _ in range(3):
+            self.assertIsNone(counters.hit('client', 3, 60, 120.0))
+        self.assertEqual(counters.hit('client', 3, 60, 150.0), 30.0)
+        self.assertIsNone(counters.hit('other', 3, 60, 150.0))
+
+    def test_previous_window_share_counted(self):
+        counters = throttling.SlidingWindowCounters()
+        for _ in range(4):
+            counters.hit('client', 4, 60, 170.0)
+        # 95% of previous window hits are still in the last minute.
+        self.assertIsNone(counters.hit('client', 4, 60, 183.0))
+        self.assertAlmostEqual(counters.hit('client', 4, 60, 183.0), 12.0)
+        self.assertIsNone(counters.hit('client', 4, 60, 196.0))
+
+    def test_processes_share_store(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'throttle.sqlite3')
+        first = throttling.SlidingWindowCounters(
+            throttling.SQLiteCounterStore(path), sync_interval=1)
+        second = throttling.SlidingWindowCounters(
+            throttling.SQLiteCounterStore(path), sync_interval=1)
+        for _ in range(3):
+            self.assertIsNone(first.hit('client', 5, 60, 120.0))
+        self.assertIsNone(second.hit('client', 5, 60, 120.0))
+        first.sync(121.0)
+        second.sync(121.0)
+        self.assertIsNone(second.hit('client', 5, 60, 121.5))
+        self.assertIsNotNone(second.hit('client', 5, 60, 121.5))
+        second.sync(122.0)
+        first.sync(122.0)
+        self.assertIsNotNone(first.hit('client', 5, 60, 122.5))
+
+
+class ThrottleViewTest(OrdersAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        patcher = mock.patch.object(throttling, 'counters',
+                                    throttling.SlidingWindowCounters())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @mock.patch.dict(throttling.AnonRateThrottle.THROTTLE_RATES,
+                     {'anon': '2/min'})
+    def test_anonymous_requests_throttled(self):
+        url = reverse('orders-list')
+        for _ in range(2):
+            self.assertEqual(self.client.get(url).status_code,
+                             status.HTTP_200_OK)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+
+    @mock.patch.dict(throttling.AnonRateThrottle.THROTTLE_RATES,
+                     {'anon': '1/min'})
+    @override_settings(ORDERS_THROTTLE={'ENABLED': False})
+    def test_requests_not_throttled_if_disabled(self):
+        url = reverse('orders-list')
+        for _ in range(2):
+            self.assertEqual(self.client.get(url).status_code,
+                             status.HTTP_200_OK)
@@ -1,11 +1,13 @@
 import json
+from unittest import mock
 
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APITestCase
 
 from orders.models import Order, OrderDetail, Product, Status
 from orders.serializers import OrderSerializer
+from orders.tests import OrdersAPITestCase
+from orders.views import OrderViewSet
 
 
 ACCEPT_URL = reverse('orders-accept', kwargs={'pk': 1})
@@ -14,7 +16,7 @@ FAIL_URL = reverse('orders-fail', kwargs={'pk': 1})
 LIST_URL = reverse('orders-list')
 
 
-class ViewsTest(APITestCase):
+class ViewsTest(OrdersAPITestCase):
 
     def setUp(self):
         super().setUp()
@@ -115,6 +117,22 @@ class ViewsTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['status'], Status.FAILED)
 
+    def test_order_status_changes_only_from_new(self):
+        self.client.post(FAIL_URL)
+        for url in (ACCEPT_URL, FAIL_URL):
+            with self.subTest(url=url):
+                response = self.client.post(url)
+                self.assertEqual(response.status_code,
+                                 status.HTTP_409_CONFLICT)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Status.FAILED)
+
+    def test_status_change_of_missing_order_returns_not_found(self):
+        for pk in (999, 'abc'):
+            url = reverse('orders-accept', kwargs={'pk': pk})
+            response = self.client.post(url)
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_order_with_status_accepted_could_not_be_deleted(self):
         response = self.client.post(ACCEPT_URL)
         self.assertEqual(response.data['status'], Status.ACCEPTED)
@@ -150,3 +168,203 @@ class ViewsTest(APITestCase):
                 content_type='application/json'
             )
             self.assertEqual(response.data['status'], Status.NEW)
+
+
+class SparseFieldsViewTest(OrdersAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.product = Product.objects.create(name='Test_product')
+        self.order = Order.objects.create(external_id='test_ext_id')
+        self.order_detail = OrderDetail.objects.create(
+            product=self.product, order=self.order, amount=5, price=7.95)
+        self.url = reverse('orders-detail', kwargs={'pk': self.order.pk})
+
+    def test_only_chosen_fields_returned(self):
+        response = self.client.get(LIST_URL, {'fields': 'status, id'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [
+            {'id': self.order.pk, 'status': Status.NEW}])
+
+    def test_details_not_expanded(self):
+        response = self.client.get(self.url, {'expand': ''})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('details', response.data)
+        self.assertEqual(response.data['external_id'], 'test_ext_id')
+
+    def test_products_represented_by_id(self):
+        response = self.client.get(self.url, {'expand': 'details'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['details'], [{
+            'id': self.order_detail.pk, 'product': {'id': self.product.pk},
+            'amount': 5, 'price': '7.95',
+        }])
+
+    def test_product_expansion_implies_details(self):
+        response = self.client.get(
+            self.url, {'fields': 'id,details', 'expand': 'details.product'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, OrderSerializer(
+            self.order, fields=('id', 'details')).data)
+        self.assertEqual(response.data['details'][0]['product']['name'],
+                         'Test_product')
+
+    def test_unknown_names_rejected(self):
+        for params in ({'fields': 'id,total'}, {'expand': 'products'}):
+            with self.subTest(params=params):
+                response = self.client.get(LIST_URL, params)
+                self.assertEqual(response.status_code,
+                                 status.HTTP_400_BAD_REQUEST)
+                self.assertIn(next(iter(params)), response.data)
+
+
+class ManyStatusesChangeViewTest(OrdersAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        Order.objects.bulk_create(
+            Order(external_id=external_id)
+            for external_id in ('first', 'second', 'second', 'third')
+        )
+        self.ids = list(Order.objects.values_list('id', flat=True))
+
+    def test_orders_accepted_by_ids(self):
+        url = reverse('orders-accept-many')
+        # savepoint with locked orders, change feed events, update of orders
+        # and of status counters.
+        with self.assertNumQueries(6):
+            response = self.client.post(
+                url, {'ids': self.ids[:2]}, format='json')
+        self.assertEqual(response.data, {'updated': 2})
+        response = self.client.post(url, {'ids': self.ids}, format='json')
+        self.assertEqual(response.data, {'updated': 2})
+        self.assertFalse(Order.objects.filter(status=Status.NEW).exists())
+
+    def test_orders_failed_by_filters(self):
+        url = reverse('orders-fail-many')
+        response = self.client.post(url + '?external_id=second')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'updated': 2})
+        self.assertEqual(Order.objects.filter(status=Status.FAILED).count(), 2)
+
+    def test_orders_should_be_chosen(self):
+        url = reverse('orders-accept-many')
+        for data in ({}, {'ids': 'all'}):
+            with self.subTest(data=data):
+                response = self.client.post(url, data, format='json')
+                self.assertEqual(response.status_code,
+                                 status.HTTP_400_BAD_REQUEST)
+        for params in ('?format=json', '?status=', '?unknown=1'):
+            with self.subTest(params=params):
+                response = self.client.post(url + params)
+                self.assertEqual(response.status_code,
+                                 status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Order.objects.filter(status=Status.NEW).count(), 4)
+
+
+BULK_URL = reverse('orders-bulk')
+
+
+class BulkCreateViewTest(OrdersAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.product = Product.objects.create(name='Test_product')
+        self.other_product = Product.objects.create(name='Other_product')
+
+    def get_order_data(self, external_id, *product_ids):
+        return {
+            'external_id': external_id,
+            'details': [
+                {'product': {'id': product_id}, 'amount': 2, 'price': '3.50'}
+                for product_id in product_ids
+            ]
+        }
+
+    def test_orders_created_in_bulk(self):
+        data = [
+            self.get_order_data('first', self.product.id),
+            self.get_order_data('second', self.product.id,
+                                self.other_product.id),
+        ]
+        response = self.client.post(BULK_URL, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(OrderDetail.objects.count(), 3)
+        second = response.data[1]['order']
+        self.assertEqual(second['external_id'], 'second')
+        self.assertEqual(second['status'], Status.NEW)
+        self.assertEqual(
+            second['details'][1]['product'],
+            {'id': self.other_product.id, 'name': 'Other_product'})
+
+    def test_bulk_errors_reported_per_item(self):
+        data = [
+            self.get_order_data('valid', self.product.id),
+            self.get_order_data('no_details'),
+            self.get_order_data('no_product', self.product.id, 999),
+            {'details': []},
+        ]
+        response = self.client.post(BULK_URL, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertIn('order', response.data[0])
+        for index in (1, 2, 3):
+            with self.subTest(index=index):
+                self.assertEqual(response.data[index]['index'], index)
+                self.assertIn('errors', response.data[index])
+        self.assertEqual(
+            list(Order.objects.values_list('external_id', flat=True)),
+            ['valid']
+        )
+
+    def test_bulk_requires_list(self):
+        response = self.client.post(
+            BULK_URL, self.get_order_data('single', self.product.id),
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
+
+
+EXPORT_URL = reverse('orders-export')
+
+
+class ExportViewTest(OrdersAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.product = Product.objects.create(name='Test_product')
+        for external_id in ('first', 'second', 'third'):
+            order = Order.objects.create(external_id=external_id)
+            OrderDetail.objects.create(
+                product=self.product, order=order, amount=5, price=7.95)
+        Order.objects.filter(external_id='second').update(
+            status=Status.ACCEPTED)
+
+    def test_orders_exported_as_json_lines(self):
+        response = self.client.get(EXPORT_URL, {'format': 'ndjson'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        expected = OrderSerializer(Order.objects.all(), many=True).data
+        self.assertEqual([json.loads(line) for line in lines],
+                         json.loads(json.dumps(expected)))
+
+    def test_orders_exported_as_csv_with_filters(self):
+        response = self.client.get(
+            EXPORT_URL, {'format': 'csv', 'status': Status.NEW})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(rows[0].split(',')[:4],
+                         ['order_id', 'status', 'created_at', 'external_id'])
+        self.assertEqual([row.split(',')[3] for row in rows[1:]],
+                         ['first', 'third'])
+        self.assertEqual(rows[1].split(',')[-3:],
+                         ['Test_product', '5', '7.95'])
+
+    def test_export_loads_fixed_queries_per_chunk(self):
+        with mock.patch.object(OrderViewSet, 'export_chunk_size', 2):
+            with self.assertNumQueries(4):
+                response = self.client.get(EXPORT_URL, {'format': 'ndjson'})
+                lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual(len(lines), 3)
@@ -0,0 +1,39 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from orders import signals
+from orders.warmup import warm_up
+
+
+class WarmUpTest(TestCase):
+
+    def test_warm_up_without_database_makes_no_queries(self):
+        with self.assertNumQueries(0):
+            warm_up(database=False)
+
+    def test_warm_up_connects_database(self):
+        warm_up()
+        self.assertIsNotNone(connection.connection)
+
+
+class ConnectionHealthCheckTest(TestCase):
+
+    def check(self, health_checks: bool, usable: bool) -> bool:
+        """Return whether connection was closed."""
+        with override_settings(ORDERS_DB_HEALTH_CHECKS=health_checks), \
+                mock.patch.object(connection, 'is_usable',
+                                  return_value=usable), \
+                mock.patch.object(connection, 'close') as close:
+            signals.close_unusable_connections()
+        return close.called
+
+    def test_broken_connection_closed(self):
+        self.assertTrue(self.check(health_checks=True, usable=False))
+
+    def test_usable_connection_kept(self):
+        self.assertFalse(self.check(health_checks=True, usable=True))
+
+    def test_connection_not_checked_without_setting(self):
+        self.assertFalse(self.check(health_checks=False, usable=False))
@@ -0,0 +1,237 @@
+"""
+Throttles with sliding window counters. Every process decides locally from
+two counters per client (current and previous window) and every
+SYNC_INTERVAL seconds sends its new hits to shared SQLite file and reads
+back totals of all processes, so limits are enforced across workers with
+error bounded by hits made between synchronizations.
+"""
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from rest_framework import throttling
+
+
+THROTTLE_DEFAULTS = {
+    'ENABLED': True,
+    'STORE': None,
+    'SYNC_INTERVAL': 1.0,
+}
+
+
+def get_throttle_settings() -> dict:
+    return {**THROTTLE_DEFAULTS, **getattr(settings, 'ORDERS_THROTTLE', {})}
+
+
+class SQLiteCounterStore:
+    """Counters of all processes per (key, window) in SQLite file."""
+    # older SQLite allows 999 parameters of statement.
+    READ_BATCH_SIZE = 500
+
+    def __init__(self, path: str, timeout: float = 0.5):
+        self.path = path
+        self.timeout = timeout
+        self._connection = None
+        self._pid = None
+
+    def get_connection(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():  # connections do not survive fork.
+            self._connection = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None,
+                check_same_thread=False,
+            )
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS throttle_counter ('
+                'key TEXT NOT NULL, window INTEGER NOT NULL, '
+                'count INTEGER NOT NULL, expires REAL NOT NULL, '
+                'PRIMARY KEY (key, window))'
+            )
+            self._pid = os.getpid()
+        return self._connection
+
+    def sync(self, hits: dict, windows: list, now: float) -> dict:
+        """
+        Add new hits in one transaction, then read totals of all clients by
+        one query per READ_BATCH_SIZE of them.
+        :param hits: mapping of (key, window) to (amount, expires).
+        :param windows: (key, window) pairs totals are read for.
+        :return: mapping of (key, window) to total amount of hits.
+        """
+        connection = self.get_connection()
+        if hits:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                connection.executemany(
+                    'INSERT INTO throttle_counter '
+                    '(key, window, count, expires) VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT (key, window) '
+                    'DO UPDATE SET count = count + excluded.count',
+                    [(key, window, amount, expires)
+                     for (key, window), (amount, expires) in hits.items()],
+                )
+                connection.execute(
+                    'DELETE FROM throttle_counter WHERE expires < ?', (now,))
+                connection.execute('COMMIT')
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+        totals = dict.fromkeys(windows, 0)
+        keys = sorted({key for key, _ in windows})
+        for start in range(0, len(keys), self.READ_BATCH_SIZE):
+            batch = keys[start:start + self.READ_BATCH_SIZE]
+            rows = connection.execute(
+                'SELECT key, window, count FROM throttle_counter '
+                'WHERE key IN ({})'.format(', '.join('?' * len(batch))),
+                batch,
+            )
+            for key, window, count in rows:
+                if (key, window) in totals:
+                    totals[key, window] = count
+        return totals
+
+    def clear(self):
+        self.get_connection().execute('DELETE FROM throttle_counter')
+
+
+class SlidingWindowCounters:
+    """
+    Hits of clients counted in fixed windows of throttle duration, amount
+    of hits in the last duration is estimated as hits of current window
+    plus share of previous window hits, which is not passed yet.
+    """
+
+    def __init__(self, store=None, sync_interval: float = 1.0):
+        self.store = store
+        self.sync_interval = sync_interval
+        # key: [window, current window hits, previous window hits, duration]
+        self._clients = {}
+        self._pending = defaultdict(int)  # (key, window): not synced hits.
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._last_sync = 0.0
+
+    def _get_state(self, key: str, window: int, duration: int) -> list:
+        state = self._clients.get(key)
+        if state is None:
+            state = self._clients[key] = [window, 0, 0, duration]
+        elif state[0] != window:
+            previous = state[1] if state[0] == window - 1 else 0
+            state[:3] = [window, 0, previous]
+        return state
+
+    def hit(self, key: str, limit: int, duration: int, now: float):
+        """
+        Count hit of client if it is allowed.
+        :return: None if hit is allowed, otherwise recommended seconds to
+        wait before the next one.
+        """
+        if self.store is not None and now - self._last_sync >= \
+                self.sync_interval:
+            self.sync(now)
+        window, elapsed = divmod(now, duration)
+        window = int(window)
+        with self._lock:
+            state = self._get_state(key, window, duration)
+            passed = elapsed / duration
+            current, previous = state[1], state[2]
+            if previous * (1 - passed) + current < limit:
+                state[1] += 1
+                if self.store is not None:
+                    self._pending[key, window] += 1
+                return None
+        if current >= limit or not previous:
+            return duration - elapsed
+        # previous window share decreases until estimate is below limit.
+        return max(1 - (limit - current) / previous - passed, 0) * duration
+
+    def sync(self, now: float):
+        """Send pending hits to store and refresh counters from it."""
+        if not self._sync_lock.acquire(blocking=False):
+            return  # other thread is synchronizing.
+        try:
+            self._last_sync = now
+            with self._lock:
+                pending, self._pending = self._pending, defaultdict(int)
+                hits = {
+                    (key, window): (amount,
+                                    (window + 2) * self._clients[key][3])
+                    for (key, window), amount in pending.items()
+                }
+                durations = {}
+                for key, state in list(self._clients.items()):
+                    if state[0] < int(now // state[3]) - 1:
+                        del self._clients[key]  # idle client.
+                    else:
+                        durations[key] = state[3]
+            windows = []
+            for key, duration in durations.items():
+                window = int(now // duration)
+                windows.extend(((key, window), (key, window - 1)))
+            try:
+                totals = self.store.sync(hits, windows, now)
+            except sqlite3.Error:
+                with self._lock:  # retried with the next synchronization.
+                    for key_window, amount in pending.items():
+                        self._pending[key_window] += amount
+                return
+            with self._lock:
+                for key, duration in durations.items():
+                    window = int(now // duration)
+                    state = self._get_state(key, window, duration)
+                    state[1] = totals[key, window] \
+                        + self._pending.get((key, window), 0)
+                    state[2] = totals[key, window - 1]
+        finally:
+            self._sync_lock.release()
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+            self._pending.clear()
+        if self.store is not None:
+            self.store.clear()
+
+
+def create_counters() -> SlidingWindowCounters:
+    throttle_settings = get_throttle_settings()
+    store = None
+    if throttle_settings['STORE']:
+        store = SQLiteCounterStore(throttle_settings['STORE'])
+    return SlidingWindowCounters(store, throttle_settings['SYNC_INTERVAL'])
+
+
+counters = create_counters()
+
+
+class SlidingWindowThrottleMixin:
+    """
+    Replace request history of SimpleRateThrottle kept in cache with shared
+    sliding window counters. All requests are allowed if throttling is not
+    ENABLED.
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None or not get_throttle_settings()['ENABLED']:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        self.wait_seconds = counters.hit(
+            self.key, self.num_requests, self.duration, self.timer())
+        return self.wait_seconds is None
+
+    def wait(self):
+        return getattr(self, 'wait_seconds', None)
+
+
+class AnonRateThrottle(SlidingWindowThrottleMixin,
+                       throttling.AnonRateThrottle):
+    pass
+
+
+class UserRateThrottle(SlidingWindowThrottleMixin,
+                       throttling.UserRateThrottle):
+    pass
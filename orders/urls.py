@@ -1,4 +1,5 @@
-from django.urls import path, include
+from django.conf import settings
+from django.urls import path, include, re_path
 from rest_framework.routers import DefaultRouter
 
 from .views import OrderViewSet
@@ -8,6 +9,26 @@ v1_router = DefaultRouter()
 v1_router.register(r'orders', OrderViewSet, basename='orders')
 
 
+def get_async_urlpatterns() -> list:
+    """
+    Async entry points taking precedence over the same router routes, names
+    are left to them. Order ids are numeric, so list level actions
+    ('stats/', 'bulk/' and others) are still served by router, except
+    'export/', which streams from database and is refused in async mode.
+    """
+    from . import async_views
+
+    return [
+        re_path(r'^orders/$', async_views.order_list),
+        re_path(r'^orders/changes/$', async_views.order_changes),
+        re_path(r'^orders/export/$', async_views.order_export),
+        re_path(r'^orders/(?P<pk>\d+)/$', async_views.order_detail),
+    ]
+
+
 urlpatterns = [
     path('v1/', include(v1_router.urls)),
 ]
+
+if settings.ORDERS_ASYNC_VIEWS:
+    urlpatterns.insert(0, path('v1/', include(get_async_urlpatterns())))
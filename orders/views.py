@@ -1,60 +1,660 @@
+import itertools
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import Http404, StreamingHttpResponse
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
-from .models import Status, Order, Product
-from .serializers import OrderSerializer, OrderUpdateOnlySerializer
+from . import feed, idempotency, services, stats
+from .archive import ArchiveReadMixin
+from .cache import ResponseCacheMixin
+from .export import EXPORT_CHUNK_SIZE, EXPORTERS
+from .fast_serializers import FastReadMixin
+from .filters import IndexedOrderingFilter
+from .models import ArchivedOrder, Status, Order, OrderDetail, ProductTotal
+from .renderers import (CSVRenderer, EventStreamRenderer, NDJSONRenderer,
+                        render_event)
+from .search import OrderSearchFilter
+from .serializers import (EXPANSIONS, OrderEventSerializer, OrderSerializer,
+                          OrderUpdateOnlySerializer, ProductTotalSerializer)
+from .services import NO_DETAILS_TEXT, NO_PRODUCT_FOUND_TEXT
 
 
 NOT_NEW_ORDER_STATUS_TEXT = 'Only orders with status "new" could be changed.'
-NO_PRODUCT_FOUND_TEXT = 'No product with such id in database.'
+BULK_NOT_LIST_TEXT = 'List of orders should be pointed.'
+BULK_TOO_MANY_TEXT = 'No more than {} orders could be created at once.'
+BULK_MAX_ORDERS = 1000
+NO_ORDERS_CHOSEN_TEXT = 'List of order ids or filters should be pointed.'
+NOT_FOUND_TEXT = 'No order with such id in database.'
+NOT_DELETABLE_TEXT = f'Order with status {Status.ACCEPTED} could not be ' \
+                     f'deleted.'
+BATCH_OPERATIONS = ('create', 'update', 'accept', 'fail', 'delete')
+BATCH_NOT_LIST_TEXT = 'List of operations should be pointed.'
+BATCH_TOO_MANY_TEXT = 'No more than {} operations could be run at once.'
+BATCH_MAX_OPERATIONS = 1000
+BATCH_BAD_OPERATION_TEXT = 'Operation should be an object with "op" ' \
+                           f'(one of {", ".join(BATCH_OPERATIONS)}), "id" ' \
+                           'of order unless it is created and "data" for ' \
+                           'create and update.'
+UNKNOWN_NAMES_TEXT = 'Unknown names: {}. Available are: {}.'
+NOT_IN_RANGE_TEXT = 'Number from {} to {} should be pointed.'
+UNKNOWN_STATUS_TEXT = 'One of statuses should be pointed: {}.'
+
+
+def parse_names(value: str) -> list:
+    """Split comma separated query parameter value into names."""
+    return [name.strip() for name in value.split(',') if name.strip()]
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+def check_names(param: str, names, available):
+    unknown = set(names) - set(available)
+    if unknown:
+        raise ValidationError({param: UNKNOWN_NAMES_TEXT.format(
+            ', '.join(sorted(unknown)), ', '.join(available))})
+
+
+class OrderViewSet(ResponseCacheMixin, ArchiveReadMixin, FastReadMixin,
+                   viewsets.ModelViewSet):
     serializer_class = OrderSerializer
-    queryset = Order.objects.all()
-    filterset_fields = ['external_id', 'status', ]
+    queryset = Order.objects.prefetch_related(
+        Prefetch(
+            'details',
+            queryset=OrderDetail.objects.select_related(
+                'product').order_by('id'),
+        )
+    )  # details and their products are loaded in one extra query per page.
+    filter_backends = [DjangoFilterBackend, OrderSearchFilter,
+                       IndexedOrderingFilter]
+    filterset_fields = {
+        'external_id': ['exact'],
+        'status': ['exact'],
+        'created_at': ['gte', 'lt'],
+    }
+    search_fields = ['external_id']
+    # served by primary key, (created_at, id) and (status, created_at, id)
+    # indexes, id keeps order of orders created at the same time stable.
+    orderings = {
+        'id': ('id',),
+        '-id': ('-id',),
+        'created_at': ('created_at', 'id'),
+        '-created_at': ('-created_at', '-id'),
+    }
+    export_chunk_size = EXPORT_CHUNK_SIZE
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+    representation_actions = ('list', 'retrieve')
+
+    def get_representation(self) -> tuple:
+        """
+        Return (fields, expand) of read actions from 'fields' and 'expand'
+        query parameters. Without 'expand' all EXPANSIONS are represented,
+        'details.product' implies 'details'.
+        """
+        if self.action not in self.representation_actions:
+            return None, EXPANSIONS
+        params = self.request.query_params
+        fields = None
+        if self.fields_query_param in params:
+            fields = parse_names(params[self.fields_query_param])
+            check_names(self.fields_query_param, fields,
+                        OrderSerializer.Meta.fields)
+        expand = EXPANSIONS
+        if self.expand_query_param in params:
+            names = parse_names(params[self.expand_query_param])
+            check_names(self.expand_query_param, names, EXPANSIONS)
+            if 'details.product' in names:
+                names.append('details')
+            expand = tuple(name for name in EXPANSIONS if name in names)
+        if fields is not None and 'details' not in fields:
+            expand = ()
+        return fields, expand
+
+    def get_queryset(self):
+        """Do not prefetch details or products left out of representation."""
+        fields, expand = self.get_representation()
+        if 'details' not in expand:
+            return Order.objects.all()
+        if 'details.product' not in expand:
+            return Order.objects.prefetch_related(
+                Prefetch('details',
+                         queryset=OrderDetail.objects.order_by('id')))
+        return super().get_queryset()
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action in self.representation_actions:
+            kwargs['fields'], kwargs['expand'] = self.get_representation()
+        return super().get_serializer(*args, **kwargs)
+
+    def change_status(self, pk, new_status):
+        """
+        Moves order from status 'new' to new_status with one conditional
+        UPDATE, so only one of concurrent requests could change it.
+        """
+        try:
+            pk = int(pk)
+        except (TypeError, ValueError):
+            raise Http404
+        changed = services.change_orders_status(
+            Order.objects.filter(pk=pk), new_status, order_ids=[pk]
+        )
+        if not changed:
+            get_object_or_404(Order.objects.only('id'), pk=pk)
+            return Response(NOT_NEW_ORDER_STATUS_TEXT,
+                            status=status.HTTP_409_CONFLICT)
+        order = get_object_or_404(self.get_queryset(), pk=pk)
+        serializer = self.get_serializer(order)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    def get_filter_params(self) -> list:
+        """Query parameters of filters and search of orders list."""
+        params = [
+            name if lookup == 'exact' else f'{name}__{lookup}'
+            for name, lookups in self.filterset_fields.items()
+            for lookup in lookups
+        ]
+        return params + [api_settings.SEARCH_PARAM,
+                         OrderSearchFilter.prefix_param]
+
+    def change_many_statuses(self, request, new_status):
+        """
+        Moves orders with given 'ids' or matching filters from status 'new'
+        to new_status with one UPDATE.
+        """
+        ids = None
+        if isinstance(request.data, dict):
+            ids = request.data.get('ids')
+        # unknown parameters (format and others) do not narrow orders down.
+        if ids is None and not any(request.query_params.get(param)
+                                   for param in self.get_filter_params()):
+            return Response(NO_ORDERS_CHOSEN_TEXT,
+                            status=status.HTTP_400_BAD_REQUEST)
+        queryset = self.filter_queryset(Order.objects.all())
+        if ids is not None:
+            if (not isinstance(ids, list)
+                    or not all(isinstance(pk, int) for pk in ids)):
+                return Response(NO_ORDERS_CHOSEN_TEXT,
+                                status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(pk__in=ids)
+        changed = services.change_orders_status(queryset, new_status,
+                                                order_ids=ids)
+        return Response({'updated': changed}, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['post'])
     def accept(self, request, pk=None):
         """Changes status of order to 'accepted'."""
-        order = get_object_or_404(Order, pk=pk)
-        order.status = Status.ACCEPTED
-        order.save()
-        serializer = self.get_serializer(order)
-        serializer.is_valid(raise_exception=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return self.change_status(pk, Status.ACCEPTED)
 
     @action(detail=True, methods=['post'])
     def fail(self, request, pk=None):
         """Changes status of order to 'failed'."""
-        order = get_object_or_404(Order, pk=pk)
-        order.status = Status.FAILED
-        order.save()
-        serializer = self.get_serializer(order)
-        serializer.is_valid(raise_exception=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return self.change_status(pk, Status.FAILED)
+
+    @action(detail=False, methods=['post'], url_path='accept',
+            url_name='accept-many')
+    def accept_many(self, request):
+        """Changes status of chosen new orders to 'accepted'."""
+        return self.change_many_statuses(request, Status.ACCEPTED)
+
+    @action(detail=False, methods=['post'], url_path='fail',
+            url_name='fail-many')
+    def fail_many(self, request):
+        """Changes status of chosen new orders to 'failed'."""
+        return self.change_many_statuses(request, Status.FAILED)
+
+    def get_materialized_count(self):
+        """
+        Return amount of listed orders from status counters if they are
+        filtered by status only and ORDERS_MATERIALIZED_COUNTS is on. Counters
+        match live orders without archived ones only for status 'new'.
+        """
+        if not getattr(settings, 'ORDERS_MATERIALIZED_COUNTS', False):
+            return None
+        paginator = self.paginator
+        ignored_params = {
+            paginator.limit_query_param, paginator.offset_query_param,
+            paginator.cursor_query_param, paginator.keyset_query_param,
+            paginator.count_query_param, api_settings.URL_FORMAT_OVERRIDE,
+            self.fields_query_param, self.expand_query_param,
+            self.archive_query_param,
+        }
+        params = set(self.request.query_params) - ignored_params
+        if not params <= {'status'}:
+            return None
+        order_status = self.request.query_params.get('status')
+        # counters include archived orders, which are finished ones only.
+        if (order_status != Status.NEW and not self.is_archive_included()
+                and ArchivedOrder.objects.exists()):
+            return None
+        return stats.get_orders_count(order_status)
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """Returns amount of orders per status and totals per product."""
+        products = ProductTotal.objects.select_related(
+            'product').order_by('product_id')
+        return Response({
+            'orders': stats.get_status_counts(),
+            'products': ProductTotalSerializer(products, many=True).data,
+        })
+
+    @action(detail=False, methods=['get'],
+            renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def export(self, request):
+        """
+        Streams all orders matching filters as JSON lines ('format=ndjson')
+        or CSV with row per order detail ('format=csv').
+        """
+        return self.stream_export(self.filter_queryset(Order.objects.all()),
+                                  request.accepted_renderer)
+
+    def stream_export(self, queryset, renderer):
+        response = StreamingHttpResponse(
+            EXPORTERS[renderer.format](queryset, self.export_chunk_size),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="orders.{renderer.format}"'
+        )
+        return response
+
+    @action(detail=False, methods=['get'], renderer_classes=[
+        *api_settings.DEFAULT_RENDERER_CLASSES, EventStreamRenderer])
+    def changes(self, request):
+        """
+        Returns changes of orders after sequence number 'after' (or
+        Last-Event-ID header), waiting up to 'wait' seconds for them if there
+        are none yet, or streams them as Server-Sent Events ('format=sse').
+        """
+        query = self.get_feed_query()
+        if request.accepted_renderer.format == EventStreamRenderer.format:
+            return self.stream_changes(query)
+        events, next_seq = self.wait_events(query)
+        return Response(self.get_changes_data(events, next_seq))
+
+    def get_feed_query(self) -> feed.FeedQuery:
+        params = self.request.query_params
+        feed_settings = feed.get_feed_settings()
+
+        def get_number(param, default, minimum, maximum, parse=int):
+            try:
+                value = parse(params.get(param, default))
+            except (TypeError, ValueError):
+                value = None
+            if value is None or not minimum <= value <= maximum:
+                raise ValidationError({param: NOT_IN_RANGE_TEXT.format(
+                    minimum, maximum)})
+            return value
+
+        order_status = params.get('status')
+        if order_status is not None and order_status not in Status.values:
+            raise ValidationError({'status': UNKNOWN_STATUS_TEXT.format(
+                ', '.join(Status.values))})
+        return feed.FeedQuery(
+            after=get_number('after',
+                             self.request.headers.get('Last-Event-ID', 0),
+                             0, 2 ** 63 - 1),
+            limit=get_number('limit', feed.DEFAULT_LIMIT, 1, feed.MAX_LIMIT),
+            status=order_status,
+            wait=get_number('wait', 0, 0, feed_settings['POLL_TIMEOUT'],
+                            parse=float),
+        )
+
+    @staticmethod
+    def wait_events(query: feed.FeedQuery) -> tuple:
+        return feed.wait_events(query.after, query.limit, query.status,
+                                query.wait)
+
+    @staticmethod
+    def get_changes_data(events: list, next_seq: int) -> dict:
+        return {'events': OrderEventSerializer(events, many=True).data,
+                'next': next_seq}
+
+    @staticmethod
+    def stream_changes(query: feed.FeedQuery):
+        """
+        Stream events as they are appended till STREAM_TIMEOUT, client
+        reconnects with Last-Event-ID header then. Comment is sent when
+        there are no events, so proxies keep connection open.
+        """
+        interval = feed.get_feed_settings()['POLL_INTERVAL']
+
+        def stream():
+            yield f'retry: {int(interval * 1000)}\n\n'.encode()
+            for events, _ in feed.iter_events(query.after, query.limit,
+                                              query.status):
+                if not events:
+                    yield b': keep-alive\n\n'
+                for event in OrderEventSerializer(events, many=True).data:
+                    yield render_event(event, event['type'], event['seq'])
+
+        response = StreamingHttpResponse(
+            stream(), content_type=f'{EventStreamRenderer.media_type}; '
+                                   f'charset={EventStreamRenderer.charset}')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # not buffered by nginx.
+        return response
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Creates list of orders at once. Every order is validated separately,
+        invalid ones are reported and skipped, valid ones are inserted in
+        one transaction. Retries with the same Idempotency-Key header get
+        the first response back.
+        """
+        return idempotency.run_once(request, lambda: self.create_many(request))
+
+    def create_many(self, request):
+        if not isinstance(request.data, list):
+            return Response(BULK_NOT_LIST_TEXT,
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > BULK_MAX_ORDERS:
+            return Response(BULK_TOO_MANY_TEXT.format(BULK_MAX_ORDERS),
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        results = [None] * len(request.data)
+        errors, creatable_items, products = self.validate_orders(
+            enumerate(request.data))
+        for index, error in errors.items():
+            results[index] = {'index': index, 'errors': error}
+
+        if creatable_items:
+            orders = services.create_orders(
+                [validated_data for _, validated_data in creatable_items],
+                products,
+            )
+            created = self.get_queryset().in_bulk(
+                [order.id for order in orders]
+            )
+            for (index, _), order in zip(creatable_items, orders):
+                results[index] = {
+                    'index': index,
+                    'order': self.get_serializer(created[order.id]).data,
+                }
+
+        if len(creatable_items) == len(results):
+            response_status = status.HTTP_201_CREATED
+        elif creatable_items:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(results, status=response_status)
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        Runs list of create, update, accept, fail and delete operations with
+        the same rules as their own endpoints. Runs of consecutive operations
+        of the same kind are done together by set-based queries. All of them
+        are applied or none with 'atomic' (by default), otherwise each valid
+        one is. Retries with the same Idempotency-Key header get the first
+        response back.
+        """
+        return idempotency.run_once(request, lambda: self.run_batch(request))
+
+    def run_batch(self, request):
+        data = request.data
+        operations = data.get('operations') if isinstance(data, dict) else None
+        if not isinstance(operations, list):
+            return Response(BATCH_NOT_LIST_TEXT,
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(operations) > BATCH_MAX_OPERATIONS:
+            return Response(BATCH_TOO_MANY_TEXT.format(BATCH_MAX_OPERATIONS),
+                            status=status.HTTP_400_BAD_REQUEST)
+        atomic = data.get('atomic', True) is not False
+
+        results = [None] * len(operations)
+        valid_items = []
+        for index, operation in enumerate(operations):
+            if self.is_batch_operation(operation):
+                valid_items.append((index, operation))
+            else:
+                results[index] = {'index': index,
+                                  'status': status.HTTP_400_BAD_REQUEST,
+                                  'errors': BATCH_BAD_OPERATION_TEXT}
+        with transaction.atomic():
+            for op, items in itertools.groupby(
+                    valid_items, key=lambda item: item[1]['op']):
+                with transaction.atomic():
+                    for index, result in self.run_batch_group(op, list(items)):
+                        results[index] = {'index': index, **result}
+            failed = [result for result in results if 'errors' in result]
+            if atomic and failed:
+                transaction.set_rollback(True)
+
+        if not failed:
+            response_status = status.HTTP_200_OK
+        elif atomic:
+            return Response(failed, status=status.HTTP_400_BAD_REQUEST)
+        elif len(failed) < len(results):
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(results, status=response_status)
+
+    @staticmethod
+    def is_batch_operation(operation) -> bool:
+        if not isinstance(operation, dict):
+            return False
+        op = operation.get('op')
+        if op not in BATCH_OPERATIONS:
+            return False
+        if op != 'create' and not isinstance(operation.get('id'), int):
+            return False
+        return op not in ('create', 'update') or 'data' in operation
+
+    def run_batch_group(self, op: str, items: list) -> list:
+        """
+        Run consecutive operations of the same kind.
+        :param items: (index, operation) pairs.
+        :return: (index, result) pairs, result has 'status' and 'order' or
+        'errors' of operation.
+        """
+        if op == 'create':
+            return self.batch_create(items)
+        if op == 'update':
+            return self.batch_update(items)
+        if op == 'delete':
+            return self.batch_delete(items)
+        return self.batch_change_status(
+            items, Status.ACCEPTED if op == 'accept' else Status.FAILED)
+
+    def get_batch_orders(self, order_ids) -> dict:
+        return self.get_queryset().in_bulk(order_ids)
+
+    def get_batch_result(self, orders: dict, order_id: int,
+                         response_status: int) -> dict:
+        return {'status': response_status,
+                'order': self.get_serializer(orders[order_id]).data}
+
+    @staticmethod
+    def get_batch_error(error, response_status: int) -> dict:
+        return {'status': response_status, 'errors': error}
+
+    @staticmethod
+    def lock_batch_orders(items: list) -> dict:
+        """Return mapping of order id to status of orders of operations."""
+        return dict(
+            Order.objects.select_for_update()
+            .filter(pk__in={operation['id'] for _, operation in items})
+            .values_list('id', 'status')
+        )
+
+    def batch_create(self, items: list) -> list:
+        errors, creatable_items, products = self.validate_orders(
+            (index, operation['data']) for index, operation in items)
+        results = [
+            (index, self.get_batch_error(error,
+                                         status.HTTP_400_BAD_REQUEST))
+            for index, error in errors.items()
+        ]
+        if creatable_items:
+            orders = services.create_orders(
+                [validated_data for _, validated_data in creatable_items],
+                products,
+            )
+            created = self.get_batch_orders([order.id for order in orders])
+            results.extend(
+                (index, self.get_batch_result(created, order.id,
+                                              status.HTTP_201_CREATED))
+                for (index, _), order in zip(creatable_items, orders)
+            )
+        return results
+
+    def batch_update(self, items: list) -> list:
+        statuses = self.lock_batch_orders(items)
+        results = []
+        external_ids = {}
+        updated_items = []
+        for index, operation in items:
+            order_status = statuses.get(operation['id'])
+            if order_status is None:
+                results.append((index, self.get_batch_error(
+                    NOT_FOUND_TEXT, status.HTTP_404_NOT_FOUND)))
+                continue
+            if order_status != Status.NEW:
+                results.append((index, self.get_batch_error(
+                    NOT_NEW_ORDER_STATUS_TEXT,
+                    status.HTTP_405_METHOD_NOT_ALLOWED)))
+                continue
+            if not isinstance(operation['data'], dict):
+                results.append((index, self.get_batch_error(
+                    BATCH_BAD_OPERATION_TEXT, status.HTTP_400_BAD_REQUEST)))
+                continue
+            serializer = OrderUpdateOnlySerializer(data=operation['data'],
+                                                   partial=True)
+            if not serializer.is_valid():
+                results.append((index, self.get_batch_error(
+                    serializer.errors, status.HTTP_400_BAD_REQUEST)))
+                continue
+            if 'external_id' in serializer.validated_data:
+                external_ids[operation['id']] = \
+                    serializer.validated_data['external_id']
+            updated_items.append((index, operation['id']))
+        services.change_external_ids(external_ids)
+        orders = self.get_batch_orders([pk for _, pk in updated_items])
+        results.extend(
+            (index, self.get_batch_result(orders, pk, status.HTTP_200_OK))
+            for index, pk in updated_items
+        )
+        return results
+
+    def batch_change_status(self, items: list, new_status: str) -> list:
+        statuses = self.lock_batch_orders(items)
+        results = []
+        changed_items = []
+        for index, operation in items:
+            pk = operation['id']
+            order_status = statuses.get(pk)
+            if order_status is None:
+                results.append((index, self.get_batch_error(
+                    NOT_FOUND_TEXT, status.HTTP_404_NOT_FOUND)))
+            elif order_status != Status.NEW:
+                results.append((index, self.get_batch_error(
+                    NOT_NEW_ORDER_STATUS_TEXT, status.HTTP_409_CONFLICT)))
+            else:
+                statuses[pk] = new_status  # repeated operation conflicts.
+                changed_items.append((index, pk))
+        order_ids = [pk for _, pk in changed_items]
+        if order_ids:
+            services.change_orders_status(
+                Order.objects.filter(pk__in=order_ids), new_status,
+                order_ids=order_ids)
+        orders = self.get_batch_orders(order_ids)
+        results.extend(
+            (index, self.get_batch_result(orders, pk, status.HTTP_200_OK))
+            for index, pk in changed_items
+        )
+        return results
+
+    def batch_delete(self, items: list) -> list:
+        statuses = self.lock_batch_orders(items)
+        results = []
+        order_ids = []
+        for index, operation in items:
+            pk = operation['id']
+            order_status = statuses.get(pk)
+            if order_status is None:
+                results.append((index, self.get_batch_error(
+                    NOT_FOUND_TEXT, status.HTTP_404_NOT_FOUND)))
+            elif order_status == Status.ACCEPTED:
+                results.append((index, self.get_batch_error(
+                    NOT_DELETABLE_TEXT, status.HTTP_405_METHOD_NOT_ALLOWED)))
+            else:
+                del statuses[pk]  # repeated operation finds no order.
+                order_ids.append(pk)
+                results.append((index, {
+                    'status': status.HTTP_204_NO_CONTENT}))
+        services.delete_orders(Order.objects.filter(pk__in=order_ids))
+        return results
+
+    @staticmethod
+    def validate_orders(items) -> tuple:
+        """
+        Validate orders to be created, products of all of them are fetched
+        at once.
+        :param items: (index, order data) pairs.
+        :return: (errors, creatable_items, products), where errors maps index
+        of rejected order to its errors, creatable_items are (index,
+        validated data) pairs and products map product id to product.
+        """
+        errors = {}
+        valid_items = []
+        for index, order_data in items:
+            serializer = OrderSerializer(data=order_data)
+            if not serializer.is_valid():
+                errors[index] = serializer.errors
+            elif not serializer.validated_data['details']:
+                errors[index] = NO_DETAILS_TEXT
+            else:
+                valid_items.append((index, serializer.validated_data))
+
+        products = services.get_products(
+            product_id
+            for _, validated_data in valid_items
+            for product_id in services.get_detail_product_ids(
+                validated_data['details'])
+        )
+        creatable_items = []
+        for index, validated_data in valid_items:
+            product_ids = services.get_detail_product_ids(
+                validated_data['details'])
+            if all(product_id in products for product_id in product_ids):
+                creatable_items.append((index, validated_data))
+            else:
+                errors[index] = NO_PRODUCT_FOUND_TEXT
+        return errors, creatable_items, products
 
     def create(self, request, *args, **kwargs):
+        """
+        Creates order with its details in one transaction. Retries with the
+        same Idempotency-Key header get the first response back.
+        """
+        return idempotency.run_once(request, lambda: self.create_one(request))
+
+    def create_one(self, request):
         serializer = OrderSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        order_details = serializer.validated_data.get('details')
-        try:
-            product_data = order_details[0]
-        except IndexError:
-            no_details_text = 'Order details should pointed.'
-            return Response(no_details_text,
+        details = serializer.validated_data['details']
+        if not details:
+            return Response(NO_DETAILS_TEXT,
                             status=status.HTTP_400_BAD_REQUEST)
-        user_given_product = product_data.get('product')
-        user_product_id = user_given_product.get('id')
-        if not Product.objects.filter(id=user_product_id).exists():
-            return Response(
-                NO_PRODUCT_FOUND_TEXT,
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        serializer.save()
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        product_ids = services.get_detail_product_ids(details)
+        products = services.get_products(product_ids)
+        if not all(product_id in products for product_id in product_ids):
+            return Response(NO_PRODUCT_FOUND_TEXT,
+                            status=status.HTTP_400_BAD_REQUEST)
+        order, = services.create_orders([serializer.validated_data], products)
+        order = self.get_queryset().get(pk=order.pk)
+        return Response(self.get_serializer(order).data,
+                        status=status.HTTP_201_CREATED)
 
     def update(self, request, *args, **kwargs):
         order = get_object_or_404(Order, pk=self.kwargs.get('pk'))
@@ -67,15 +667,19 @@ class OrderViewSet(viewsets.ModelViewSet):
             data=request.data, partial=True
         )
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        if 'external_id' in serializer.validated_data:
+            external_id = serializer.validated_data['external_id']
+            # conditional UPDATE, order could be switched meanwhile.
+            if not services.change_external_ids({order.pk: external_id}):
+                return Response(NOT_NEW_ORDER_STATUS_TEXT,
+                                status=status.HTTP_405_METHOD_NOT_ALLOWED)
+            order.external_id = external_id
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     def destroy(self, request, *args, **kwargs):
         order = self.get_object()
         if order.status == Status.ACCEPTED:
-            return Response(
-                f'Order with status {Status.ACCEPTED} could not be deleted.',
-                status=status.HTTP_405_METHOD_NOT_ALLOWED
-            )
-        order.delete()
+            return Response(NOT_DELETABLE_TEXT,
+                            status=status.HTTP_405_METHOD_NOT_ALLOWED)
+        services.delete_order(order)
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,69 @@
+"""
+Boot time preparation of state Django, DRF and django-filter build lazily on
+the first request: URL resolver, serializer fields, filter sets, SQL
+compiler, caches and database connection. Called by gunicorn hooks (see
+gunicorn.conf.py), so the first request of new worker is not slower than the
+following ones.
+"""
+from django.core.cache import caches
+from django.db import connections
+from django.urls import resolve, reverse
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.renderers import JSONRenderer
+
+from .fast_serializers import get_formatters
+from .models import Order
+from .serializers import OrderSerializer, ProductTotalSerializer
+from .views import OrderViewSet
+
+
+def warm_up_urls():
+    resolve(reverse('orders-list'))
+    resolve(reverse('orders-detail', kwargs={'pk': 1}))
+
+
+def warm_up_serializers():
+    # fields are built on first access.
+    for serializer in (OrderSerializer(), OrderSerializer(expand=('details',)),
+                       ProductTotalSerializer()):
+        serializer.fields
+    get_formatters()
+    JSONRenderer().render([])
+
+
+def warm_up_filters():
+    view = OrderViewSet(action='list')
+    queryset = Order.objects.all()
+    filterset_class = DjangoFilterBackend().get_filterset_class(
+        view, queryset)
+    filterset = filterset_class(data={}, queryset=queryset)
+    filterset.form
+    str(filterset.qs.query)  # compiled without connecting to database.
+
+
+def warm_up_caches():
+    for cache in caches.all():
+        cache.get('orders:warm-up')
+
+
+def warm_up_database():
+    """
+    Connect every configured database of this thread, query to orders makes
+    SQLite read database schema.
+    """
+    for connection in connections.all():
+        connection.ensure_connection()
+    Order.objects.exists()
+
+
+def warm_up(database: bool = True):
+    """
+    :param database: connect databases too, should be False in process
+    which is forked later, as connections could not be shared by processes.
+    """
+    warm_up_urls()
+    warm_up_serializers()
+    warm_up_filters()
+    warm_up_caches()
+    if database:
+        warm_up_database()